@@ -0,0 +1,93 @@
+# Time of adding new rows to the data, end to end: appending a delta file
+# with append_delta (reading it, updating the loaded Dataset and adding the
+# rows to the CSV, the columnar store and the mapped store) versus loading
+# the grown CSV from scratch (parsing it, writing the columnar store,
+# building the Dataset and writing the mapped store), for a delta of one new
+# year plus the whole history of one new country. Each append starts from a
+# copy of the history's files. Checks that the appended Dataset is the one
+# built from the grown CSV.
+#
+#     python benchmarks/bench_append.py
+
+import os
+import shutil
+import tempfile
+import time
+
+import pandas as pd
+
+from common import best_time, make_synthetic, print_table
+
+from suicide_data_append import append_delta, dataset_differences
+from suicide_data_cube import Dataset
+from suicide_data_mmap import load_dataset
+from suicide_data_store import read_csv, write_store
+
+
+# Paths of the CSV, columnar store and mapped store manifest in a directory
+def data_paths(directory):
+    store_dir = os.path.join(directory, 'data_store')
+    return (os.path.join(directory, 'data.csv'), os.path.join(store_dir, 'data.parquet'),
+            os.path.join(store_dir, 'mapped.json'))
+
+
+# Best wall time (ms) of appending the delta to fresh copies of the history
+def best_append_time(history_dir, delta_path, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            work_dir = os.path.join(tmp_dir, 'data')
+            shutil.copytree(history_dir, work_dir)
+            start = time.perf_counter()
+            append_delta(delta_path, *data_paths(work_dir))
+            timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def main():
+    rows = []
+    for factor in (1, 100):
+        df = make_synthetic(factor)
+        last_year = df['year'].max()
+
+        # The new country is a renamed copy of the first one
+        new_country = df[df['country'] == df['country'].cat.categories[0]].copy()
+        new_country['country'] = new_country['country'].astype(str) + " (new)"
+        delta = pd.concat([df[df['year'] == last_year].astype({'country': str}),
+                           new_country.astype({'country': str})], ignore_index=True)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            # The history with both stores built, as a server leaves them
+            history_dir = os.path.join(tmp_dir, 'history')
+            csv_path, store_path, manifest_path = data_paths(history_dir)
+            os.makedirs(os.path.dirname(store_path))
+            df[df['year'] < last_year].to_csv(csv_path, index=False)
+            write_store(read_csv(csv_path), csv_path, store_path)
+            load_dataset(csv_path, manifest_path, store_path)
+
+            delta_path = os.path.join(tmp_dir, 'delta.csv')
+            delta.to_csv(delta_path, index=False)
+
+            # The grown CSV, loaded into empty stores
+            grown_dir = os.path.join(tmp_dir, 'grown')
+            shutil.copytree(history_dir, grown_dir)
+            updated, _ = append_delta(delta_path, *data_paths(grown_dir))
+            grown_csv = data_paths(grown_dir)[0]
+            differences = dataset_differences(updated, Dataset(read_csv(grown_csv)))
+            if differences:
+                raise SystemExit("Differs from a full rebuild: " + ", ".join(differences))
+
+            def full_load():
+                with tempfile.TemporaryDirectory() as store_dir:
+                    load_dataset(grown_csv, os.path.join(store_dir, 'mapped.json'),
+                                 os.path.join(store_dir, 'data.parquet'))
+
+            rows.append([f"{len(updated.df):,}", f"{len(delta):,}",
+                         f"{best_time(full_load, repeat=3):.0f}",
+                         f"{best_append_time(history_dir, delta_path):.0f}"])
+
+    print_table(["rows", "delta rows", "full load (ms)", "append_delta (ms)"], rows)
+
+
+if __name__ == '__main__':
+    main()
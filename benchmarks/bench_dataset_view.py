@@ -0,0 +1,59 @@
+# Bytes the Dataset View sends to the browser on every rerun, as the Arrow
+# payload of its st.dataframe, and the time to build and serialize it: the
+# whole filtered frame, as the view sent before it was paged, versus one
+# sorted page of every column or of a few columns, and the capped unpaged
+# table, with every country selected
+#
+#     python benchmarks/bench_dataset_view.py
+
+from common import best_time, make_synthetic, print_table
+
+from streamlit.dataframe_util import convert_pandas_df_to_arrow_bytes
+
+from suicide_data_aggregates import FilterResult
+from suicide_data_config import DATASET_PAGE_SIZE, DATASET_ROW_CAP
+from suicide_data_cube import Dataset, take_page, take_rows
+
+# A few columns picked in the column picker
+FEW_COLUMNS = ['country', 'year', 'sex', 'age', 'suicides/100k pop']
+
+
+def main():
+    rows = []
+    for factor in (1, 100):
+        data = Dataset(make_synthetic(factor))
+        countries = list(data.df['country'].cat.categories)
+        selection = ((1985, 2016), 'All', 'All', 'All', countries)
+        all_columns = list(data.df.columns)
+
+        # The filter result comes from the filter cache on a rerun
+        result = FilterResult(data, selection)
+
+        def full_table():
+            return take_rows(data.df, result.row_ids)
+
+        # The page is the second one of the rows sorted by rate, so it goes
+        # through the sort order of the filter index
+        def page(columns):
+            ids = result.sorted_rows(data, 'suicides/100k pop', ascending=False)
+            return take_page(data.df, ids[DATASET_PAGE_SIZE:2 * DATASET_PAGE_SIZE], columns)
+
+        def capped_table():
+            return take_page(data.df, result.row_ids[:DATASET_ROW_CAP], all_columns)
+
+        for label, build in [
+            ("whole filtered frame", full_table),
+            (f"page of {DATASET_PAGE_SIZE}, all columns", lambda: page(all_columns)),
+            (f"page of {DATASET_PAGE_SIZE}, {len(FEW_COLUMNS)} columns",
+             lambda: page(FEW_COLUMNS)),
+            (f"unpaged, capped at {DATASET_ROW_CAP:,}", capped_table),
+        ]:
+            payload = convert_pandas_df_to_arrow_bytes(build())
+            timing = best_time(lambda: convert_pandas_df_to_arrow_bytes(build()))
+            rows.append([f"{len(data.df):,}", label, f"{len(payload):,}", f"{timing:.1f}"])
+
+    print_table(["rows", "table", "bytes per rerun", "build + serialize (ms)"], rows)
+
+
+if __name__ == '__main__':
+    main()
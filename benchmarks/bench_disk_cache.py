@@ -0,0 +1,62 @@
+# Time of the first request for a selection after a restart: computing its
+# filter result and every section aggregate, versus reading them back from
+# the disk cache written before the restart (a new DiskCache over the same
+# directory, as a restarted server opens it).
+#
+#     python benchmarks/bench_disk_cache.py
+
+import tempfile
+
+from common import best_time, make_synthetic, print_table
+
+from suicide_data_aggregates import AGGREGATES, FilterCache, FilterResult, filter_key
+from suicide_data_cache import DiskCache
+from suicide_data_cube import Dataset
+from suicide_data_query import PandasEngine
+
+
+# Build a filter result and every aggregate of it
+def full_result(data, selection, engine, cache=None, key=None):
+    result = FilterResult(data, selection, cache, key, engine)
+    for name in AGGREGATES:
+        result.get(name)
+    return result
+
+
+def main():
+    rows = []
+    for factor in (1, 100):
+        data = Dataset(make_synthetic(factor))
+        engine = PandasEngine(data)
+        countries = list(data.df['country'].cat.categories)
+        selections = {
+            "all countries": ((1985, 2016), 'All', 'All', 'All', countries),
+            "10 countries, female, 1995-2010": (
+                (1995, 2010), 'female', 'All', 'All', countries[:10]),
+        }
+
+        for label, selection in selections.items():
+            key = filter_key(*selection)
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                # Before the restart: computed, then saved in the background
+                disk = DiskCache(tmp_dir, 2**32)
+                cache = FilterCache(2**32, engine, disk)
+                cache.put(key, full_result(data, selection, engine, cache, key)).save()
+                disk.flush()
+                nbytes = disk.stats()['bytes']
+
+                # After it: an empty memory cache over the disk entries
+                def restarted():
+                    result = FilterCache(2**32, engine, DiskCache(tmp_dir, 2**32)).get(key)
+                    for name in AGGREGATES:
+                        result.get(name)
+
+                rows.append([f"{len(data.df):,}", label,
+                             f"{best_time(lambda: full_result(data, selection, engine)):.1f}",
+                             f"{best_time(restarted):.1f}", f"{nbytes / 2**20:.2f}"])
+
+    print_table(["rows", "selection", "computed (ms)", "from disk (ms)", "on disk (MB)"], rows)
+
+
+if __name__ == '__main__':
+    main()
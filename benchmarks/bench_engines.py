@@ -0,0 +1,60 @@
+# Time of a whole filter result under each query engine: the filter, the
+# year-range totals and every section aggregate, computed from scratch as on
+# a new sidebar selection. pandas answers from the in-memory Dataset and its
+# indexes, DuckDB with SQL over a Parquet copy of the data and Polars with
+# LazyFrames collected together. Also reports the time to set each engine up.
+#
+#     python benchmarks/bench_engines.py
+
+import os
+import tempfile
+import time
+
+from common import best_time, make_synthetic, print_table
+
+from suicide_data_aggregates import AGGREGATES, FilterResult
+from suicide_data_cube import Dataset
+from suicide_data_query import DuckDBEngine, PandasEngine, PolarsEngine
+
+
+# Build a filter result and every aggregate of it
+def full_result(data, selection, engine):
+    result = FilterResult(data, selection, engine=engine)
+    for name in AGGREGATES:
+        result.get(name)
+    return result
+
+
+def main():
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for factor in (1, 100):
+            df = make_synthetic(factor)
+            parquet_path = os.path.join(tmp_dir, f"suicide_data_{factor}.parquet")
+            df.to_parquet(parquet_path, index=False)
+            data = Dataset(df)
+
+            countries = list(data.df['country'].cat.categories)
+            selections = {
+                "all countries": ((1985, 2016), 'All', 'All', 'All', countries),
+                "10 countries, female, 1995-2010": (
+                    (1995, 2010), 'female', 'All', 'All', countries[:10]),
+            }
+
+            for name, make in (("pandas", lambda: PandasEngine(data)),
+                               ("duckdb", lambda: DuckDBEngine(data, parquet_path)),
+                               ("polars", lambda: PolarsEngine(data))):
+                start = time.perf_counter()
+                engine = make()
+                setup_ms = 1000 * (time.perf_counter() - start)
+
+                for label, selection in selections.items():
+                    rows.append([f"{len(data.df):,}", name, f"{setup_ms:.0f}", label,
+                                 f"{best_time(lambda: full_result(data, selection, engine)):.1f}"])
+
+    print_table(["rows", "engine", "setup (ms)", "selection", "filter + aggregates (ms)"],
+                rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+# Time and peak memory of cleaning a raw file `factor` times larger than
+# suicide_data.csv: the notebook's cleaning cells, run on the whole file at
+# once, versus the streaming pipeline writing the cleaned CSV and the
+# columnar store chunk by chunk. Each run is a fresh process.
+#
+#     python benchmarks/bench_etl.py [--factor 100]
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import pandas as pd
+
+from common import ROOT_DIR, print_table
+
+from suicide_data_etl import RAW_PATH
+
+# The notebook's cleaning cells, as a script
+NOTEBOOK = r"""
+import pandas as pd
+df = pd.read_csv({raw_path!r})
+df = df.drop(['HDI for year', 'country-year'], axis=1)
+df.columns = df.columns.str.strip()
+df['gdp_for_year ($)'] = df['gdp_for_year ($)'].str.replace(',', '').astype(float)
+df['age'] = df['age'].str.replace(' years', '', regex=False)
+df['generation'] = df['generation'].replace('Millenials', 'Millennials')
+df = df[df["suicides_no"] >= 0]
+df = df[df["suicides/100k pop"] >= 0]
+df.to_csv({csv_path!r}, index=False)
+"""
+
+# The streaming pipeline
+STREAMING = r"""
+import sys
+sys.path.insert(0, {root_dir!r})
+from suicide_data_etl import run_etl
+run_etl({raw_path!r}, {csv_path!r}, {store_path!r})
+"""
+
+# Wrapped around both: time the cleaning and report the peak resident
+# memory of the process
+CHILD = r"""
+import json, resource, time
+start = time.perf_counter()
+{body}
+print(json.dumps({{'seconds': time.perf_counter() - start,
+                  'peak_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}}))
+"""
+
+
+# Write a raw file `factor` times larger than the real one, one copy of it at
+# a time, renaming the countries of every copy
+def write_raw(path, factor):
+    raw = pd.read_csv(RAW_PATH, dtype=str, keep_default_na=False)
+    for i in range(factor):
+        copy = raw.copy()
+        if i:
+            copy['country'] = copy['country'] + f" {i}"
+        copy.to_csv(path, mode='a' if i else 'w', header=not i, index=False)
+
+
+def measure(template, **paths):
+    script = CHILD.format(body=template.format(root_dir=ROOT_DIR, **paths))
+    output = subprocess.run([sys.executable, '-c', script], capture_output=True,
+                            text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--factor', type=int, default=100,
+                        help="size of the raw file, in copies of the real one")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        raw_path = os.path.join(tmp_dir, 'raw.csv')
+        write_raw(raw_path, args.factor)
+        raw_mb = os.path.getsize(raw_path) / 2**20
+
+        rows = []
+        for name, template in (("notebook, whole file", NOTEBOOK),
+                               ("streaming, chunked", STREAMING)):
+            result = measure(template, raw_path=raw_path,
+                             csv_path=os.path.join(tmp_dir, 'cleaned.csv'),
+                             store_path=os.path.join(tmp_dir, 'suicide_data.parquet'))
+            rows.append([name, f"{raw_mb:.0f}", f"{result['seconds']:.1f}",
+                         f"{result['peak_mb']:.0f}"])
+
+    print_table(["cleaning", "raw file (MB)", "time (s)", "peak RSS (MB)"], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+# Sidebar filter time: boolean masks over the whole frame versus the
+# posting-list filter index, for "Select All Countries" and for the 13
+# countries selected by default
+
+from common import best_time, make_synthetic, print_table
+
+from suicide_data_cube import FilterIndex, drop_unusable_rows, filter_frame, take_rows
+
+# The 13 countries selected by default in the sidebar
+DEFAULT_COUNTRIES = ['South Africa', 'Ireland', 'Greece', 'Norway', 'Brazil', 'Nicaragua', 'Austria',
+                     'Uruguay', 'Australia', 'United States', 'Ukraine', 'Republic of Korea', 'Russian Federation']
+
+
+# The filter block as it ran on every rerun before the index existed
+def filter_with_masks(df, *selection):
+    return drop_unusable_rows(filter_frame(df, *selection))
+
+
+def main():
+    rows = []
+    for factor in (1, 100):
+        df = make_synthetic(factor)
+        index = FilterIndex(df)
+        all_countries = list(df['country'].cat.categories)
+
+        for label, countries in (("all countries", all_countries),
+                                 ("13 default", DEFAULT_COUNTRIES)):
+            for sex in ('All', 'male'):
+                selection = ((1985, 2016), sex, 'All', 'All', countries)
+                rows.append([
+                    f"{len(df):,}",
+                    label,
+                    sex,
+                    f"{best_time(lambda: filter_with_masks(df, *selection)):.2f}",
+                    f"{best_time(lambda: take_rows(df, index.rows(*selection))):.2f}",
+                ])
+
+    print_table(["rows", "countries", "sex", "masks (ms)", "index (ms)"], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+# End-to-end latency of widget interactions inside a section: a full script
+# rerun, as every interaction triggered before the sections were fragments,
+# versus a rerun of the section's fragment only, as the browser requests it
+# now. Both run the dashboard in-process through Streamlit's AppTest, with
+# the data already loaded and cached.
+#
+#     python benchmarks/bench_interaction.py
+
+import argparse
+import os
+import time
+
+from common import ROOT_DIR, print_table
+
+from streamlit.testing.v1 import AppTest
+from streamlit.testing.v1 import local_script_runner
+
+DASHBOARD_PATH = os.path.join(ROOT_DIR, 'suicide_data_dashboard.py')
+
+# Fragments queued for the next run; empty for a full rerun
+_fragment_queue = []
+_RerunData = local_script_runner.RerunData
+
+
+# AppTest always reruns the whole script; queue the fragments of the section
+# the way the browser does when a widget inside a fragment changes
+def _rerun_data(**kwargs):
+    return _RerunData(fragment_id_queue=list(_fragment_queue), **kwargs)
+
+
+local_script_runner.RerunData = _rerun_data
+
+
+# Map each section function to the id of its fragment in the last run
+def fragment_ids(at):
+    ids = {}
+    for fragment_id, fragment in at._fragment_storage._fragments.items():
+        for cell in fragment.__closure__ or ():
+            name = getattr(cell.cell_contents, '__name__', None)
+            if isinstance(name, str) and name.endswith('_section'):
+                ids[name] = fragment_id
+    return ids
+
+
+# Widget interactions, as (description, section, action setting the widget
+# to one of two states)
+def toggle_details(at, state):
+    checkbox = next(c for c in at.checkbox
+                    if c.label == "Show detailed comparison metrics")
+    checkbox.set_value(state)
+
+
+def switch_country(at, state):
+    at.selectbox(key='country1').select('Norway' if state else 'Australia')
+
+
+def switch_gender_data_type(at, state):
+    at.radio(key='gender_data_type').set_value(
+        "Rate per 100k" if state else "Total Numbers")
+
+
+def toggle_trend_legend(at, state):
+    at.checkbox(key='legend_0').set_value(state)
+
+
+def toggle_country_names(at, state):
+    checkbox = next(c for c in at.checkbox if c.label == 'Display country name')
+    checkbox.set_value(not state)
+
+
+INTERACTIONS = [
+    ("detailed comparison checkbox", 'comparison_section', toggle_details),
+    ("first comparison country", 'comparison_section', switch_country),
+    ("gender data type", 'gender_section', switch_gender_data_type),
+    ("trend legend checkbox", 'trends_section', toggle_trend_legend),
+    ("bubble country names", 'economic_section', toggle_country_names),
+]
+
+
+# Best wall time (in milliseconds) of a rerun after an interaction, flipping
+# the widget between its two states so every run sees a change
+def interaction_time(at, action, fragment_id=None, repeat=6):
+    timings = []
+    for i in range(repeat):
+        action(at, i % 2 == 0)
+        _fragment_queue[:] = [fragment_id] if fragment_id else []
+        start = time.perf_counter()
+        at.run()
+        timings.append(time.perf_counter() - start)
+        _fragment_queue.clear()
+        if at.exception:
+            raise RuntimeError(at.exception[0].value)
+    return min(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--app', default=DASHBOARD_PATH,
+                        help="dashboard script to run")
+    args = parser.parse_args()
+
+    at = AppTest.from_file(os.path.abspath(args.app), default_timeout=120)
+    at.run()
+    ids = fragment_ids(at)
+
+    rows = []
+    for label, section, action in INTERACTIONS:
+        full = interaction_time(at, action)
+        fragment = (f"{interaction_time(at, action, ids[section]):.1f}"
+                    if section in ids else "-")
+
+        # A fragment run only renders its own elements; bring the rest of
+        # the page back before the next interaction
+        at.run()
+        rows.append([label, section, f"{full:.1f}", fragment])
+
+    print_table(["interaction", "section", "full rerun (ms)", "fragment (ms)"], rows)
+
+
+if __name__ == '__main__':
+    main()
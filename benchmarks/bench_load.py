@@ -0,0 +1,44 @@
+# Cold-start load time: cleaned CSV versus the columnar store
+#
+# Times a full read of the real dataset and of a 100x synthetic copy, from
+# the CSV and from the Parquet store, plus a column-projected store read.
+
+import os
+import tempfile
+
+from common import best_time, make_synthetic, print_table
+
+import pandas as pd
+
+from suicide_data_store import read_csv, read_dataset, write_store
+
+# Columns needed by the headline metrics
+METRIC_COLUMNS = ['country', 'year', 'sex', 'suicides_no', 'population']
+
+
+def main():
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for factor in (1, 100):
+            df = make_synthetic(factor)
+            csv_path = os.path.join(tmp_dir, f'data_{factor}.csv')
+            store_path = os.path.join(tmp_dir, f'data_{factor}.parquet')
+            df.to_csv(csv_path, index=False)
+            write_store(df, csv_path, store_path)
+
+            rows.append([
+                f"{len(df):,}",
+                f"{best_time(lambda: pd.read_csv(csv_path)):.1f}",
+                f"{best_time(lambda: read_csv(csv_path)):.1f}",
+                f"{best_time(lambda: read_dataset(None, csv_path, store_path)):.1f}",
+                f"{best_time(lambda: read_dataset(METRIC_COLUMNS, csv_path, store_path)):.1f}",
+            ])
+
+    print_table(
+        ["rows", "csv inferred (ms)", "csv fixed (ms)",
+         "store (ms)", "store 5 cols (ms)"],
+        rows)
+
+
+if __name__ == '__main__':
+    main()
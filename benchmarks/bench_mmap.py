@@ -0,0 +1,122 @@
+# Startup time and memory of several server processes loading the Dataset:
+# each building its own from the columnar store (reading the parquet file,
+# then aggregating the cube and building the indexes), as every worker did
+# before, versus mapping the memory-mapped store. Each worker then reads all
+# of its data once, as serving the default view does, and waits while the
+# memory of all of them is measured: the summed RSS counts shared pages once
+# per process, PSS splits them between the processes sharing them.
+#
+#     python benchmarks/bench_mmap.py [--factor 10] [--workers 4]
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from common import make_synthetic, print_table
+
+from suicide_data_cube import Dataset
+from suicide_data_mmap import write_mapped_store
+
+# Worker process: load the dataset, read every array of it, report the time
+# it took and wait for the parent to measure it
+CHILD = r"""
+import json, sys, time
+sys.path.insert(0, {root_dir!r})
+
+import numpy as np
+import pandas as pd
+from suicide_data_cube import Dataset
+from suicide_data_mmap import read_manifest, read_mapped_store
+
+start = time.perf_counter()
+if {mode!r} == 'build':
+    data = Dataset(pd.read_parquet({parquet_path!r}))
+else:
+    data = read_mapped_store(read_manifest({manifest_path!r}), {manifest_path!r})
+loaded = time.perf_counter()
+
+for frame in (data.df, data.cube, data.year_index.cells):
+    for col in frame.columns:
+        values = frame[col]
+        if values.dtype.name == 'category':
+            values = values.cat.codes
+        np.asarray(values).sum()
+for prefix in data.year_index.prefix.values():
+    prefix.sum()
+for index in (data.row_index, data.cell_index):
+    for order in [*index.orders.values(), index.sorted_years]:
+        order.sum()
+
+print(json.dumps({{'load_ms': 1000 * (loaded - start),
+                  'ready_ms': 1000 * (time.perf_counter() - start)}}), flush=True)
+sys.stdin.read()
+"""
+
+
+# Resident and proportional set size of a process, in MB
+def memory_mb(pid):
+    sizes = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            fields = line.split()
+            if fields[0] in ('Rss:', 'Pss:'):
+                sizes[fields[0][:-1]] = int(fields[1]) / 1024
+    return sizes
+
+
+def measure(mode, workers, parquet_path, manifest_path):
+    root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    script = CHILD.format(root_dir=root_dir, mode=mode, parquet_path=parquet_path,
+                          manifest_path=manifest_path)
+    processes = [subprocess.Popen([sys.executable, '-c', script], stdin=subprocess.PIPE,
+                                  stdout=subprocess.PIPE, text=True)
+                 for _ in range(workers)]
+    timings = [json.loads(process.stdout.readline()) for process in processes]
+    memory = [memory_mb(process.pid) for process in processes]
+    for process in processes:
+        process.communicate('')
+
+    return {
+        'load_ms': max(timing['load_ms'] for timing in timings),
+        'ready_ms': max(timing['ready_ms'] for timing in timings),
+        'rss': sum(sizes['Rss'] for sizes in memory),
+        'pss': sum(sizes['Pss'] for sizes in memory),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--factor', type=int, default=1,
+                        help="size of the synthetic dataset, in copies of the real one")
+    parser.add_argument('--workers', type=int, default=4,
+                        help="number of worker processes loading the dataset")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        df = make_synthetic(args.factor)
+        parquet_path = os.path.join(tmp_dir, 'suicide_data.parquet')
+        df.to_parquet(parquet_path, index=False)
+
+        # The mapped store records the fingerprint of a source CSV
+        csv_path = os.path.join(tmp_dir, 'source.csv')
+        with open(csv_path, 'w') as f:
+            f.write(f"synthetic x{args.factor}\n")
+        manifest_path = os.path.join(tmp_dir, 'mapped.json')
+        write_mapped_store(Dataset(df), csv_path, manifest_path)
+
+        rows = []
+        for mode in ('build', 'mapped'):
+            result = measure(mode, args.workers, parquet_path, manifest_path)
+            rows.append([mode, args.workers, f"{result['load_ms']:.0f}",
+                         f"{result['ready_ms']:.0f}", f"{result['rss']:.0f}",
+                         f"{result['pss']:.0f}"])
+
+    print_table(["workers load", "workers", "slowest load (ms)", "slowest ready (ms)",
+                 "summed RSS (MB)", "summed PSS (MB)"], rows)
+
+
+if __name__ == '__main__':
+    main()
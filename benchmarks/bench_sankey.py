@@ -0,0 +1,92 @@
+# GDP → Age → Rate Sankey time, from the filtered cube cells to the link
+# arrays and colors: the pandas pipeline (a copy of the cells, two pd.qcut
+# passes, iterrows() loops and a per-link color loop) versus the array
+# pipeline, with and without its quantile edges already cached
+
+import numpy as np
+import pandas as pd
+
+from common import best_time, make_synthetic, print_table
+
+from suicide_data_aggregates import FilterResult, sankey_edges, sankey_flows
+from suicide_data_cube import Dataset, mean_of
+from suicide_data_store import AGE_ORDER
+
+
+# The Sankey pipeline as it ran on every rerun before it used arrays
+def sankey_with_pandas(cells):
+    gdp_age_sankey = cells[['age', 'suicides_no']].copy()
+    gdp_age_sankey['gdp_per_capita ($)'] = mean_of(cells, 'gdp_per_capita_sum')
+    gdp_age_sankey['suicides/100k pop'] = mean_of(cells, 'rate_sum')
+    gdp_age_sankey['gdp_level'] = pd.qcut(
+        gdp_age_sankey['gdp_per_capita ($)'], q=4,
+        labels=['Low GDP', 'Medium-Low GDP', 'Medium-High GDP', 'High GDP'])
+    gdp_age_sankey['suicide_level'] = pd.qcut(
+        gdp_age_sankey['suicides/100k pop'], q=3,
+        labels=['Low Rate', 'Medium Rate', 'High Rate'])
+    gdp_age_sankey['age'] = gdp_age_sankey['age'].astype(str)
+
+    flow_data = gdp_age_sankey.groupby(['gdp_level', 'age', 'suicide_level'], observed=False)[
+        'suicides_no'].sum().reset_index()
+    gdp_age_flow = flow_data.groupby(['gdp_level', 'age'], observed=False)[
+        'suicides_no'].sum().reset_index()
+    age_suicide_flow = flow_data.groupby(['age', 'suicide_level'], observed=False)[
+        'suicides_no'].sum().reset_index()
+
+    gdp_levels = sorted(flow_data['gdp_level'].unique())
+    age_groups = [age for age in AGE_ORDER if age in flow_data['age'].unique()]
+    suicide_levels = sorted(flow_data['suicide_level'].unique())
+    node_to_id = {node: idx for idx, node in
+                  enumerate(gdp_levels + age_groups + suicide_levels)}
+
+    source, target, value = [], [], []
+    for _, row in gdp_age_flow.iterrows():
+        source.append(node_to_id[row['gdp_level']])
+        target.append(node_to_id[row['age']])
+        value.append(row['suicides_no'])
+    for _, row in age_suicide_flow.iterrows():
+        source.append(node_to_id[row['age']])
+        target.append(node_to_id[row['suicide_level']])
+        value.append(row['suicides_no'])
+
+    max_value, min_value = max(value), min(value)
+    link_colors = []
+    for v, s in zip(value, source):
+        opacity = 0.3 + 0.5 * ((v - min_value) / (max_value - min_value))
+        prefix = 'rgba(255, 107, 161, ' if s < len(gdp_levels) else 'rgba(111, 184, 255, '
+        link_colors.append(f'{prefix}{opacity:.2f})')
+    return source, target, value, link_colors
+
+
+# The array pipeline, as the dashboard runs it from a filter result
+def sankey_with_arrays(result, cached_edges=True):
+    if not cached_edges:
+        result.aggregates.pop('sankey_edges', None)
+    flows = sankey_flows(result)
+    source, value = flows['source'], flows['value']
+    opacity = 0.3 + 0.5 * ((value - value.min()) / ((value.max() - value.min()) or 1))
+    link_rgb = np.where(source < len(flows['gdp_levels']),
+                        'rgba(255, 107, 161, ', 'rgba(111, 184, 255, ')
+    return np.char.add(np.char.add(link_rgb, np.char.mod('%.2f', opacity)), ')')
+
+
+def main():
+    rows = []
+    for factor in (1, 100):
+        data = Dataset(make_synthetic(factor))
+        countries = list(data.df['country'].cat.categories)
+        result = FilterResult(data, ((1985, 2016), 'All', 'All', 'All', countries))
+        result.aggregates['sankey_edges'] = sankey_edges(result)
+
+        rows.append([
+            f"{len(result.cells):,}",
+            f"{best_time(lambda: sankey_with_pandas(result.cells)):.2f}",
+            f"{best_time(lambda: sankey_with_arrays(result, cached_edges=False)):.2f}",
+            f"{best_time(lambda: sankey_with_arrays(result)):.2f}",
+        ])
+
+    print_table(["cells", "pandas (ms)", "arrays (ms)", "arrays, cached edges (ms)"], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+# Memory footprint and filter/groupby latency: inferred dtypes versus the
+# typed schema (categoricals and downcast numerics)
+
+from common import best_time, make_synthetic, print_table
+
+# Dtypes pandas infers when parsing the cleaned CSV without a schema
+INFERRED_DTYPES = {
+    'country': object,
+    'year': 'int64',
+    'sex': object,
+    'age': object,
+    'suicides_no': 'int64',
+    'population': 'int64',
+    'gdp_per_capita ($)': 'int64',
+    'generation': object,
+}
+
+# The 13 countries selected by default in the sidebar
+DEFAULT_COUNTRIES = ['South Africa', 'Ireland', 'Greece', 'Norway', 'Brazil', 'Nicaragua', 'Austria',
+                     'Uruguay', 'Australia', 'United States', 'Ukraine', 'Republic of Korea', 'Russian Federation']
+
+
+# The sidebar filter block, with one sex and one age group selected
+def run_filter(df):
+    df_filtered = df[
+        (df['country'].isin(DEFAULT_COUNTRIES)) &
+        (df['year'] >= 1990) &
+        (df['year'] <= 2010) &
+        df['population'].notna() &
+        df['suicides_no'].notna() &
+        (df['population'] > 0)
+    ]
+    df_filtered = df_filtered[df_filtered['sex'] == 'male']
+    return df_filtered[df_filtered['age'] == '35-54']
+
+
+# The groupbys run by the chart sections
+def run_groupbys(df):
+    for keys in (['country'], ['country', 'sex', 'age'], ['year', 'sex'],
+                 ['year', 'country'], ['year', 'generation'], ['year', 'age']):
+        df.groupby(keys, observed=True)[['suicides_no', 'population']].sum()
+
+
+def main():
+    rows = []
+    for factor in (1, 100):
+        typed = make_synthetic(factor)
+        inferred = typed.astype(INFERRED_DTYPES)
+
+        for label, df in (("inferred", inferred), ("typed", typed)):
+            rows.append([
+                f"{len(df):,}",
+                label,
+                f"{df.memory_usage(deep=True).sum() / 1e6:.1f}",
+                f"{best_time(lambda: run_filter(df)):.2f}",
+                f"{best_time(lambda: run_groupbys(df)):.2f}",
+            ])
+
+    print_table(["rows", "dtypes", "memory (MB)", "filter (ms)", "groupbys (ms)"], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+# Resident memory of the server process with 1, 10 and 50 simulated
+# sessions, each holding the dataset it got from load_data() as a rerun
+# does: through st.cache_data, which unpickles a private copy of the Dataset
+# on every call, as the dashboard loaded it before, versus st.cache_resource,
+# which hands every session the same read-only Dataset. Each measurement runs
+# in a fresh process.
+#
+#     python benchmarks/bench_sessions.py [--factor 10]
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+from common import print_table
+
+SESSIONS = [1, 10, 50]
+
+# Child process: load the dataset through the given cache, then call the
+# loader once per session, keeping every result alive
+CHILD = r"""
+import json, logging, sys, time
+sys.path.insert(0, {benchmarks_dir!r})
+from common import make_synthetic
+
+import streamlit as st
+logging.getLogger('streamlit').setLevel(logging.ERROR)
+from suicide_data_cube import Dataset
+
+
+def rss_mb():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+
+
+@getattr(st, {cache!r})
+def load_data():
+    return Dataset(make_synthetic({factor}))
+
+
+load_data()
+base = rss_mb()
+sessions, timings = [], []
+for _ in range({sessions}):
+    start = time.perf_counter()
+    sessions.append(load_data())
+    timings.append(time.perf_counter() - start)
+print(json.dumps({{'base': base, 'rss': rss_mb(),
+                  'call_ms': 1000 * sum(timings) / len(timings)}}))
+"""
+
+
+def measure(cache, sessions, factor):
+    script = CHILD.format(benchmarks_dir=os.path.dirname(os.path.abspath(__file__)),
+                          cache=cache, sessions=sessions, factor=factor)
+    output = subprocess.run([sys.executable, '-c', script], capture_output=True,
+                            text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--factor', type=int, default=1,
+                        help="size of the synthetic dataset, in copies of the real one")
+    args = parser.parse_args()
+
+    rows = []
+    for cache in ('cache_data', 'cache_resource'):
+        for sessions in SESSIONS:
+            result = measure(cache, sessions, args.factor)
+            rows.append([cache, sessions, f"{result['base']:.0f}", f"{result['rss']:.0f}",
+                         f"{result['rss'] - result['base']:.0f}",
+                         f"{result['call_ms']:.2f}"])
+
+    print_table(["loader", "sessions", "RSS loaded (MB)", "RSS with sessions (MB)",
+                 "growth (MB)", "load_data() call (ms)"], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+# Time of the first request for the default view and for all countries on a
+# fresh DataVersion: computing the filter result and every section aggregate
+# on a cold cache, versus finding them after the warm-up. Also reports how
+# long the warm-up takes in the background.
+#
+#     python benchmarks/bench_warmup.py
+
+import time
+
+from common import make_synthetic, print_table
+
+from suicide_data_aggregates import AGGREGATES, FilterResult, filter_key
+from suicide_data_cube import Dataset
+from suicide_data_live import DataVersion
+from suicide_data_warmup import warm_up, warmup_selection
+
+
+# Time the first request for a selection, as the dashboard serves it
+def first_request(version, selection):
+    start = time.perf_counter()
+    key = filter_key(*selection)
+    result = version.filter_cache.get_or_compute(
+        key, lambda: FilterResult(version.data, selection, version.filter_cache, key,
+                                  version.engine))
+    for name in AGGREGATES:
+        result.get(name)
+    return 1000 * (time.perf_counter() - start)
+
+
+def main():
+    rows = []
+    specs = [{'countries': 'all'}]
+    for factor in (1, 100):
+        data = Dataset(make_synthetic(factor))
+        manifest = {'sha256': None}
+
+        warmed = DataVersion(data, manifest)
+        start = time.perf_counter()
+        warm_up(warmed, specs)
+        warmup_ms = 1000 * (time.perf_counter() - start)
+
+        for label, spec in (("default view", {}), ("all countries", specs[0])):
+            selection = warmup_selection(data, spec)
+            rows.append([f"{len(data.df):,}", label,
+                         f"{first_request(DataVersion(data, manifest), selection):.1f}",
+                         f"{first_request(warmed, selection):.2f}", f"{warmup_ms:.0f}"])
+
+    print_table(["rows", "selection", "cold (ms)", "warmed (ms)", "warm-up (ms)"], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,31 @@
+# Year-range queries: rescanning the cube versus the year prefix index
+#
+# Both compute the totals of the selected cells over a year range, as the
+# headline metrics do on every move of the year slider.
+
+from common import best_time, make_synthetic, print_table
+
+from suicide_data_cube import YearPrefixIndex, build_cube, filter_frame, rollup
+
+
+def main():
+    rows = []
+    for factor in (1, 100):
+        cube = build_cube(make_synthetic(factor))
+        year_index = YearPrefixIndex(cube)
+        countries = list(cube['country'].cat.categories)
+        mask = year_index.cell_mask('All', 'All', 'All', countries)
+
+        for year_range in ((2000, 2001), (1985, 2016)):
+            rows.append([
+                f"{len(cube):,}",
+                f"{year_range[0]}-{year_range[1]}",
+                f"{best_time(lambda: rollup(filter_frame(cube, year_range, 'All', 'All', 'All', countries), 'sex')):.2f}",
+                f"{best_time(lambda: rollup(year_index.totals(mask, *year_range), 'sex')):.2f}",
+            ])
+
+    print_table(["cube cells", "years", "rescan (ms)", "prefix index (ms)"], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+# Shared helpers for the dashboard benchmarks
+#
+# The benchmarks are plain scripts, run from the repository root:
+#
+#     python benchmarks/bench_load.py
+
+import os
+import sys
+import time
+
+# Make the dashboard modules importable when a script is run directly
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+import pandas as pd
+
+from suicide_data_store import apply_schema, read_csv
+
+
+# Build a synthetic dataset `factor` times larger than the real one, by
+# repeating every row under renamed copies of each country
+def make_synthetic(factor, df=None):
+    if df is None:
+        df = read_csv()
+
+    copies = []
+    for i in range(factor):
+        copy = df.copy()
+        if i:
+            copy['country'] = copy['country'].astype(str) + f" {i}"
+        copies.append(copy)
+
+    return apply_schema(pd.concat(copies, ignore_index=True))
+
+
+# Return the best wall time (in milliseconds) of several runs of `fn`
+def best_time(fn, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+# Print a small aligned results table
+def print_table(header, rows):
+    widths = [max(len(str(cell)) for cell in column)
+              for column in zip(header, *rows)]
+    for row in [header] + rows:
+        print("  ".join(str(cell).ljust(width)
+              for cell, width in zip(row, widths)))
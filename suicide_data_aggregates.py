@@ -0,0 +1,519 @@
+# Per-section aggregates of the filtered data for the Global Suicide Trends
+# Dashboard
+#
+# A FilterResult holds everything derived from one sidebar selection: the
+# matching cube cells and source row ids, the year-range totals of the index
+# cells, and every section aggregate, each computed the first time it is
+# asked for. Results are kept in a shared LRU cache keyed by the selection,
+# so reruns triggered by other widgets reuse them as they are, and saved to
+# the disk cache once a rerun has computed the aggregates it shows, so a
+# restarted server reuses them too.
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+from suicide_data_cache import LRUCache, sizeof
+from suicide_data_cube import mean_of
+from suicide_data_profile import phase
+from suicide_data_query import PandasEngine
+from suicide_data_store import AGE_ORDER, SEX_ORDER
+
+
+# Cache key of a sidebar selection; the order of the countries is irrelevant
+def filter_key(year_range, sex, age, generation, countries):
+    return (int(year_range[0]), int(year_range[1]), sex, age, generation,
+            frozenset(countries))
+
+
+# Everything derived from one sidebar selection, queried from `engine` (by
+# default the pandas engine over the Dataset)
+class FilterResult:
+    def __init__(self, data, selection, cache=None, key=None, engine=None):
+        year_range = selection[0]
+        self.selection = selection
+        self.cache = cache
+        self.key = key
+        self.country_codes = data.country_codes
+        self.engine = engine or PandasEngine(data)
+
+        # Cube cells and source rows matching the filters, the totals of each
+        # selected index cell over the year range and in its first and last
+        # year, and the section rollups the engine computes up front
+        periods = [year_range, (year_range[0], year_range[0]), (year_range[1], year_range[1])]
+        self.cells, self.row_ids, totals, self.rollups = self.engine.filter(
+            selection, periods, ROLLUPS)
+        self.range_data, self.start_data, self.end_data = totals
+
+        # Aggregates are added by every session showing the selection; the
+        # lock guards them, and whether some were added since the result was
+        # last saved to the disk cache
+        self.aggregates = {}
+        self.unsaved = True
+        self.lock = threading.Lock()
+
+    @property
+    def empty(self):
+        return self.cells.empty
+
+    @property
+    def nbytes(self):
+        with self.lock:
+            aggregates = dict(self.aggregates)
+        return sum(sizeof(value) for value in (
+            self.cells, self.row_ids, self.range_data, self.start_data,
+            self.end_data, self.rollups, aggregates))
+
+    # Saved without the cache, engine and lock it is used with, which the
+    # cache reading it back attaches again; the aggregates are copied under
+    # the lock, since the disk cache saves them while more may be computed
+    def __getstate__(self):
+        with self.lock:
+            aggregates = dict(self.aggregates)
+        state = dict(vars(self))
+        state.update(cache=None, engine=None, lock=None, aggregates=aggregates, unsaved=False)
+        return state
+
+    def __setstate__(self, state):
+        vars(self).update(state)
+        self.lock = threading.Lock()
+
+    # Return an aggregate, computing it on first use with `compute` (by
+    # default the function registered under its name in AGGREGATES). Sessions
+    # asking for it at the same time may both compute it; the first one wins.
+    def get(self, name, compute=None):
+        with self.lock:
+            if name in self.aggregates:
+                return self.aggregates[name]
+
+        compute = compute or (lambda: AGGREGATES[name](self))
+        with phase('aggregate'):
+            value = compute()
+
+        with self.lock:
+            if name in self.aggregates:
+                return self.aggregates[name]
+            self.aggregates[name] = value
+            self.unsaved = True
+
+        # The cache accounts for the result's new size
+        if self.cache is not None:
+            self.cache.resize(self.key, sizeof(name) + sizeof(value))
+        return value
+
+    # Save the result to the disk cache, once the aggregates a rerun needs
+    # are computed; nothing is written when none were added since last time
+    def save(self):
+        with self.lock:
+            unsaved, self.unsaved = self.unsaved, False
+        if unsaved and self.cache is not None:
+            self.cache.save(self.key, self)
+
+    # Ids of the source rows matching the filters, ordered by a column of
+    # the dataset (or as stored when `column` is None), for the dataset view;
+    # `orders` caches the order of each column over the whole dataset
+    def sorted_rows(self, data, column=None, ascending=True, orders=None):
+        if column is None:
+            rows = self.row_ids
+        else:
+            rows = self.get(('sorted_rows', column), lambda: data.row_index.sort_rows(
+                data.df, self.row_ids, column, orders=orders))
+        return rows if ascending else rows[::-1]
+
+    # The cube cells (or, with source='range_data', the totals of the year
+    # range) rolled up to the given keys by the query engine. Rollups
+    # computed up front are copied, as aggregates add columns to them.
+    def rollup(self, keys, source='cells'):
+        keys = (keys,) if isinstance(keys, str) else tuple(keys)
+        if (keys, source) in self.rollups:
+            return self.rollups[keys, source].copy()
+        return self.engine.rollup(self, keys, source)
+
+
+# LRU cache of the FilterResults of recent selections, keyed by filter_key,
+# whose results read back from disk are attached to it and to `engine`. A
+# result is stored in memory only when computed: it is saved to disk by
+# FilterResult.save, with its aggregates, once they are computed.
+class FilterCache(LRUCache):
+    def __init__(self, max_bytes, engine, disk=None, namespace=''):
+        super().__init__(max_bytes, disk, namespace)
+        self.engine = engine
+
+    def put(self, key, value, nbytes=None):
+        return self._store(key, value, nbytes)
+
+    def load(self, payload):
+        result = super().load(payload)
+        result.cache, result.engine = self, self.engine
+        return result
+
+
+# ====================
+# Key Metrics Section
+# ====================
+
+# Cards of the metrics section, with the percentage change of their trend
+# arrows, from one grouped pass over the totals of the year range and of its
+# first and last year. One row per card: its value, its change (NaN when the
+# card shows no arrow) and, for the highest-rate card, the country.
+def headline_metrics(result):
+    periods = [result.range_data, result.start_data, result.end_data]
+
+    # Sum a measure per period (rows: year range, first year, last year) and
+    # sex (columns, in SEX_ORDER) with a single bincount
+    n_sexes = len(SEX_ORDER)
+    groups = np.concatenate([
+        i * n_sexes + frame['sex'].cat.codes.to_numpy()
+        for i, frame in enumerate(periods)])
+
+    def by_sex(measure):
+        values = np.concatenate([frame[measure].to_numpy() for frame in periods])
+        sums = np.bincount(groups, weights=values, minlength=len(periods) * n_sexes)
+        return sums.reshape(len(periods), n_sexes)
+
+    suicides, population = by_sex('suicides_no'), by_sex('population')
+    has_rows = by_sex('rows').sum(axis=1) > 0
+    female = SEX_ORDER.index('female')
+    male = SEX_ORDER.index('male')
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Total suicides, suicide rate per 100k and male-to-female suicide
+        # ratio of every period, the values compared by the trend arrows
+        totals = np.column_stack([
+            suicides.sum(axis=1),
+            suicides.sum(axis=1) / population.sum(axis=1) * 100000,
+            np.where(suicides[:, female] > 0,
+                     suicides[:, male] / suicides[:, female], 0),
+        ])
+
+        # Percentage change from the first to the last year, only when both
+        # years have data and the first one a non-zero value
+        start, end = totals[1], totals[2]
+        change = np.where(has_rows[1] & has_rows[2] & (start != 0),
+                          (end - start) / start * 100, np.nan)
+
+        # Suicide rates per 100k population of each sex over the year range
+        rates = suicides[0] / population[0] * 100000
+
+    # The headline ratio compares suicide rates rather than counts, and is
+    # "N/A" when either sex has no suicides
+    if suicides[0, male] == 0 or suicides[0, female] == 0:
+        gender_ratio = np.nan
+    elif rates[female] > 0:
+        gender_ratio = rates[male] / rates[female]
+    else:
+        gender_ratio = float('inf')
+
+    # Country with the highest average suicide rate of the rows behind it
+    range_data = result.range_data
+    if not range_data.empty:
+        codes = range_data['country'].cat.codes.to_numpy()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            country_rates = (np.bincount(codes, weights=range_data['rate_sum'].to_numpy()) /
+                             np.bincount(codes, weights=range_data['rows'].to_numpy()))
+        highest = np.nanargmax(country_rates)
+        highest_country = range_data['country'].cat.categories[highest]
+        highest_rate = country_rates[highest]
+    else:
+        highest_country, highest_rate = "N/A", 0
+
+    return pd.DataFrame({
+        'value': [totals[0, 0], totals[0, 1], gender_ratio, highest_rate],
+        'change': np.append(change, np.nan),
+        'label': [None, None, None, highest_country],
+    }, index=['total_suicides', 'average_rate', 'gender_ratio', 'highest_rate'])
+
+
+# ====================
+# Overview Section
+# ====================
+
+# Total suicides, total population and average rate per country
+def map_data(result):
+    data = result.rollup('country', 'range_data').rename(columns={
+        'suicides_no': 'total_suicides',
+        'population': 'total_population'
+    })[['country', 'total_suicides', 'total_population']]
+
+    # Calculate average suicide rate per 100k people
+    data['avg_rate'] = (data['total_suicides'] /
+                        data['total_population']) * 100000
+
+    # ISO-3 code of each country, resolved when the dataset was loaded
+    data['iso3'] = data['country'].astype(str).map(result.country_codes)
+    return data
+
+
+# Suicide rate per 100k of each country in each year of the range, as a
+# country × year table (NaN where a country has no data for a year) whose
+# columns are the frames of the map animation
+def country_year_rates(result):
+    totals = result.rollup(['country', 'year'])
+    totals['rate'] = totals['suicides_no'] / totals['population'] * 100000
+
+    first_year, last_year = result.selection[0]
+    return totals.pivot(index='country', columns='year', values='rate').reindex(
+        columns=range(int(first_year), int(last_year) + 1))
+
+
+# Suicide totals and rates by country, gender, and age group
+def high_risk_groups(result):
+    groups = result.rollup(['country', 'sex', 'age'], 'range_data')
+    groups['suicides/100k pop'] = mean_of(groups, 'rate_sum')
+
+    # Calculate suicide rate per 100k for each group
+    groups['calculated_rate'] = (
+        groups['suicides_no'] / groups['population']) * 100000
+    return groups
+
+
+# =============================
+# Gender-based analysis section
+# =============================
+
+# Suicides, population and rate by year and sex
+def gender_base_data(result):
+    base_data = result.rollup(['year', 'sex'])[
+        ['year', 'sex', 'suicides_no', 'population']]
+
+    # Calculate suicide rate per 100,000 population
+    base_data['suicide_rate'] = (
+        base_data['suicides_no'] / base_data['population']) * 100000
+    return base_data
+
+
+# Yearly total suicides, for the hover information of the area chart
+def yearly_total(result):
+    return result.get('gender_base_data').groupby(
+        'year')['suicides_no'].sum().to_dict()
+
+
+# Total suicides by sex
+def total_by_gender(result):
+    return result.get('gender_base_data').groupby(
+        'sex', observed=True)['suicides_no'].sum().reset_index()
+
+
+# ====================================================
+# Suicide Trends by Age, Country & Generation section
+# ====================================================
+
+# Suicides, population and rate by year and one more key
+def _yearly_series(result, key):
+    series = result.rollup(['year', key])[
+        ['year', key, 'suicides_no', 'population']]
+    series['suicide_rate'] = (
+        series['suicides_no'] / series['population']) * 100000
+    return series
+
+
+def country_series(result):
+    return _yearly_series(result, 'country')
+
+
+# Yearly series of the `n` countries with the most suicides (or the highest
+# overall rate when `by` is 'suicide_rate'), in that order, followed by an
+# 'Other' series summing every remaining country
+def top_country_series(result, n, by='suicides_no'):
+    series = result.get('country_series')
+    totals = series.groupby('country', observed=True)[['suicides_no', 'population']].sum()
+    ranking = (totals['suicides_no'] / totals['population'] if by == 'suicide_rate'
+               else totals['suicides_no'])
+    top = ranking.nlargest(n).index
+
+    is_top = series['country'].isin(top)
+    other = series[~is_top].groupby('year', as_index=False)[
+        ['suicides_no', 'population']].sum()
+    other.insert(1, 'country', 'Other')
+
+    rank = {country: i for i, country in enumerate(top)}
+    top_series = series[is_top].astype({'country': str}).sort_values(
+        'country', key=lambda countries: countries.map(rank), kind='stable')
+    combined = pd.concat([top_series, other], ignore_index=True)
+    combined['suicide_rate'] = (
+        combined['suicides_no'] / combined['population']) * 100000
+    return combined
+
+
+def generation_series(result):
+    return _yearly_series(result, 'generation')
+
+
+def age_series(result):
+    return _yearly_series(result, 'age')
+
+
+# ====================================================
+# Economic and Demographic Factors section
+# ====================================================
+
+# Labels of the GDP per capita quartiles and suicide rate terciles
+GDP_LEVELS = ['Low GDP', 'Medium-Low GDP', 'Medium-High GDP', 'High GDP']
+RATE_LEVELS = ['Low Rate', 'Medium Rate', 'High Rate']
+
+
+# Edges splitting values into `q` equal-sized bins, as pd.qcut computes them
+def quantile_edges(values, q):
+    return np.percentile(values, np.linspace(0, 1, q + 1) * 100)
+
+
+# Bin of each value, as pd.qcut assigns it: bins are closed on the right and
+# the first one also holds its lower edge
+def quantile_bins(values, edges):
+    return np.clip(np.searchsorted(edges, values, side='left') - 1, 0, len(edges) - 2)
+
+
+# Mean GDP per capita and suicide rate of each filtered cube cell
+def _cell_means(result):
+    cells = result.cells
+    return (mean_of(cells, 'gdp_per_capita_sum').to_numpy(),
+            mean_of(cells, 'rate_sum').to_numpy())
+
+
+# Quartile edges of GDP per capita and tercile edges of the suicide rate
+def sankey_edges(result):
+    gdp, rate = _cell_means(result)
+    return {
+        'gdp': quantile_edges(gdp, len(GDP_LEVELS)),
+        'rate': quantile_edges(rate, len(RATE_LEVELS)),
+    }
+
+
+# Nodes and links of the GDP → Age → Rate Sankey diagram. Nodes are the GDP
+# levels, the age groups with data and the suicide rate levels, in that
+# order; links carry the suicides flowing from each GDP level to each age
+# group, then from each age group to each rate level, all as arrays.
+def sankey_flows(result):
+    cells = result.cells
+    edges = result.get('sankey_edges')
+
+    # Level of every cell, as positions in the node columns
+    gdp, rate = _cell_means(result)
+    gdp_level = quantile_bins(gdp, edges['gdp'])
+    rate_level = quantile_bins(rate, edges['rate'])
+    age_codes = cells['age'].cat.codes.to_numpy()
+    ages = np.unique(age_codes)
+    age_level = np.searchsorted(ages, age_codes)
+
+    # Suicides of every GDP level → age group and age group → rate level pair
+    n_gdp, n_age, n_rate = len(GDP_LEVELS), len(ages), len(RATE_LEVELS)
+    suicides = cells['suicides_no'].to_numpy()
+    gdp_age = np.bincount(gdp_level * n_age + age_level,
+                          weights=suicides, minlength=n_gdp * n_age)
+    age_rate = np.bincount(age_level * n_rate + rate_level,
+                           weights=suicides, minlength=n_age * n_rate)
+
+    # Node id of every level. The GDP and rate levels are listed in the
+    # alphabetical order of their labels, as the diagram has always shown them
+    gdp_ids = np.argsort(np.argsort(GDP_LEVELS))
+    age_ids = n_gdp + np.arange(n_age)
+    rate_ids = n_gdp + n_age + np.argsort(np.argsort(RATE_LEVELS))
+
+    return {
+        'gdp_levels': sorted(GDP_LEVELS),
+        'age_groups': [AGE_ORDER[code] for code in ages],
+        'suicide_levels': sorted(RATE_LEVELS),
+        'source': np.concatenate([np.repeat(gdp_ids, n_age), np.repeat(age_ids, n_rate)]),
+        'target': np.concatenate([np.tile(age_ids, n_gdp), np.tile(rate_ids, n_age)]),
+        'value': np.concatenate([gdp_age, age_rate]).astype(np.int64),
+    }
+
+
+# GDP per capita, suicides, population and rate per country
+def bubble_data(result):
+    # Aggregate data by country and year
+    gdp_suicide_data = result.rollup(['country', 'year'])
+    gdp_suicide_data['gdp_per_capita ($)'] = mean_of(
+        gdp_suicide_data, 'gdp_per_capita_sum')
+
+    # Further aggregate by country
+    data = gdp_suicide_data.groupby('country', observed=True).agg({
+        'gdp_per_capita ($)': 'mean',
+        'suicides_no': 'sum',
+        'population': 'sum'
+    }).reset_index()
+
+    # Calculate suicide rate per 100k / pop
+    data['suicides/100k pop'] = (
+        data['suicides_no'] / data['population']) * 100000
+
+    # Filter countries from the sidebar
+    return data[data['country'].isin(result.selection[4])]
+
+
+# ====================================
+# Country Comparison Analysis section
+# ====================================
+
+# Suicides (in total and by sex), GDP, latest-year population and rate per
+# selected country. The cells hold only the selected countries already.
+def country_summary(result):
+    cells = result.cells
+
+    # Calculate total suicides and average GDP for each country
+    total_suicides = result.rollup('country')
+    total_suicides['gdp_per_capita ($)'] = mean_of(total_suicides, 'gdp_per_capita_sum')
+    total_suicides['gdp_for_year ($)'] = mean_of(total_suicides, 'gdp_for_year_sum')
+    total_suicides = total_suicides[
+        ['country', 'suicides_no', 'gdp_per_capita ($)', 'gdp_for_year ($)']]
+
+    # Get population data for each country's latest year in the filtered
+    # dataset, comparing every cell's year with its country's latest one
+    latest_year = cells.groupby('country', observed=True)['year'].transform('max')
+    population_data = cells[cells['year'] == latest_year].groupby(
+        'country', observed=True)['population'].sum().reset_index()
+
+    # Total female and male suicides for each country
+    suicides_by_sex = cells.groupby(['country', 'sex'], observed=True)[
+        'suicides_no'].sum().unstack('sex', fill_value=0)
+    suicides_by_sex = suicides_by_sex.reindex(columns=SEX_ORDER, fill_value=0)
+    suicides_by_sex.columns = [f"{sex}_suicides" for sex in SEX_ORDER]
+
+    # Merge suicide and population data
+    summary = pd.merge(total_suicides, population_data, on='country', how='outer')
+    summary = summary.merge(suicides_by_sex.reset_index(), on='country', how='left')
+
+    # Fill any missing values with 0
+    value_columns = summary.columns.drop('country')
+    summary[value_columns] = summary[value_columns].fillna(0)
+
+    # Calculate suicide rate per 100k population
+    summary['suicide_rate'] = np.where(
+        summary['population'] > 0,
+        (summary['suicides_no'] / summary['population']) * 100000,
+        0
+    )
+    return summary
+
+
+# Rollups the section aggregates are built from, as (keys, source) pairs
+ROLLUPS = [
+    (('country',), 'range_data'),
+    (('country', 'sex', 'age'), 'range_data'),
+    (('country', 'year'), 'cells'),
+    (('year', 'sex'), 'cells'),
+    (('year', 'country'), 'cells'),
+    (('year', 'generation'), 'cells'),
+    (('year', 'age'), 'cells'),
+    (('country',), 'cells'),
+]
+
+
+# Aggregates available through FilterResult.get()
+AGGREGATES = {
+    'headline_metrics': headline_metrics,
+    'map_data': map_data,
+    'country_year_rates': country_year_rates,
+    'high_risk_groups': high_risk_groups,
+    'gender_base_data': gender_base_data,
+    'yearly_total': yearly_total,
+    'total_by_gender': total_by_gender,
+    'country_series': country_series,
+    'generation_series': generation_series,
+    'age_series': age_series,
+    'sankey_edges': sankey_edges,
+    'sankey_flows': sankey_flows,
+    'bubble_data': bubble_data,
+    'country_summary': country_summary,
+}
@@ -0,0 +1,185 @@
+# Incremental updates of the Global Suicide Trends Dashboard data
+#
+# New country-year rows (e.g. the figures of a new year) are appended without
+# rebuilding anything from the history: the delta file is cleaned, its rows
+# are aggregated into cube cells on their own, and those are merged into the
+# current Dataset's cube, year running totals and filter indexes (see
+# Dataset.appended), which costs time in the size of the delta plus copying
+# the arrays. The delta's rows are then added to the cleaned CSV, the
+# columnar store and the memory-mapped store, so running servers pick up the
+# new version as they do any refreshed CSV. None of them is rewritten: the
+# rows are appended to the CSV in place and only they are hashed, they are
+# added to the columnar store as a new part, and the mapped store writes
+# only the arrays that changed (see write_mapped_store).
+#
+# While the CSV is being appended to, a marker file next to it holds its
+# size before the append, and running servers do not reload it. An append
+# that fails, or was interrupted, is undone: the CSV is cut back to that
+# size. The mapped store it was writing is not published before the CSV is
+# complete, and the build it replaces is left as it was.
+#
+# Rows are appended, never replaced: rows of a country-year already loaded
+# add to its totals, as they would in a CSV holding both.
+#
+#     python suicide_data_append.py delta.csv
+#     python suicide_data_append.py delta.csv --verify
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from suicide_data_cube import Dataset
+from suicide_data_etl import (DROPPED_COLUMNS, clean_chunk, raw_columns, raw_countries,
+                              read_raw_chunks)
+from suicide_data_mmap import (MANIFEST_PATH, load_dataset, manifest_is_fresh, read_manifest,
+                               write_mapped_store)
+from suicide_data_store import (APPEND_MARKER_SUFFIX, COLUMNS, CSV_PATH, PARQUET_PATH,
+                                SCHEMA_DTYPES, append_store, appended_fingerprint, read_csv,
+                                store_is_fresh, store_metadata, write_store)
+
+
+# Read a delta file of new rows, in the cleaned format or in the raw one
+# (which is cleaned the way the ingestion pipeline does)
+def read_delta(delta_path):
+    header = pd.read_csv(delta_path, nrows=0).columns.str.strip()
+    if not any(col in header for col in DROPPED_COLUMNS):
+        return read_csv(delta_path)
+
+    columns = raw_columns(delta_path)
+    dtypes = dict(SCHEMA_DTYPES)
+    dtypes['country'] = pd.CategoricalDtype(raw_countries(delta_path, columns))
+    return pd.concat([clean_chunk(chunk, dtypes) for chunk in read_raw_chunks(delta_path, columns)],
+                     ignore_index=True)
+
+
+# Undo an append that did not finish, if any: cut the CSV back to its size
+# before it. Returns whether there was one.
+def recover_append(csv_path=CSV_PATH):
+    marker = f"{csv_path}{APPEND_MARKER_SUFFIX}"
+    try:
+        with open(marker) as f:
+            size = f.read()
+    except FileNotFoundError:
+        return False
+
+    # A marker cut short was being written: the CSV was not touched yet
+    if size.endswith('\n'):
+        os.truncate(csv_path, int(size))
+    os.remove(marker)
+    return True
+
+
+# Append the rows of a delta file to the data, updating the current Dataset
+# instead of building it again, and save the result; returns the updated
+# Dataset and the number of rows appended
+def append_delta(delta_path, csv_path=CSV_PATH, store_path=PARQUET_PATH,
+                 manifest_path=MANIFEST_PATH):
+    recover_append(csv_path)
+    delta = read_delta(delta_path)
+    data = load_dataset(csv_path, manifest_path, store_path)
+    updated = data.appended(delta)
+
+    # The fingerprints of the current CSV, to be extended with the delta: a
+    # columnar store not built from it is rebuilt first. The mapped store's
+    # arrays are reused when it is the build the Dataset was loaded from.
+    if not store_is_fresh(csv_path, store_path):
+        write_store(read_csv(csv_path), csv_path, store_path)
+    fingerprint = store_metadata(store_path)
+    previous = read_manifest(manifest_path)
+    if not manifest_is_fresh(previous, csv_path):
+        previous = None
+
+    marker = f"{csv_path}{APPEND_MARKER_SUFFIX}"
+    start = os.path.getsize(csv_path)
+    with open(marker, 'w') as f:
+        f.write(f"{start}\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+    try:
+        with open(csv_path, 'a', newline='') as csv_file:
+            delta[COLUMNS].to_csv(csv_file, header=False, index=False)
+        fingerprint = appended_fingerprint(fingerprint, csv_path, start)
+
+        # The store holds every cleaned row, including the ones the Dataset drops
+        append_store(delta[COLUMNS], fingerprint, store_path)
+        write_mapped_store(updated, csv_path, manifest_path, fingerprint, previous)
+    except BaseException:
+        recover_append(csv_path)
+        raise
+    os.remove(marker)
+    return updated, len(delta)
+
+
+# Attributes of two Datasets that differ, e.g. an updated one and one built
+# from the same rows; sums may differ by rounding, as they are added in
+# another order
+def dataset_differences(a, b, path='data'):
+    if isinstance(a, pd.DataFrame):
+        if list(a.columns) != list(b.columns) or len(a) != len(b):
+            return [f"{path}: columns or length"]
+        differences = []
+        for col in a.columns:
+            if a[col].dtype != b[col].dtype:
+                differences.append(f"{path}[{col!r}]: dtype")
+            elif a[col].dtype.name == 'category':
+                if not np.array_equal(a[col].cat.codes, b[col].cat.codes):
+                    differences.append(f"{path}[{col!r}]: values")
+            else:
+                differences += dataset_differences(a[col].to_numpy(), b[col].to_numpy(),
+                                                   f"{path}[{col!r}]")
+        return differences
+
+    if isinstance(a, np.ndarray):
+        if a.dtype != b.dtype or a.shape != b.shape:
+            return [f"{path}: dtype or shape"]
+        if not np.allclose(a, b, rtol=1e-12, atol=0, equal_nan=True):
+            return [f"{path}: values"]
+        return []
+
+    if isinstance(a, dict):
+        if a.keys() != b.keys():
+            return [f"{path}: keys"]
+        return [difference for key in a
+                for difference in dataset_differences(a[key], b[key], f"{path}[{key!r}]")]
+
+    if isinstance(a, pd.Index):
+        return [] if a.equals(b) else [f"{path}: values"]
+
+    if hasattr(a, '__dict__'):
+        return dataset_differences(vars(a), vars(b), path)
+
+    return [] if a == b else [f"{path}: {a!r} != {b!r}"]
+
+
+# Append a delta file from the command line
+def main():
+    parser = argparse.ArgumentParser(
+        description="Append new rows to the cleaned suicide data and its stores.")
+    parser.add_argument('delta',
+                        help="CSV of new rows, cleaned or raw")
+    parser.add_argument('--csv', default=CSV_PATH,
+                        help="cleaned CSV to append to")
+    parser.add_argument('--output', default=PARQUET_PATH,
+                        help="Parquet file to update")
+    parser.add_argument('--manifest', default=MANIFEST_PATH,
+                        help="manifest of the mapped store to update")
+    parser.add_argument('--verify', action='store_true',
+                        help="check the result against a full rebuild from the CSV")
+    args = parser.parse_args()
+
+    updated, rows = append_delta(args.delta, args.csv, args.output, args.manifest)
+    print(f"Appended {rows:,} rows; {len(updated.df):,} rows and "
+          f"{len(updated.cube):,} cube cells loaded")
+
+    if args.verify:
+        differences = dataset_differences(updated, Dataset(read_csv(args.csv)))
+        if differences:
+            raise SystemExit("Differs from a full rebuild: " + ", ".join(differences))
+        print("Matches a full rebuild")
+
+
+if __name__ == '__main__':
+    main()
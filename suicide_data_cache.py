@@ -0,0 +1,360 @@
+# Caches for the Global Suicide Trends Dashboard
+#
+# Filter results and finished figures are kept in memory, in LRU caches
+# bounded by size, and written behind to a disk cache shared by every
+# version of the data, so a restarted server reads them back instead of
+# computing them again. Disk entries are keyed by the hash of the data and
+# the version of the code and settings they were built with, so entries of
+# other versions are never read, and are evicted as the least recently used.
+
+import hashlib
+import json
+import logging
+import os
+import pickle
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+from suicide_data_profile import phase
+
+logger = logging.getLogger(__name__)
+
+# Suffix of the disk cache's entry files
+DISK_ENTRY_SUFFIX = '.bin'
+
+
+# Approximate number of bytes held by a cached value
+def sizeof(value):
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sum(sizeof(key) + sizeof(item) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(sizeof(item) for item in value)
+    if hasattr(value, 'nbytes'):
+        return int(value.nbytes)
+    return sys.getsizeof(value)
+
+
+# Text identifying a cache key across processes: sets are listed sorted,
+# since their order (and their hash) changes from one process to the next
+def stable_key(key):
+    if isinstance(key, (set, frozenset)):
+        return '{' + ','.join(sorted(stable_key(item) for item in key)) + '}'
+    if isinstance(key, (tuple, list)):
+        return '(' + ','.join(stable_key(item) for item in key) + ')'
+    return repr(key)
+
+
+# Least-recently-used cache of byte strings in files of one directory,
+# bounded by their total size. The order of use is kept in the files'
+# modification times, which reads refresh, so it survives restarts. Values
+# are written by a background thread, which serializes them too: writing
+# the same name again before it got to it only writes the latest value.
+class DiskCache:
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+        self.pending = {}
+        self.writing = False
+        self.writer = None
+
+        # Index the entries left by earlier runs, least recently used first
+        os.makedirs(directory, exist_ok=True)
+        files = []
+        for entry in os.scandir(directory):
+            if entry.name.endswith(DISK_ENTRY_SUFFIX):
+                stat = entry.stat()
+                files.append((stat.st_mtime_ns, entry.name[:-len(DISK_ENTRY_SUFFIX)],
+                              stat.st_size))
+        self.sizes = OrderedDict((name, size) for _, name, size in sorted(files))
+        self.nbytes = sum(self.sizes.values())
+
+    def path(self, name):
+        return os.path.join(self.directory, name + DISK_ENTRY_SUFFIX)
+
+    # Return the bytes stored under `name`, or None on a miss
+    def get(self, name):
+        try:
+            with open(self.path(name), 'rb') as f:
+                payload = f.read()
+            os.utime(self.path(name))
+        except OSError:
+            # Never written, or evicted (possibly by another process)
+            with self.lock:
+                self.misses += 1
+            return None
+
+        with self.lock:
+            self.hits += 1
+            if name in self.sizes:
+                self.sizes.move_to_end(name)
+            else:
+                self.sizes[name] = len(payload)
+                self.nbytes += len(payload)
+        return payload
+
+    # Store the bytes `dump()` returns under `name`, in the background
+    def put(self, name, dump):
+        with self.lock:
+            self.pending[name] = dump
+            if self.writer is None:
+                self.writer = threading.Thread(target=self._write_pending, daemon=True)
+                self.writer.start()
+            self.changed.notify_all()
+
+    # Wait until every value put so far is written
+    def flush(self):
+        with self.lock:
+            while self.pending or self.writing:
+                self.changed.wait()
+
+    def _write_pending(self):
+        while True:
+            with self.lock:
+                while not self.pending:
+                    self.changed.wait()
+                name, dump = self.pending.popitem()
+                self.writing = True
+
+            try:
+                self._write(name, dump())
+            except Exception:
+                # A value that cannot be saved is only kept in memory
+                logger.exception("Writing disk cache entry %s failed", name)
+            finally:
+                with self.lock:
+                    self.writing = False
+                    self.changed.notify_all()
+
+    # Write an entry next to its file and rename it, so readers never see a
+    # partial one, then evict the least recently used entries over budget
+    def _write(self, name, payload):
+        if len(payload) > self.max_bytes:
+            return
+        tmp_path = f"{self.path(name)}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(payload)
+        os.replace(tmp_path, self.path(name))
+
+        with self.lock:
+            self.nbytes += len(payload) - self.sizes.pop(name, 0)
+            self.sizes[name] = len(payload)
+            self.writes += 1
+            evicted = []
+            while self.nbytes > self.max_bytes:
+                old_name, size = self.sizes.popitem(last=False)
+                self.nbytes -= size
+                self.evictions += 1
+                evicted.append(old_name)
+
+        for old_name in evicted:
+            try:
+                os.remove(self.path(old_name))
+            except OSError:
+                pass
+
+    # Counters and occupancy, for display
+    def stats(self):
+        with self.lock:
+            return {
+                'entries': len(self.sizes),
+                'bytes': self.nbytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'writes': self.writes,
+                'evictions': self.evictions,
+            }
+
+
+# Least-recently-used cache bounded by the total size of its values rather
+# than their number. It is shared by every session of the server, hence the
+# lock, and counts its hits and misses for display. With a DiskCache, values
+# are also written to disk under `namespace` (e.g. the data and code
+# version) and read back from it on a miss.
+class LRUCache:
+    def __init__(self, max_bytes, disk=None, namespace=''):
+        self.max_bytes = max_bytes
+        self.disk = disk
+        self.namespace = namespace
+        self.entries = OrderedDict()
+        self.sizes = {}
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+        # Keys being computed, with the event set once they are
+        self.computing = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    # Return the cached value, or None on a miss
+    def get(self, key):
+        with self.lock:
+            if key in self.entries:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                return self.entries[key]
+            self.misses += 1
+
+        if self.disk is None:
+            return None
+        payload = self.disk.get(self.disk_name(key))
+        if payload is None:
+            return None
+        try:
+            value = self.load(payload)
+        except Exception:
+            # Unreadable, e.g. written by other library versions
+            logger.exception("Reading the disk cache entry of %r failed", key)
+            return None
+        return self._store(key, value)
+
+    # Name of the disk entry of a key
+    def disk_name(self, key):
+        return hashlib.sha256(f"{self.namespace}:{stable_key(key)}".encode()).hexdigest()
+
+    # Bytes saved to disk for a value, and the value read back from them
+    def dump(self, value):
+        return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def load(self, payload):
+        return pickle.loads(payload)
+
+    # Store a value, evicting the least recently used entries until the
+    # cache fits its budget, and save it to disk
+    def put(self, key, value, nbytes=None):
+        value = self._store(key, value, nbytes)
+        self.save(key, value)
+        return value
+
+    # Save a value to the disk cache, when there is one, in the background
+    def save(self, key, value):
+        if self.disk is not None:
+            self.disk.put(self.disk_name(key), lambda: self.dump(value))
+
+    # Account for a cached value having grown by `delta` bytes, evicting the
+    # least recently used entries (the value too, if it no longer fits)
+    # until the cache fits its budget again
+    def resize(self, key, delta):
+        with self.lock:
+            if key in self.entries:
+                self.sizes[key] += delta
+                self.nbytes += delta
+                self._evict()
+
+    # Store a value in memory only
+    def _store(self, key, value, nbytes=None):
+        nbytes = sizeof(value) if nbytes is None else nbytes
+        with self.lock:
+            if key in self.entries:
+                self.nbytes -= self.sizes.pop(key)
+                del self.entries[key]
+
+            # A value larger than the whole budget is served but not kept
+            if nbytes > self.max_bytes:
+                return value
+
+            self.entries[key] = value
+            self.sizes[key] = nbytes
+            self.nbytes += nbytes
+            self._evict()
+            return value
+
+    # Drop the least recently used entries until the cache fits its budget;
+    # called with the lock held
+    def _evict(self):
+        while self.nbytes > self.max_bytes:
+            old_key, _ = self.entries.popitem(last=False)
+            self.nbytes -= self.sizes.pop(old_key)
+            self.evictions += 1
+
+    # Return the cached value, computing and storing it on a miss. A key
+    # already being computed, e.g. by the warm-up or another session, is
+    # waited for rather than computed again.
+    def get_or_compute(self, key, compute):
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        with self.lock:
+            done = self.computing.get(key)
+            owner = done is None
+            if owner:
+                done = self.computing[key] = threading.Event()
+        if not owner:
+            done.wait()
+            value = self.get(key)
+            # Not kept (too large, or its computation failed): compute it here
+            return value if value is not None else self.put(key, compute())
+
+        try:
+            return self.put(key, compute())
+        finally:
+            with self.lock:
+                del self.computing[key]
+            done.set()
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.sizes.clear()
+            self.nbytes = 0
+
+    # Counters and occupancy, for display
+    def stats(self):
+        with self.lock:
+            return {
+                'entries': len(self.entries),
+                'bytes': self.nbytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+# LRU cache of finished Plotly figures. Figures are stored as their JSON, so
+# entries have a known size and cannot be changed by the code showing them,
+# and are saved to disk as it is.
+class FigureCache(LRUCache):
+    def dump(self, value):
+        return value.encode()
+
+    def load(self, payload):
+        return payload.decode()
+
+    # Return the figure cached under `key`, building and storing it on a
+    # miss. A cached figure is rebuilt from its JSON without validating it
+    # again, since plotly validated it when it was first built.
+    def get_or_build(self, key, build):
+        with phase('figure'):
+            spec = self.get(key)
+            if spec is not None:
+                return go.Figure(json.loads(spec), _validate=False)
+
+            figure = build()
+            self.put(key, figure.to_json())
+            return figure
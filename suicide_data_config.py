@@ -0,0 +1,79 @@
+# Runtime settings of the Global Suicide Trends Dashboard
+#
+# Every setting can be overridden with an environment variable named after
+# it with a DASHBOARD_ prefix, e.g. DASHBOARD_FILTER_CACHE_MB=256.
+
+import json
+import os
+
+
+# Read a setting from the environment, falling back to its default
+def _setting(name, default, cast=str):
+    value = os.environ.get(f"DASHBOARD_{name}")
+    return default if value is None else cast(value)
+
+
+# Memory budget of the per-selection filter result cache, in megabytes
+FILTER_CACHE_MB = _setting('FILTER_CACHE_MB', 64, int)
+
+# Memory budget of the finished figure cache, in megabytes
+FIGURE_CACHE_MB = _setting('FIGURE_CACHE_MB', 64, int)
+
+# Memory budget of the row orders the dataset view is sorted by, one per
+# column over the whole dataset, in megabytes
+SORT_CACHE_MB = _setting('SORT_CACHE_MB', 128, int)
+
+# Size budget of the disk cache of filter results and figures, which
+# survives restarts, in megabytes; 0 disables it
+DISK_CACHE_MB = _setting('DISK_CACHE_MB', 512, int)
+
+# Directory of the disk cache; empty for data_store/cache
+DISK_CACHE_DIR = _setting('DISK_CACHE_DIR', '')
+
+# Filter combinations computed in the background when the data is loaded,
+# besides the default view, as a JSON list of objects with any of 'years'
+# ([first, last]), 'sex', 'age', 'generation' and 'countries' (a list,
+# "default" or "all"); missing keys take their default view value, e.g.
+# DASHBOARD_WARMUP_SELECTIONS='[{"countries": "all"}, {"sex": "female"}]'
+WARMUP_SELECTIONS = _setting('WARMUP_SELECTIONS', [{'countries': 'all'}], json.loads)
+
+# 1 shows the per-section timing and memory panel in the sidebar of every
+# session; a session can also show it with ?debug=1 in its URL
+DEBUG_PANEL = _setting('DEBUG_PANEL', 0, int)
+
+# JSON lines file every session appends its per-section timing and memory
+# records to; empty records nothing
+PROFILE_LOG = _setting('PROFILE_LOG', '')
+
+# 1 records the peak memory of each section with tracemalloc, which slows
+# every allocation of the process down (several times over, for figure
+# construction) while any section is recorded; 0 records times and payloads
+# only. Sessions showing the debug panel through ?debug=1 alone never record
+# memory.
+PROFILE_MEMORY = _setting('PROFILE_MEMORY', 0, int)
+
+# Rows per page of the paged dataset view
+DATASET_PAGE_SIZE = _setting('DATASET_PAGE_SIZE', 100, int)
+
+# Most rows the dataset view sends when it is not paged; 0 sends them all
+DATASET_ROW_CAP = _setting('DATASET_ROW_CAP', 10000, int)
+
+# Number of countries above which the country line chart is drawn with WebGL
+# lines and no markers
+LINE_WEBGL_COUNTRIES = _setting('LINE_WEBGL_COUNTRIES', 20, int)
+
+# Countries the line chart keeps past that threshold, summing the rest into
+# a single "Other" line; 0 keeps every country
+LINE_TOP_COUNTRIES = _setting('LINE_TOP_COUNTRIES', 0, int)
+
+# Number of countries above which the GDP bubble chart is drawn with WebGL
+BUBBLE_WEBGL_COUNTRIES = _setting('BUBBLE_WEBGL_COUNTRIES', 50, int)
+
+# Engine answering the sidebar filters and the section rollups: 'pandas'
+# (the in-memory Dataset), 'duckdb' (SQL on an embedded DuckDB database) or
+# 'polars' (Polars LazyFrames collected together)
+QUERY_ENGINE = _setting('QUERY_ENGINE', 'pandas')
+
+# Parquet or DuckDB file of the cleaned rows the DuckDB engine queries;
+# empty for the columnar store
+DUCKDB_SOURCE = _setting('DUCKDB_SOURCE', '')
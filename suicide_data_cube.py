@@ -0,0 +1,473 @@
+# Pre-aggregated data cube for the Global Suicide Trends Dashboard
+#
+# The cube holds one cell per country, year, sex, age group and generation.
+# Every measure is stored as a sum, together with the number of source rows
+# behind the cell, so cells can be rolled up along any subset of the keys
+# and averages of the source columns stay exact.
+
+import numpy as np
+import pandas as pd
+
+from suicide_data_geo import country_iso3
+
+# Keys of a cube cell
+CUBE_KEYS = ['country', 'year', 'sex', 'age', 'generation']
+
+# Summed measures of a cube cell, with the source column each is built from
+CUBE_MEASURES = {
+    'suicides_no': 'suicides_no',
+    'population': 'population',
+    'rate_sum': 'suicides/100k pop',
+    'gdp_per_capita_sum': 'gdp_per_capita ($)',
+    'gdp_for_year_sum': 'gdp_for_year ($)',
+}
+
+# Columns summed when cells are rolled up
+MEASURE_COLUMNS = list(CUBE_MEASURES) + ['rows']
+
+
+# Keep only the rows with a usable population and suicide count
+def drop_unusable_rows(df):
+    return df[
+        df['population'].notna() &
+        df['suicides_no'].notna() &
+        (df['population'] > 0)
+    ].reset_index(drop=True)
+
+
+# Aggregate the (cleaned) row-level dataset into the cube
+def build_cube(df):
+    cube = df.groupby(CUBE_KEYS, observed=True).agg(
+        **{name: (column, 'sum') for name, column in CUBE_MEASURES.items()},
+        rows=('suicides_no', 'size'),
+    ).reset_index()
+    return cube
+
+
+# Keep the rows or cells matching the sidebar filters
+def filter_frame(frame, year_range, sex, age, generation, countries):
+    mask = (
+        frame['country'].isin(countries) &
+        (frame['year'] >= year_range[0]) &
+        (frame['year'] <= year_range[1])
+    )
+
+    # 'All' leaves the corresponding column unfiltered
+    if sex != 'All':
+        mask &= frame['sex'] == sex
+    if age != 'All':
+        mask &= frame['age'] == age
+    if generation != 'All':
+        mask &= frame['generation'] == generation
+
+    return frame[mask]
+
+
+# Roll cube cells up to the given keys, summing every measure they carry
+def rollup(cube, keys):
+    measures = [col for col in MEASURE_COLUMNS if col in cube.columns]
+    return cube.groupby(keys, observed=True)[measures].sum().reset_index()
+
+
+# Average of a source column over the rows behind each cell, e.g.
+# mean_of(cells, 'rate_sum') is the mean 'suicides/100k pop'
+def mean_of(cells, measure):
+    return cells[measure] / cells['rows']
+
+
+# One integer per row combining the given keys, ordered like the rows sorted
+# by them (labels by category, years by value from first_year on)
+def composite_keys(frame, keys, first_year=0, n_years=1):
+    composite = np.zeros(len(frame), dtype=np.int64)
+    for col in keys:
+        if col == 'year':
+            values, size = frame['year'].to_numpy().astype(np.int64) - first_year, n_years
+        else:
+            values, size = frame[col].cat.codes.to_numpy(), len(frame[col].cat.categories)
+        composite = composite * size + values
+    return composite
+
+
+# Merge the rows of `new` into `frame`, both sorted by unique `keys` and with
+# the same label categories: rows of `new` already in `frame` add their
+# measures to it, the others are inserted in order. Returns the merged
+# read-only frame and the (sorted) positions of the inserted rows in it.
+def merge_sorted(frame, new, keys, measures):
+    first_year, n_years = 0, 1
+    if 'year' in keys and len(frame) + len(new):
+        years = np.concatenate([frame['year'].to_numpy(), new['year'].to_numpy()])
+        first_year, n_years = int(years.min()), int(years.max()) - int(years.min()) + 1
+    old_keys = composite_keys(frame, keys, first_year, n_years)
+    new_keys = composite_keys(new, keys, first_year, n_years)
+
+    pos = np.searchsorted(old_keys, new_keys)
+    found = pos < len(old_keys)
+    found[found] = old_keys[pos[found]] == new_keys[found]
+    inserted = pos[~found]
+
+    columns = {}
+    for col in frame.columns:
+        values, new_values = frame[col], new[col]
+        if values.dtype.name == 'category':
+            codes = np.insert(values.cat.codes.to_numpy(), inserted,
+                              new_values.cat.codes.to_numpy()[~found])
+            columns[col] = pd.Categorical.from_codes(read_only(codes), dtype=values.dtype)
+            continue
+
+        values, new_values = values.to_numpy(), new_values.to_numpy()
+        if col in measures:
+            values = values.copy()
+            values[pos[found]] += new_values[found].astype(values.dtype)
+        columns[col] = read_only(np.insert(values, inserted, new_values[~found]))
+
+    return (pd.DataFrame(columns, copy=False),
+            read_only(inserted + np.arange(len(inserted))))
+
+
+# Keys of a cell in the year prefix index: a cube cell without its year
+CELL_KEYS = ['country', 'sex', 'age', 'generation']
+
+# Measures kept as running totals over the years
+PREFIX_MEASURES = ['suicides_no', 'population', 'rate_sum', 'rows']
+
+
+# Type of the running totals of a measure: int64 for counts and float64
+# otherwise, whatever the measure is stored as, since totals over decades of
+# a large country's population overflow int32
+def total_dtype(dtype):
+    return np.dtype(np.int64) if dtype.kind in 'iub' else np.dtype(np.float64)
+
+
+# Running totals of the cube measures over the years, per country, sex, age
+# group and generation. Row k of each prefix array holds the totals of all
+# years before first_year + k, so the totals of any year range come from two
+# lookups per cell, however many years or rows are loaded.
+class YearPrefixIndex:
+    def __init__(self, cube):
+        grouped = cube.groupby(CELL_KEYS, observed=True)
+        self.cells = freeze_frame(grouped.size().reset_index()[CELL_KEYS])
+        self.first_year = int(cube['year'].min())
+        self.n_years = int(cube['year'].max()) - self.first_year + 1
+
+        # Place every cube cell at its (year, cell) position
+        year_pos = cube['year'].to_numpy() - self.first_year
+        cell_pos = grouped.ngroup().to_numpy()
+
+        self.prefix = {}
+        for measure in PREFIX_MEASURES:
+            values = cube[measure].to_numpy()
+            dtype = total_dtype(values.dtype)
+            dense = np.zeros((self.n_years, len(self.cells)), dtype=dtype)
+            dense[year_pos, cell_pos] = values
+
+            prefix = np.zeros((self.n_years + 1, len(self.cells)), dtype=dtype)
+            np.cumsum(dense, axis=0, out=prefix[1:])
+            self.prefix[measure] = read_only(prefix)
+
+    # This index with the cells of `delta_cube` (cube cells of new rows, with
+    # the label categories of the extended data) added: the new cells and
+    # years become zero columns and rows carrying the totals around them,
+    # then the running totals of the delta are added to the cells it has
+    # data for, so the history is copied but never aggregated again
+    def extended(self, delta_cube):
+        index = object.__new__(YearPrefixIndex)
+        years = delta_cube['year'].to_numpy()
+        last_year = self.first_year + self.n_years - 1
+        index.first_year = int(years.min(initial=self.first_year))
+        index.n_years = int(years.max(initial=last_year)) - index.first_year + 1
+
+        delta_cells = delta_cube.groupby(CELL_KEYS, observed=True).size().reset_index()
+        index.cells, added = merge_sorted(with_categories(self.cells, delta_cube.dtypes),
+                                          delta_cells[CELL_KEYS], CELL_KEYS, [])
+
+        # Place every delta cell at its (year, cell) position
+        cell_pos = np.searchsorted(composite_keys(index.cells, CELL_KEYS),
+                                   composite_keys(delta_cube, CELL_KEYS))
+        touched, touched_pos = np.unique(cell_pos, return_inverse=True)
+        year_pos = years - index.first_year
+        before = self.first_year - index.first_year
+
+        index.prefix = {}
+        for measure, prefix in self.prefix.items():
+            # Totals stay zero before the old first year and at their last
+            # value after the old last year
+            grown = np.zeros((index.n_years + 1, len(index.cells)),
+                             dtype=total_dtype(prefix.dtype))
+            old = np.insert(prefix, added - np.arange(len(added)), 0, axis=1)
+            grown[before:before + self.n_years + 1] = old
+            grown[before + self.n_years + 1:] = old[-1]
+
+            dense = np.zeros((index.n_years, len(touched)), dtype=grown.dtype)
+            dense[year_pos, touched_pos] = delta_cube[measure].to_numpy()
+            grown[1:, touched] += np.cumsum(dense, axis=0, dtype=grown.dtype)
+            index.prefix[measure] = read_only(grown)
+
+        return index
+
+    # Select the cells matching the sidebar filters other than the years
+    def cell_mask(self, sex, age, generation, countries):
+        mask = self.cells['country'].isin(countries).to_numpy()
+        if sex != 'All':
+            mask &= (self.cells['sex'] == sex).to_numpy()
+        if age != 'All':
+            mask &= (self.cells['age'] == age).to_numpy()
+        if generation != 'All':
+            mask &= (self.cells['generation'] == generation).to_numpy()
+        return mask
+
+    # Totals of the selected cells over the years lo..hi (inclusive), keeping
+    # only the cells with data in that range
+    def totals(self, mask, lo, hi):
+        lo_pos = min(max(lo - self.first_year, 0), self.n_years)
+        hi_pos = min(max(hi - self.first_year + 1, lo_pos), self.n_years)
+
+        totals = self.cells[mask].reset_index(drop=True)
+        for measure, prefix in self.prefix.items():
+            totals[measure] = prefix[hi_pos, mask] - prefix[lo_pos, mask]
+
+        return totals[totals['rows'] > 0].reset_index(drop=True)
+
+
+# Label columns with a posting list per value in the filter index
+POSTING_COLUMNS = ['country', 'sex', 'age', 'generation']
+
+
+# Posting lists of a frame's rows for the sidebar filters: for each country,
+# sex, age group and generation the sorted ids of the rows holding it, and
+# the row ids ordered by year, so the rows of a year range are one slice.
+# Selections are answered by intersecting the lists of the active filters
+# instead of masking the whole frame.
+class FilterIndex:
+    def __init__(self, frame):
+        self.n_rows = len(frame)
+
+        # Each posting list is a span of the column's row order: the rows
+        # holding the value, sorted, at order[start:stop]
+        self.orders, self.spans = {}, {}
+        for col in POSTING_COLUMNS:
+            codes = frame[col].cat.codes.to_numpy()
+            self.orders[col] = read_only(np.argsort(codes, kind='stable'))
+            categories = frame[col].cat.categories
+            counts = np.bincount(codes[codes >= 0], minlength=len(categories))
+            self.spans[col] = _spans(categories, counts, self.n_rows)
+
+        years = frame['year'].to_numpy()
+        self.year_order = read_only(np.argsort(years, kind='stable'))
+        self.sorted_years = read_only(years[self.year_order])
+
+    # Index of `frame`, the indexed frame with the rows at the sorted
+    # positions `added` inserted: the ids of the old rows are shifted past
+    # the inserted ones, which are merged into every order and counted into
+    # the spans, so nothing is sorted or counted again but the new rows
+    def extended(self, frame, added):
+        index = object.__new__(FilterIndex)
+        index.n_rows = len(frame)
+        old_ids = np.delete(np.arange(len(frame)), added)
+
+        index.orders, index.spans = {}, {}
+        for col in POSTING_COLUMNS:
+            codes = frame[col].cat.codes.to_numpy()
+            index.orders[col] = read_only(_insert_ordered(old_ids[self.orders[col]], added, codes))
+            categories = frame[col].cat.categories
+            spans = self.spans[col]
+            counts = np.array([stop - start for start, stop in
+                               (spans.get(value, (0, 0)) for value in categories)], dtype=np.int64)
+            new_codes = codes[added]
+            counts += np.bincount(new_codes[new_codes >= 0], minlength=len(categories))
+            index.spans[col] = _spans(categories, counts, index.n_rows)
+
+        years = frame['year'].to_numpy()
+        index.year_order = read_only(_insert_ordered(old_ids[self.year_order], added, years))
+        index.sorted_years = read_only(years[index.year_order])
+        return index
+
+    # Row ids of the values selected in one label column, or None when the
+    # selection covers every value and the column does not need filtering
+    def _selected(self, col, values):
+        order, spans = self.orders[col], self.spans[col]
+        lists = [order[slice(*spans[value])] for value in set(values) if value in spans]
+        if len(lists) == len(spans):
+            return None
+        return np.concatenate(lists) if lists else np.empty(0, dtype=np.intp)
+
+    # Sorted ids of the rows matching the sidebar filters
+    def rows(self, year_range, sex, age, generation, countries):
+        selected = [self._selected('country', countries)]
+        if sex != 'All':
+            selected.append(self._selected('sex', [sex]))
+        if age != 'All':
+            selected.append(self._selected('age', [age]))
+        if generation != 'All':
+            selected.append(self._selected('generation', [generation]))
+
+        # The rows of a year range are a contiguous slice of the year order
+        lo = np.searchsorted(self.sorted_years, year_range[0], 'left')
+        hi = np.searchsorted(self.sorted_years, year_range[1], 'right')
+        if hi - lo < self.n_rows:
+            selected.append(self.year_order[lo:hi])
+
+        selected = [ids for ids in selected if ids is not None]
+        if not selected:
+            return np.arange(self.n_rows)
+        if len(selected) == 1:
+            return np.sort(selected[0])
+
+        # Intersect by counting, for each row, the filters it passes
+        hits = np.zeros(self.n_rows, dtype=np.uint8)
+        for ids in selected:
+            hits[ids] += 1
+        return np.flatnonzero(hits == len(selected))
+
+    # Ids of all the frame's rows ordered by one of its columns; label
+    # columns sort by their categories, i.e. alphabetically or in their
+    # natural order for the age groups and generations. Only the year order
+    # is kept by the index, which is shared by every session; the others are
+    # sorted on each call, and kept by the caller if it wants them.
+    def sort_order(self, frame, column):
+        if column == 'year':
+            return self.year_order
+        values = frame[column]
+        if values.dtype.name == 'category':
+            values = values.cat.codes
+        return read_only(np.argsort(values.to_numpy(), kind='stable'))
+
+    # The given row ids ordered by a column: the column's order restricted to
+    # them, which takes one pass over the order instead of sorting the rows.
+    # The order is taken from `orders`, a cache keyed by column, when given.
+    def sort_rows(self, frame, rows, column, ascending=True, orders=None):
+        if orders is None:
+            order = self.sort_order(frame, column)
+        else:
+            order = orders.get_or_compute(column, lambda: self.sort_order(frame, column))
+        if len(rows) < self.n_rows:
+            selected = np.zeros(self.n_rows, dtype=bool)
+            selected[rows] = True
+            order = order[selected[order]]
+        return order if ascending else order[::-1]
+
+
+# Span of each value of a label column in its row order, from the number of
+# rows holding each category; rows missing the label come first
+def _spans(categories, counts, n_rows):
+    bounds = n_rows - counts.sum() + np.concatenate([[0], np.cumsum(counts)])
+    return {
+        value: (int(bounds[i]), int(bounds[i + 1]))
+        for i, value in enumerate(categories)
+        if counts[i]
+    }
+
+
+# Insert `ids` into `order`, ids sorted by their key, then by id, keeping it
+# so; `keys` holds the key of every id
+def _insert_ordered(order, ids, keys):
+    n = len(keys)
+    ordered = keys[order].astype(np.int64) * n + order
+    inserted = keys[ids].astype(np.int64) * n + ids
+    rank = np.argsort(inserted)
+    return np.insert(order, np.searchsorted(ordered, inserted[rank]), ids[rank])
+
+
+# Mark an array read-only. A Dataset is built once per process and shared by
+# every session, so its arrays are read-only: code modifying them in place
+# fails instead of changing the data under every other session.
+def read_only(array):
+    array.flags.writeable = False
+    return array
+
+
+# Read-only copy of a frame, one block per column so each holds a read-only
+# array; label columns keep their categories over read-only codes. Columns
+# can still be added, so derived frames are built with assign() or copies.
+def freeze_frame(frame):
+    columns = {}
+    for col in frame.columns:
+        values = frame[col]
+        if values.dtype.name == 'category':
+            codes = read_only(values.cat.codes.to_numpy().copy())
+            columns[col] = pd.Categorical.from_codes(codes, dtype=values.dtype)
+        else:
+            columns[col] = read_only(values.to_numpy().copy())
+    return pd.DataFrame(columns, index=frame.index, copy=False)
+
+
+# A frame with its label columns cast to the categories of `dtypes`, e.g.
+# once new countries are added; the same frame when nothing changes. Codes
+# keep their order, since categories are only ever added in sorted order.
+def with_categories(frame, dtypes):
+    changed = [col for col in frame.columns
+               if frame[col].dtype.name == 'category' and frame[col].dtype != dtypes[col]]
+    if not changed:
+        return frame
+    return freeze_frame(frame.astype({col: dtypes[col] for col in changed}))
+
+
+# Take the given rows of a frame, skipping the copy when they are all of them
+def take_rows(frame, rows):
+    return frame if len(rows) == len(frame) else frame.take(rows)
+
+
+# Take the given rows of some columns only, e.g. one page of a table, one
+# column at a time, which is far quicker than iloc on rows and columns. Label
+# columns keep only the categories on the page, since every category would
+# otherwise be serialized with it.
+def take_page(frame, rows, columns):
+    page = {}
+    for col in columns:
+        values = frame[col].take(rows)
+        if values.dtype.name == 'category':
+            values = values.cat.remove_unused_categories()
+        page[col] = values
+    return pd.DataFrame(page, columns=columns)
+
+
+# The loaded dataset with every structure derived from it, all built once
+# and read-only, so a single Dataset can be shared by every session
+class Dataset:
+    def __init__(self, df):
+        self.df = freeze_frame(drop_unusable_rows(df))
+        self.cube = freeze_frame(build_cube(self.df))
+        self.year_index = YearPrefixIndex(self.cube)
+        self.row_index = FilterIndex(self.df)
+        self.cell_index = FilterIndex(self.cube)
+
+        # ISO-3 code of each country, which the map locates countries by
+        self.country_codes = country_iso3(self.df['country'].cat.categories)
+
+    # The Dataset with the rows of `delta` (cleaned rows with the dataset's
+    # columns) appended, updated from this one rather than built again: only
+    # the delta is aggregated, then merged into the cube, the running totals
+    # and the indexes. The result equals a Dataset built from all the rows.
+    def appended(self, delta):
+        # Countries stay sorted, as when the dataset is loaded
+        dtypes = self.df.dtypes.to_dict()
+        dtypes['country'] = pd.CategoricalDtype(sorted(
+            set(self.df['country'].cat.categories) | set(delta['country'].dropna().unique())))
+
+        rows = delta[list(dtypes)].astype(dtypes)
+        for col in ['sex', 'age', 'generation']:
+            # Labels outside the fixed category lists would silently be lost
+            if rows[col].isna().sum() != delta[col].isna().sum():
+                raise ValueError(f"Unexpected values in column {col!r}")
+        rows = drop_unusable_rows(rows)
+
+        data = object.__new__(Dataset)
+        data.df = freeze_frame(pd.concat([with_categories(self.df, dtypes), rows],
+                                         ignore_index=True))
+
+        delta_cube = build_cube(rows)
+        data.cube, added = merge_sorted(with_categories(self.cube, dtypes), delta_cube,
+                                        CUBE_KEYS, MEASURE_COLUMNS)
+        data.year_index = self.year_index.extended(delta_cube)
+        data.row_index = self.row_index.extended(data.df, np.arange(len(self.df), len(data.df)))
+        data.cell_index = self.cell_index.extended(data.cube, added)
+
+        data.country_codes = country_iso3(data.df['country'].cat.categories)
+        return data
+
+    # Source rows matching the sidebar filters
+    def filter_rows(self, *selection):
+        return take_rows(self.df, self.row_index.rows(*selection))
+
+    # Cube cells matching the sidebar filters
+    def filter_cells(self, *selection):
+        return take_rows(self.cube, self.cell_index.rows(*selection))
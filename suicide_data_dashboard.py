@@ -1,26 +1,124 @@
 # Import necessary libraries
+import functools
+import json
+import uuid
+from collections import deque
+
 import streamlit.components.v1 as components
 import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
+import plotly.io as pio
+import pyarrow as pa
 import numpy as np
 
+from suicide_data_aggregates import FilterResult, filter_key, top_country_series
+from suicide_data_config import (BUBBLE_WEBGL_COUNTRIES, DATASET_PAGE_SIZE, DATASET_ROW_CAP,
+                                 DEBUG_PANEL, LINE_TOP_COUNTRIES, LINE_WEBGL_COUNTRIES,
+                                 PROFILE_LOG, PROFILE_MEMORY)
+from suicide_data_cube import take_page
+from suicide_data_geo import MAP_CONFIG
+from suicide_data_live import LiveData
+from suicide_data_profile import (PHASES, SESSION_HISTORY, ProfileLog, add_payload, phase,
+                                  record_section)
+from suicide_data_store import AGE_ORDER, GEN_ORDER
+from suicide_data_warmup import DEFAULT_COUNTRIES
+
 # Set the configuration for the page
 st.set_page_config(
     layout="wide",
     page_title="Global Suicide Trends Dashboard",
 )
 
-# Load data from a cleaned CSV and cache it for performance optimization
-@st.cache_data
-def load_data():
-    df = pd.read_csv('cleaned_suicide_data.csv')
-    return df
+# The data served to every session, shared by the whole process: the
+# dataset, with its aggregate cube and the indexes of its running totals
+# over the years and of the sidebar filters, mapped from the memory-mapped
+# store (built first from the columnar store or the cleaned CSV when it is
+# missing or stale); the engine answering the sidebar filters and section
+# rollups, picked by QUERY_ENGINE; and the caches of the filter results of
+# recent selections and of finished figures, backed by a disk cache that
+# survives restarts, and warmed up in the background with the default view
+# and the popular selections of WARMUP_SELECTIONS. Its frames and arrays
+# are read-only, so no session can modify them for the others. A refreshed
+# CSV is loaded in the background and swapped in with fresh caches.
+@st.cache_resource
+def get_live_data():
+    return LiveData()
+
+
+# Serve this rerun from the current version of the data
+version = get_live_data().current()
+data = version.data
+df = data.df
+engine = version.engine
+filter_cache = version.filter_cache
+figure_cache = version.figure_cache
+
+
+# The JSON lines file every session appends its section records to, when
+# PROFILE_LOG names one
+@st.cache_resource
+def get_profile_log():
+    return ProfileLog(PROFILE_LOG) if PROFILE_LOG else None
+
+
+# Record the time, peak memory and payload size of every section this
+# session runs, when it shows the debug panel (DEBUG_PANEL, or ?debug=1 in
+# the URL) or PROFILE_LOG is set. Memory, whose tracing slows the whole
+# process down, is only recorded when the server asks for it: not for a
+# visitor adding ?debug=1.
+debug_panel = bool(DEBUG_PANEL) or st.query_params.get('debug') == '1'
+profile_log = get_profile_log()
+profile_memory = bool(PROFILE_MEMORY) and (bool(DEBUG_PANEL) or profile_log is not None)
+profile_session = st.session_state.setdefault('profile_session', uuid.uuid4().hex[:12])
+profile_run = st.session_state['profile_run'] = st.session_state.get('profile_run', 0) + 1
+
+
+# Keep a section record for the debug panel and append it to the log. A
+# section recorded before in the same run is being rerun as a fragment.
+def save_profile(record):
+    latest = st.session_state.setdefault('profile_latest', {})
+    previous = latest.get(record['section'])
+    record = {
+        'session': profile_session,
+        'run': profile_run,
+        'fragment': previous is not None and previous['run'] == profile_run,
+        'data_version': (version.manifest['sha256'] or '')[:12],
+        **record,
+    }
+    latest[record['section']] = record
+    st.session_state.setdefault('profile_history', deque(maxlen=SESSION_HISTORY)).append(record)
+    if profile_log is not None:
+        profile_log.write(record)
+
+
+profile_sink = save_profile if debug_panel or profile_log is not None else None
+
 
+# Record every run of a section, including its reruns as a fragment. A
+# fragment rerun, which comes after its full run has ended, also saves the
+# aggregates it computed to the disk cache, as the full run does at its end.
+def profiled(name):
+    def decorate(render):
+        @functools.wraps(render)
+        def run(result, *args, **kwargs):
+            with record_section(name, profile_sink, profile_memory):
+                value = render(result, *args, **kwargs)
+            if st.session_state.get('rendered_run') == profile_run:
+                result.save()
+            return value
+        return run
+    return decorate
+
+
+# Send a chart to the browser, timing its serialization and counting its
+# size when the section is recorded
+def plotly_chart(fig, **kwargs):
+    with phase('serialize'):
+        st.plotly_chart(fig, **kwargs)
+    add_payload(lambda: len(pio.to_json(fig, validate=False)))
 
-# Load the dataset
-df = load_data()
 
 # Set CSS styles for the dashboard
 st.markdown(
@@ -145,8 +243,7 @@ selected_age = st.sidebar.selectbox(
     "Select Age Group", age_options, index=0)
 
 # Define the preferred order for generation display
-gen_order = ['G.I. Generation', 'Silent', 'Boomers',
-             'Generation X', 'Millennials', 'Generation Z']
+gen_order = GEN_ORDER
 
 # Filter available generations
 gen_options = ['All'] + \
@@ -162,9 +259,8 @@ select_all_countries = st.sidebar.checkbox("Select All Countries", value=False)
 # Get a list of all countries
 all_countries = sorted(df['country'].unique())
 
-# Define default countries
-default_countries = ['South Africa', 'Ireland', 'Greece', 'Norway', 'Brazil', 'Nicaragua', 'Austria',
-                     'Uruguay', 'Australia', 'United States', 'Ukraine', 'Republic of Korea', 'Russian Federation']
+# Define default countries, shared with the cache warm-up
+default_countries = DEFAULT_COUNTRIES
 
 # Create a multiselect for country selection
 if select_all_countries:
@@ -189,29 +285,37 @@ if not selected_countries:
     st.sidebar.warning("Please select at least one country.")
     st.stop()
 
-# Filter the DataFrame based on selected filters
-df_filtered = df[
-    (df['country'].isin(selected_countries)) &
-    (df['year'] >= selected_year_range[0]) &
-    (df['year'] <= selected_year_range[1]) &
-    df['population'].notna() &
-    df['suicides_no'].notna() &
-    (df['population'] > 0)
-]
-
-# Apply additional filters for sex based on user selections
-if selected_sex != 'All':
-    df_filtered = df_filtered[df_filtered['sex'] == selected_sex]
-
-# Apply additional filters for age based on user selections
-if selected_age != 'All':
-    df_filtered = df_filtered[df_filtered['age'] == selected_age]
-
-# Apply additional filters for generation based on user selections
-if selected_gen != 'All':
-    df_filtered = df_filtered[df_filtered['generation'] == selected_gen]
-
-if df_filtered.empty:
+# Collect the sidebar selection
+selection = (selected_year_range, selected_sex, selected_age, selected_gen, selected_countries)
+
+# Filter the data based on selected filters, reusing the cached result of the
+# same selection. Widgets that only change how the charts look leave the
+# selection, and so the filtered data and its aggregates, as they are.
+key = filter_key(*selection)
+with record_section('filter', profile_sink, profile_memory), phase('filter'):
+    result = filter_cache.get_or_compute(
+        key, lambda: FilterResult(data, selection, filter_cache, key, engine))
+
+# Show which version of the data is served and how well the caches are doing
+manifest = version.manifest
+st.sidebar.caption(
+    f"Data version {(manifest['sha256'] or 'unknown')[:12]}: {manifest['rows']:,} rows, "
+    f"schema v{manifest['schema_version']}")
+for name, cache, entries in (("Filter cache", filter_cache, "selections"),
+                             ("Figure cache", figure_cache, "figures")):
+    cache_stats = cache.stats()
+    st.sidebar.caption(
+        f"{name}: {cache_stats['hits']:,} hits, {cache_stats['misses']:,} misses, "
+        f"{cache_stats['entries']} {entries}, "
+        f"{cache_stats['bytes'] / 2**20:.1f} / {cache_stats['max_bytes'] / 2**20:.0f} MB")
+if get_live_data().disk_cache is not None:
+    cache_stats = get_live_data().disk_cache.stats()
+    st.sidebar.caption(
+        f"Disk cache: {cache_stats['hits']:,} hits, {cache_stats['misses']:,} misses, "
+        f"{cache_stats['entries']} entries, "
+        f"{cache_stats['bytes'] / 2**20:.1f} / {cache_stats['max_bytes'] / 2**20:.0f} MB")
+
+if result.empty:
     st.warning(
         "No data available for analysis. Please adjust filters and try again.")
     st.stop()
@@ -221,1227 +325,1324 @@ if df_filtered.empty:
 # Key Metrics Section
 # ====================
 
-# Total number of suicides in the filtered dataset
-total_suicides = df_filtered['suicides_no'].sum()
-total_suicides_millions = total_suicides / 1000000
-
-# Total population for the filtered data
-total_population = df_filtered['population'].sum()
-
-# Average suicide rate per 100k population
-average_suicide_rate = (total_suicides / total_population) * 100000
-
-# Separate data by sex
-male_data = df_filtered[df_filtered['sex'] == 'male']
-female_data = df_filtered[df_filtered['sex'] == 'female']
-
-# Total suicide number for each sex
-total_male_suicide = male_data['suicides_no'].sum()
-total_female_suicide = female_data['suicides_no'].sum()
-
-# Suicide rates per 100k population for males and females
-male_suicide_rate = (total_male_suicide /
-                     male_data['population'].sum()) * 100000
-female_suicide_rate = (total_female_suicide /
-                       female_data['population'].sum()) * 100000
-
-# Calculate the suicide rate ratio
-suicide_rate_ratio = male_suicide_rate / \
-    female_suicide_rate if female_suicide_rate > 0 else float('inf')
-
-# Identify the country with the highest average suicide rate
-# If the filtered dataframe has zero rows, it simply sets the result to "N/A"
-highest_suicide_country = df_filtered.groupby(
-    'country')['suicides/100k pop'].mean().idxmax() if not df_filtered.empty else "N/A"
-
-# Set the title for the metrics section
-st.subheader("Metrics")
-
-# Create four columns for displaying metrics
-col1, col2, col3, col4 = st.columns(4)
-
-# Function to display trend arrows and numbers for metrics
-def trend_arrow_display(df, year_col, value_col, year_min, year_max):
-    try:
-        # Get data for the starting year and ending year
-        start_data = df[df[year_col] == year_min]
-        end_data = df[df[year_col] == year_max]
-
-        # If either starting or ending data is empty, return an empty strin
-        if start_data.empty or end_data.empty:
-            return ""
-
-        # Calculate the change in suicide rates
-        if value_col == 'suicides_no':
-            # If the column is 'suicides_no', sum suicides in both years
-            start_value = start_data['suicides_no'].sum()
-            end_value = end_data['suicides_no'].sum()
-        elif value_col == 'suicides/100k pop':
-            # If the column is 'suicides/100k pop', calculate the suicide rate per 100k
-            start_value = (start_data['suicides_no'].sum(
-            ) / start_data['population'].sum()) * 100000
-            end_value = (end_data['suicides_no'].sum() /
-                         end_data['population'].sum()) * 100000
-        elif value_col == 'ratio':
-            # If the column is 'ratio', calculate the gender ratio change
-            start_male = start_data[start_data['sex']
-                                    == 'male']['suicides_no'].sum()
-            start_female = start_data[start_data['sex']
-                                      == 'female']['suicides_no'].sum()
-            end_male = end_data[end_data['sex'] == 'male']['suicides_no'].sum()
-            end_female = end_data[end_data['sex']
-                                  == 'female']['suicides_no'].sum()
-
-            start_value = start_male / start_female if start_female > 0 else 0
-            end_value = end_male / end_female if end_female > 0 else 0
-
-        # If the start value is zero, return an empty string
-        if start_value == 0:
-            return ""
-
-        # Calculate the percentage change in the value
-        change = ((end_value - start_value) / start_value) * 100
-
-        # Determine the arrow, color and background color based on the change
-        arrow = "↑" if change > 0 else "↓"
-        color = "#ff6ba1" if change > 0 else "#5A87E7"
-        bg_color = "rgba(255, 165,190 , 0.1)" if change > 0 else "rgba(160, 200, 255, 0.1)"
-        return f"<span style='font-size:0.9rem; color:{color}; background-color:{bg_color}; padding:4px 8px; border-radius:4px;'>{arrow} {abs(change):.2f}%</span>"
-    except:
-        # In case of any error, return an empty string
+# Function to display the trend arrow and percentage change of a metric,
+# or nothing when the metric has no trend
+def trend_arrow_display(change):
+    if pd.isna(change):
         return ""
 
+    # Determine the arrow, color and background color based on the change
+    arrow = "↑" if change > 0 else "↓"
+    color = "#ff6ba1" if change > 0 else "#5A87E7"
+    bg_color = "rgba(255, 165,190 , 0.1)" if change > 0 else "rgba(160, 200, 255, 0.1)"
+    return f"<span style='font-size:0.9rem; color:{color}; background-color:{bg_color}; padding:4px 8px; border-radius:4px;'>{arrow} {abs(change):.2f}%</span>"
+
+
+# Render the Metrics section. Like every section below, it is a fragment: a
+# widget inside it reruns only that section, from the cached filter result of
+# the last full run, while sidebar changes still rerun the whole script
+@st.fragment
+@profiled('metrics')
+def metrics_section(result):
+    # Every card value with the change shown by its trend arrow, computed in
+    # one pass
+    metrics = result.get('headline_metrics')
+    total_suicides = metrics.at['total_suicides', 'value']
+    total_suicides_millions = total_suicides / 1000000
+    average_suicide_rate = metrics.at['average_rate', 'value']
+
+    # Set the title for the metrics section
+    st.subheader("Metrics")
+
+    # Create four columns for displaying metrics
+    col1, col2, col3, col4 = st.columns(4)
+
+    # Display for the first metric : Total suicides
+    with col1:
+        trend_arrow = trend_arrow_display(metrics.at['total_suicides', 'change'])
+
+        display_value = f"{total_suicides_millions:.2f}M" if total_suicides >= 1000000 else f"{
+            total_suicides:,.0f}"
+
+        # Render total suicides in millions with a trend arrow
+        st.markdown(
+            f'''
+            <div class="metric-container">
+                <div class="metric-value">{display_value}</div>
+                <div class='trend-indicator'>{trend_arrow}</div>
+                <div class="metric-title">Total Suicides</div>
+            </div>
+            ''',
+            unsafe_allow_html=True
+        )
 
-# Get the selected year range
-year_min, year_max = selected_year_range
+    # Display for the second metric : Average suicide rate
+    with col2:
+        trend_arrow = trend_arrow_display(metrics.at['average_rate', 'change'])
 
-# Display for the first metric : Total suicides
-with col1:
-    trend_arrow = trend_arrow_display(
-        df_filtered, 'year', 'suicides_no', year_min, year_max)
+        # Render average suicide rate with a trend arrow
+        st.markdown(
+            f'''
+            <div class="metric-container">
+                <div class="metric-value">{average_suicide_rate:.2f}</div>
+                <div class="trend-indicator">{trend_arrow}</div>
+                <div class="metric-title">Avg Suicide Rate (per 100k)</div>
+            </div>
+            ''',
+            unsafe_allow_html=True
+        )
 
-    display_value = f"{total_suicides_millions:.2f}M" if total_suicides >= 1000000 else f"{
-        total_suicides:,.0f}"
+    # Display for the third metric : Gender ratio
+    with col3:
+        trend_arrow = trend_arrow_display(metrics.at['gender_ratio', 'change'])
 
-    # Render total suicides in millions with a trend arrow
-    st.markdown(
-        f'''
-        <div class="metric-container">
-            <div class="metric-value">{display_value}</div>
-            <div class='trend-indicator'>{trend_arrow}</div>
-            <div class="metric-title">Total Suicides</div>
-        </div>
-        ''',
-        unsafe_allow_html=True
-    )
+        # Display ratio as "N/A" if either male or female suicides is 0
+        suicide_rate_ratio = metrics.at['gender_ratio', 'value']
+        if pd.isna(suicide_rate_ratio):
+            ratio_text = "N/A"
+        else:
+            ratio_text = f"{suicide_rate_ratio:.2f}:1"
 
-# Display for the second metric : Average suicide rate
-with col2:
-    trend_arrow = trend_arrow_display(
-        df_filtered, 'year', 'suicides/100k pop', year_min, year_max)
-
-    # Render average suicide rate with a trend arrow
-    st.markdown(
-        f'''
-        <div class="metric-container">
-            <div class="metric-value">{average_suicide_rate:.2f}</div>
-            <div class="trend-indicator">{trend_arrow}</div>
-            <div class="metric-title">Avg Suicide Rate (per 100k)</div>
-        </div>
-        ''',
-        unsafe_allow_html=True
-    )
+        # Render ratio with trend arrow
+        st.markdown(
+            f'''
+            <div class="metric-container">
+                <div class="metric-value">{ratio_text}</div>
+                <div class="trend-indicator">{trend_arrow}</div>
+                <div class="metric-title">Male : Female</div>
+            </div>
+            ''',
+            unsafe_allow_html=True
+        )
 
-# Display for the third metric : Gender ratio
-with col3:
-    trend_arrow = trend_arrow_display(
-        df_filtered, 'year', 'ratio', year_min, year_max)
+    # Country with the highest average suicide rate, "N/A" when there is none
+    highest_suicide_country = metrics.at['highest_rate', 'label']
+    highest_rate = metrics.at['highest_rate', 'value']
 
-    # Display ratio as "N/A" if either male or female suicides is 0
-    if total_male_suicide == 0 or total_female_suicide == 0:
-        ratio_text = "N/A"
-    else:
-        ratio_text = f"{suicide_rate_ratio:.2f}:1"
-
-    # Render ratio with trend arrow
-    st.markdown(
-        f'''
-        <div class="metric-container">
-            <div class="metric-value">{ratio_text}</div>
-            <div class="trend-indicator">{trend_arrow}</div>
-            <div class="metric-title">Male : Female</div>
-        </div>
-        ''',
-        unsafe_allow_html=True
-    )
+    # Display for the fourth metric : Highest suicide rate country
+    with col4:
+        # Adjust font size based on country name length
+        font_size = "2rem" if len(highest_suicide_country) <= 10 else "1.6rem"
 
-# Calculate highest average suicide rate by country
-country_rates = df_filtered.groupby('country')['suicides/100k pop'].mean()
+        # Display highest rate only if country is not "N/A"
+        if highest_suicide_country != "N/A":
+            rate_display = f'<div class="trend-indicator highest-rate">{
+                highest_rate:.2f}/100k</div>'
+        else:
+            rate_display = '<div class="trend-indicator highest-rate">N/A</div>'
+
+        # Render highest suicide rate country with value
+        st.markdown(
+            f'''
+                <div class="metric-container">
+                <div class="metric-value" style="font-size: {font_size};">{highest_suicide_country}</div>
+                {rate_display}
+                <div class="metric-title">Highest Suicide Rate Country</div>
+            </div>
+            ''',
+            unsafe_allow_html=True
+        )
 
-# If data is available, find the country with the highest rate
-if not df_filtered.empty:
-    highest_suicide_country = country_rates.idxmax()
-    highest_rate = country_rates.max()
-else:
-    highest_suicide_country = "N/A"
-    highest_rate = 0
-
-# Display for the fourth metric : Highest suicide rate country
-with col4:
-    # Adjust font size based on country name length
-    font_size = "2rem" if len(highest_suicide_country) <= 10 else "1.6rem"
-
-    # Display highest rate only if country is not "N/A"
-    if highest_suicide_country != "N/A":
-        rate_display = f'<div class="trend-indicator highest-rate">{
-            highest_rate:.2f}/100k</div>'
-    else:
-        rate_display = '<div class="trend-indicator highest-rate">N/A</div>'
 
-    # Render highest suicide rate country with value
-    st.markdown(
-        f'''
-            <div class="metric-container">
-            <div class="metric-value" style="font-size: {font_size};">{highest_suicide_country}</div>
-            {rate_display}
-            <div class="metric-title">Highest Suicide Rate Country</div>
-        </div>
-        ''',
-        unsafe_allow_html=True
-    )
+metrics_section(result)
+
 
 # ====================
 # Overview Section
 # ====================
 
-# Set the title for the overview section
-st.subheader("Overview")
-
-# Create two columns
-col1, col2 = st.columns(2)
-
-# Aggregate data by country: total suicides and total population
-map_data = df_filtered.groupby('country').agg(
-    total_suicides=('suicides_no', 'sum'),
-    total_population=('population', 'sum')
-).reset_index()
-
-# Calculate average suicide rate per 100k people
-map_data['avg_rate'] = (map_data['total_suicides'] /
-                        map_data['total_population']) * 100000
+# Render the Overview section
+@st.fragment
+@profiled('overview')
+def overview_section(result):
+    # Set the title for the overview section
+    st.subheader("Overview")
+
+    # Create two columns
+    col1, col2 = st.columns(2)
+
+    # Total suicides, total population and average suicide rate by country
+    map_data = result.get('map_data')
+
+    # --- Geographic Distribution Map ---
+    with col1:
+        st.markdown(
+            """
+                <div class='chart-title'>Geographic Distribution</div>
+            """, unsafe_allow_html=True)
+
+        # Build the chart, or reuse the one cached for the same inputs
+        def build_map():
+            # Create a choropleth map showing average suicide rate by country
+            fig_map = px.choropleth(
+                map_data,
+                locations="iso3",
+                locationmode="ISO-3",
+                color="avg_rate",
+                hover_name="country",
+                hover_data={
+                    'avg_rate': ':.2f',
+                    'total_suicides': ':,',
+                    'iso3': False
+                },
+                color_continuous_scale=COLOR_SEQUENCE_LIGHT_TO_DARK,
+                scope="world",
+                labels={'avg_rate': 'Suicide Rate<br>(per 100k)',
+                        'total_suicides': 'Total Suicides'},
+            )
 
-# --- Geographic Distribution Map ---
-with col1:
-    st.markdown(
-        """
-            <div class='chart-title'>Geographic Distribution</div>
-        """, unsafe_allow_html=True)
+            # Update layout of the map
+            fig_map.update_layout(
+                height=450,
+                geo=dict(
+                    coastlinecolor="#7f8c8d",
+                    projection_type='miller'
+                ),
+                margin=dict(l=0, r=0, t=0, b=0),
+                coloraxis_colorbar=dict(
+                    orientation='h',
+                    yanchor='top',
+                    y=-0.15,
+                    xanchor='center',
+                    x=0.5,
+                    len=0.9,
+                )
+            )
+            return fig_map
+
+        # Build the animated map: a single trace holds the countries and
+        # their names, and each year's frame carries only that year's rates
+        # from the country × year table, rounded to 0.1 and sent as float32,
+        # with one color range for every year
+        def build_map_animation():
+            rates = result.get('country_year_rates')
+            countries = rates.index.astype(str)
+            years = [str(year) for year in rates.columns]
+            values = rates.to_numpy().round(1).astype(np.float32)
+
+            fig_map = go.Figure(
+                data=go.Choropleth(
+                    locations=countries.map(result.country_codes),
+                    z=values[:, 0],
+                    text=countries,
+                    coloraxis='coloraxis',
+                    hovertemplate="<b>%{text}</b><br><br>"
+                                  "Suicide Rate<br>(per 100k)=%{z:.1f}<extra></extra>",
+                ),
+                frames=[go.Frame(name=year, data=[go.Choropleth(z=values[:, i])],
+                                 traces=[0])
+                        for i, year in enumerate(years)],
+            )
 
-    # Create a choropleth map showing average suicide rate by country
-    fig_map = px.choropleth(
-        map_data,
-        locations="country",
-        locationmode="country names",
-        color="avg_rate",
-        hover_name="country",
-        hover_data={
-            'avg_rate': ':.2f',
-            'total_suicides': ':,',
-            'country': False
-        },
-        color_continuous_scale=COLOR_SEQUENCE_LIGHT_TO_DARK,
-        scope="world",
-        labels={'avg_rate': 'Suicide Rate<br>(per 100k)',
-                'total_suicides': 'Total Suicides'},
-    )
+            # Jump straight to a frame; geo traces are redrawn, not tweened
+            def frame_args(duration):
+                return dict(frame=dict(duration=duration, redraw=True),
+                            transition=dict(duration=0), mode='immediate')
+
+            # Update layout of the map, with the play and pause buttons and
+            # the year slider above it
+            fig_map.update_layout(
+                height=450,
+                geo=dict(
+                    coastlinecolor="#7f8c8d",
+                    projection_type='miller'
+                ),
+                margin=dict(l=0, r=0, t=0, b=0),
+                coloraxis=dict(
+                    colorscale=COLOR_SEQUENCE_LIGHT_TO_DARK,
+                    cmin=float(np.nanmin(values)),
+                    cmax=float(np.nanmax(values)),
+                    colorbar=dict(
+                        title='Suicide Rate<br>(per 100k)',
+                        orientation='h',
+                        yanchor='top',
+                        y=-0.15,
+                        xanchor='center',
+                        x=0.5,
+                        len=0.9,
+                    )
+                ),
+                updatemenus=[dict(
+                    type='buttons',
+                    direction='left',
+                    showactive=False,
+                    x=0,
+                    xanchor='left',
+                    y=1,
+                    yanchor='bottom',
+                    pad=dict(b=10),
+                    buttons=[
+                        dict(label='▶', method='animate',
+                             args=[None, dict(frame_args(500), fromcurrent=True)]),
+                        dict(label='❚❚', method='animate',
+                             args=[[None], frame_args(0)]),
+                    ],
+                )],
+                sliders=[dict(
+                    x=0.12,
+                    len=0.88,
+                    y=1,
+                    yanchor='bottom',
+                    pad=dict(b=10),
+                    currentvalue=dict(prefix='Year: '),
+                    steps=[dict(label=year, method='animate',
+                                args=[[year], frame_args(0)])
+                           for year in years],
+                )],
+            )
+            return fig_map
 
-    # Update layout of the map
-    fig_map.update_layout(
-        height=450,
-        geo=dict(
-            coastlinecolor="#7f8c8d",
-            projection_type='miller'
-        ),
-        margin=dict(l=0, r=0, t=0, b=0),
-        coloraxis_colorbar=dict(
-            orientation='h',
-            yanchor='top',
-            y=-0.15,
-            xanchor='center',
-            x=0.5,
-            len=0.9,
-        )
-    )
+        # Show the whole year range, or play it back year by year
+        if st.toggle("Animate by year", value=False, key="map_animated"):
+            fig_map = figure_cache.get_or_build(
+                ('overview', 'map_animation', result.key), build_map_animation)
+        else:
+            fig_map = figure_cache.get_or_build(
+                ('overview', 'map', result.key), build_map)
+
+        # Display the map chart, drawn with the world geometry bundled with
+        # the app rather than fetched from plotly's CDN
+        plotly_chart(fig_map, config=MAP_CONFIG)
+
+    # --- High-Risk Groups Bar Chart ---
+    with col2:
+        # Set title for high-risk group chart
+        st.markdown(
+            """
+                <div class='chart-title'>High-Risk Groups (Top 10)</div>
+            """, unsafe_allow_html=True)
+
+        # Suicide data by country, gender, and age group
+        high_risk_groups = result.get('high_risk_groups')
+
+        # Build the chart, or reuse the one cached for the same inputs
+        def build_high_risk():
+            # Get the top 10 groups with the highest suicide rate
+            top_10_groups = high_risk_groups.nlargest(10, 'calculated_rate')
+
+            # Sort the groups by suicide rate in ascending order
+            top_10_groups = top_10_groups.sort_values(
+                'calculated_rate', ascending=True)
+
+            # Create label for each group:
+            # The label format combines country, capitalized gender, and age group
+            top_10_groups['group_label'] = top_10_groups.apply(
+                lambda row: f"{row['country']}<br>{row['sex'].title()} ({row['age']})",
+                axis=1,
+                result_type='reduce'
+            )
 
-    # Display the map chart
-    st.plotly_chart(fig_map)
+            # Create a horizontal bar chart for top 10 high-risk groups
+            fig_high_risk = px.bar(
+                top_10_groups,
+                y='group_label',
+                x='calculated_rate',
+                text='calculated_rate',
+                color='calculated_rate',
+                labels={
+                    'group_label': '',
+                    'calculated_rate': 'Suicide Rate<br>(per 100k)',
+                },
+                color_continuous_scale=COLOR_SEQUENCE_LIGHT_TO_DARK,
+                orientation='h'
+            )
 
-# --- High-Risk Groups Bar Chart ---
-with col2:
-    # Set title for high-risk group chart
-    st.markdown(
-        """
-            <div class='chart-title'>High-Risk Groups (Top 10)</div>
-        """, unsafe_allow_html=True)
+            # Set text position: all outside except the longest bar
+            text_positions = ['outside'] * (len(top_10_groups) - 1) + ['inside']
+
+            # Customize hover info and trace display
+            fig_high_risk.update_traces(
+                texttemplate='%{text:.2f}',
+                textposition=text_positions,
+                hovertemplate="<b>%{y}</b><br>" +
+                "Suicide Rate: %{x:.2f}/100k<br>" +
+                "Total Suicides: %{customdata[0]:,.0f}<br>" +
+                "Population: %{customdata[1]:,.0f}<extra></extra>",
+                customdata=top_10_groups[['suicides_no', 'population']],
+            )
 
-    # Aggregate suicide data by country, gender, and age group
-    high_risk_groups = df_filtered.groupby(['country', 'sex', 'age']).agg({
-        'suicides_no': 'sum',
-        'population': 'sum',
-        'suicides/100k pop': 'mean'
-    }).reset_index()
-
-    # Calculate suicide rate per 100k for each group
-    high_risk_groups['calculated_rate'] = (
-        high_risk_groups['suicides_no'] / high_risk_groups['population']) * 100000
-
-    # Get the top 10 groups with the highest suicide rate
-    top_10_groups = high_risk_groups.nlargest(10, 'calculated_rate')
-
-    # Sort the groups by suicide rate in ascending order
-    top_10_groups = top_10_groups.sort_values(
-        'calculated_rate', ascending=True)
-
-    # Create label for each group:
-    # The label format combines country, capitalized gender, and age group
-    top_10_groups['group_label'] = top_10_groups.apply(
-        lambda row: f"{row['country']}<br>{row['sex'].title()} ({row['age']})",
-        axis=1,
-        result_type='reduce'
-    )
+            # Update layout of the chart
+            fig_high_risk.update_layout(
+                xaxis_title="",
+                yaxis_title="",
+                showlegend=False,
+                height=450,
+                margin=dict(l=10, r=10, t=0, b=0),
+                coloraxis_colorbar=dict(
+                    orientation='h',
+                    yanchor='top',
+                    y=-0.15,
+                    xanchor='center',
+                    x=0.4,
+                    len=1.2,
+                )
+            )
+            return fig_high_risk
 
-    # Create a horizontal bar chart for top 10 high-risk groups
-    fig_high_risk = px.bar(
-        top_10_groups,
-        y='group_label',
-        x='calculated_rate',
-        text='calculated_rate',
-        color='calculated_rate',
-        labels={
-            'group_label': '',
-            'calculated_rate': 'Suicide Rate<br>(per 100k)',
-        },
-        color_continuous_scale=COLOR_SEQUENCE_LIGHT_TO_DARK,
-        orientation='h'
-    )
+        fig_high_risk = figure_cache.get_or_build(
+            ('overview', 'high_risk', result.key), build_high_risk)
 
-    # Set text position: all outside except the longest bar
-    text_positions = ['outside'] * (len(top_10_groups) - 1) + ['inside']
-
-    # Customize hover info and trace display
-    fig_high_risk.update_traces(
-        texttemplate='%{text:.2f}',
-        textposition=text_positions,
-        hovertemplate="<b>%{y}</b><br>" +
-        "Suicide Rate: %{x:.2f}/100k<br>" +
-        "Total Suicides: %{customdata[0]:,.0f}<br>" +
-        "Population: %{customdata[1]:,.0f}<extra></extra>",
-        customdata=top_10_groups[['suicides_no', 'population']],
-    )
+        # Display the chart
+        plotly_chart(fig_high_risk)
 
-    # Update layout of the chart
-    fig_high_risk.update_layout(
-        xaxis_title="",
-        yaxis_title="",
-        showlegend=False,
-        height=450,
-        margin=dict(l=10, r=10, t=0, b=0),
-        coloraxis_colorbar=dict(
-            orientation='h',
-            yanchor='top',
-            y=-0.15,
-            xanchor='center',
-            x=0.4,
-            len=1.2,
-        )
-    )
 
-    # Display the chart
-    st.plotly_chart(fig_high_risk)
+overview_section(result)
 
 
 # =============================
 # Gender-based analysis section
 # =============================
 
-# Set the title for the gender-based analysis section
-st.subheader("Gender-Based Suicide Analysis (Connected Visualizations)")
-
-# Create two columns
-col1, col2 = st.columns([3, 2])
-
-# Multi-select widget for users to choose which chart types to display
-with col1:
-    chart_types = st.multiselect(
-        'Select chart types to view gender-based suicide data:',
-        ['Bar Chart', 'Area Chart', 'Violin Plot', 'Pie Chart'],
-        default=['Bar Chart', 'Area Chart']
-    )
-
-# Radio buttons for users to choose data type
-with col2:
-    data_type = st.radio(
-        "Select Data Type",
-        ["Total Numbers", "Rate per 100k"],
-        horizontal=True,
-        key="gender_data_type"
-    )
+# Render the Gender section
+@st.fragment
+@profiled('gender')
+def gender_section(result):
+    # Set the title for the gender-based analysis section
+    st.subheader("Gender-Based Suicide Analysis (Connected Visualizations)")
+
+    # Create two columns
+    col1, col2 = st.columns([3, 2])
+
+    # Multi-select widget for users to choose which chart types to display
+    with col1:
+        chart_types = st.multiselect(
+            'Select chart types to view gender-based suicide data:',
+            ['Bar Chart', 'Area Chart', 'Violin Plot', 'Pie Chart'],
+            default=['Bar Chart', 'Area Chart']
+        )
 
-# Prepare base data by grouping by year and sex
-base_data = df_filtered.groupby(['year', 'sex']).agg({
-    'suicides_no': 'sum',
-    'population': 'sum'
-}).reset_index()
-
-# Calculate suicide rate per 100,000 population
-base_data['suicide_rate'] = (
-    base_data['suicides_no'] / base_data['population']) * 100000
-
-# If any chart type is selected
-if chart_types:
-    # Decide layout based on number of selected charts
-    if len(chart_types) <= 2:
-        # For 1–2 charts, show all in one row
-        cols = st.columns(len(chart_types))
-        chart_rows = [cols]
-    else:
-        # For 3–4 charts, use two rows with two columns each
-        row1 = st.columns(2)
-        row2 = st.columns(2)
-        chart_rows = [row1, row2]
-
-    # Loop through selected chart types
-    for i, chart_type in enumerate(chart_types):
-        # Determine row and column index for layout
-        row_index = i // 2
-        col_index = i % 2
-
-        # Display the chart in the appropriate position
-        with chart_rows[row_index][col_index]:
-
-            # ------- Bar Chart -------
-            if chart_type == 'Bar Chart':
-                st.markdown(
-                    "<div class='chart-title'>Gender Distribution (Bar)</div>", unsafe_allow_html=True)
-
-                # Create grouped bar chart
-                fig = px.bar(
-                    base_data,
-                    x='year',
-                    y='suicides_no' if data_type == "Total Numbers" else 'suicide_rate',
-                    color='sex',
-                    barmode='group',
-                    color_discrete_map={
-                        'male': COLOR_SEQUENCE[-1],
-                        'female': COLOR_SEQUENCE[0]
-                    }
-                )
+    # Radio buttons for users to choose data type
+    with col2:
+        data_type = st.radio(
+            "Select Data Type",
+            ["Total Numbers", "Rate per 100k"],
+            horizontal=True,
+            key="gender_data_type"
+        )
 
-                # Customize hover info
-                fig.update_traces(
-                    hovertemplate="<b>%{x}</b><br>" +
-                    "Sex: %{data.name}<br>" +
-                    ("Suicide Rate: %{y:.2f}/100k<br>" if data_type == "Rate per 100k" else "Suicides: %{y:,.0f}<br>") +
-                    "<extra></extra>"
-                )
+    # Base data grouped by year and sex, with the suicide rate per 100,000
+    base_data = result.get('gender_base_data')
 
-                # Update y-axis label
-                fig.update_layout(
-                    yaxis_title="Number of Suicides" if data_type == "Total Numbers" else "Suicide Rate per 100k"
-                )
+    # If any chart type is selected
+    if chart_types:
+        # Decide layout based on number of selected charts
+        if len(chart_types) <= 2:
+            # For 1–2 charts, show all in one row
+            cols = st.columns(len(chart_types))
+            chart_rows = [cols]
+        else:
+            # For 3–4 charts, use two rows with two columns each
+            row1 = st.columns(2)
+            row2 = st.columns(2)
+            chart_rows = [row1, row2]
+
+        # Loop through selected chart types
+        for i, chart_type in enumerate(chart_types):
+            # Determine row and column index for layout
+            row_index = i // 2
+            col_index = i % 2
+
+            # Display the chart in the appropriate position
+            with chart_rows[row_index][col_index]:
+
+                # ------- Bar Chart -------
+                if chart_type == 'Bar Chart':
+                    st.markdown(
+                        "<div class='chart-title'>Gender Distribution (Bar)</div>", unsafe_allow_html=True)
+
+                    # Build the chart, or reuse the one cached for the same inputs
+                    def build_bar():
+                        # Create grouped bar chart
+                        fig = px.bar(
+                            base_data,
+                            x='year',
+                            y='suicides_no' if data_type == "Total Numbers" else 'suicide_rate',
+                            color='sex',
+                            barmode='group',
+                            color_discrete_map={
+                                'male': COLOR_SEQUENCE[-1],
+                                'female': COLOR_SEQUENCE[0]
+                            }
+                        )
 
-                # Display the chart
-                st.plotly_chart(fig, use_container_width=True,
-                                key=f"gender_bar_{i}")
+                        # Customize hover info
+                        fig.update_traces(
+                            hovertemplate="<b>%{x}</b><br>" +
+                            "Sex: %{data.name}<br>" +
+                            ("Suicide Rate: %{y:.2f}/100k<br>" if data_type == "Rate per 100k" else "Suicides: %{y:,.0f}<br>") +
+                            "<extra></extra>"
+                        )
 
-            # ------- Area Chart -------
-            elif chart_type == 'Area Chart':
-                st.markdown(
-                    "<div class='chart-title'>Gender Distribution (Area)</div>", unsafe_allow_html=True)
-
-                # Create area chart
-                fig = px.area(
-                    base_data,
-                    x='year',
-                    y='suicides_no' if data_type == "Total Numbers" else 'suicide_rate',
-                    color='sex',
-                    color_discrete_map={
-                        'male': COLOR_SEQUENCE[-1],
-                        'female': COLOR_SEQUENCE[0]
-                    }
-                )
+                        # Update y-axis label
+                        fig.update_layout(
+                            yaxis_title="Number of Suicides" if data_type == "Total Numbers" else "Suicide Rate per 100k"
+                        )
+                        return fig
+
+                    fig = figure_cache.get_or_build(
+                        ('gender', chart_type, data_type, result.key), build_bar)
+
+                    # Display the chart
+                    plotly_chart(fig, use_container_width=True,
+                                 key=f"gender_bar_{i}")
+
+                # ------- Area Chart -------
+                elif chart_type == 'Area Chart':
+                    st.markdown(
+                        "<div class='chart-title'>Gender Distribution (Area)</div>", unsafe_allow_html=True)
+
+                    # Build the chart, or reuse the one cached for the same inputs
+                    def build_area():
+                        # Create area chart
+                        fig = px.area(
+                            base_data,
+                            x='year',
+                            y='suicides_no' if data_type == "Total Numbers" else 'suicide_rate',
+                            color='sex',
+                            color_discrete_map={
+                                'male': COLOR_SEQUENCE[-1],
+                                'female': COLOR_SEQUENCE[0]
+                            }
+                        )
 
-                # Calculate yearly total suicides for hover information
-                yearly_total = df_filtered.groupby(
-                    'year')['suicides_no'].sum().to_dict()
-
-                # Customize hover info
-                fig.update_traces(
-                    hovertemplate="<b>%{x}</b><br>" +
-                    "Sex: %{data.name}<br>" +
-                    ("Suicide Rate: %{y:.2f}/100k<br>" if data_type == "Rate per 100k" else "Suicides: %{y:,.0f}<br>") +
-                    "Total Suicides: %{customdata:,.0f}<br>" +
-                    "<extra></extra>",
-                    customdata=[yearly_total[year]
-                                for year in base_data['year'].unique()]
-                )
+                        # Yearly total suicides for hover information
+                        yearly_total = result.get('yearly_total')
+
+                        # Customize hover info
+                        fig.update_traces(
+                            hovertemplate="<b>%{x}</b><br>" +
+                            "Sex: %{data.name}<br>" +
+                            ("Suicide Rate: %{y:.2f}/100k<br>" if data_type == "Rate per 100k" else "Suicides: %{y:,.0f}<br>") +
+                            "Total Suicides: %{customdata:,.0f}<br>" +
+                            "<extra></extra>",
+                            customdata=[yearly_total[year]
+                                        for year in base_data['year'].unique()]
+                        )
 
-                # Update y-axis label
-                fig.update_layout(
-                    yaxis_title="Number of Suicides" if data_type == "Total Numbers" else "Suicide Rate per 100k"
-                )
+                        # Update y-axis label
+                        fig.update_layout(
+                            yaxis_title="Number of Suicides" if data_type == "Total Numbers" else "Suicide Rate per 100k"
+                        )
+                        return fig
+
+                    fig = figure_cache.get_or_build(
+                        ('gender', chart_type, data_type, result.key), build_area)
+
+                    # Display the chart
+                    plotly_chart(fig, use_container_width=True,
+                                 key=f"gender_area_{i}")
+
+                # ------- Violin Plot -------
+                elif chart_type == 'Violin Plot':
+                    st.markdown(
+                        "<div class='chart-title'>Gender Distribution (Violin)</div>", unsafe_allow_html=True)
+
+                    # Build the chart, or reuse the one cached for the same inputs
+                    def build_violin():
+                        # Initialize a new plotly figure
+                        fig = go.Figure()
+
+                        # Create violin plot for each gender
+                        for sex in ['male', 'female']:
+                            sex_data = base_data[base_data['sex'] == sex]
+                            value_col = 'suicides_no' if data_type == "Total Numbers" else 'suicide_rate'
+
+                            # Calculate statistical measures for hover info
+                            mean_val = sex_data[value_col].mean()
+                            median_val = sex_data[value_col].median()
+
+                            # Add violin trace
+                            fig.add_trace(go.Violin(
+                                x=[sex.title()] * len(sex_data),
+                                y=sex_data[value_col],
+                                name=sex.title(),
+                                box_visible=True,
+                                meanline_visible=True,
+                                line_color=COLOR_SEQUENCE[-1] if sex == 'male' else COLOR_SEQUENCE[0],
+                                hovertemplate=(
+                                    "<b>%{x}</b><br>" +
+                                    ("Suicides: %{y:,.0f}<br>" if data_type == "Total Numbers"
+                                        else "Rate per 100k: %{y:.2f}<br>") +
+                                    f"Mean: {mean_val:,.2f}<br>" +
+                                    f"Median: {median_val:,.2f}<br>" +
+                                    "<extra></extra>"
+                                )
+                            ))
+
+                        # Update layout
+                        fig.update_layout(
+                            height=380,
+                            margin=dict(l=0, r=0, t=20, b=0),
+                            plot_bgcolor='white',
+                            paper_bgcolor='white',
+                            showlegend=False,
+                            xaxis_title="Gender",
+                            yaxis_title="Number of Suicides" if data_type == "Total Numbers" else "Suicide Rate per 100k"
+                        )
+                        return fig
+
+                    fig = figure_cache.get_or_build(
+                        ('gender', chart_type, data_type, result.key), build_violin)
+
+                    # Display the violin plot
+                    plotly_chart(fig, use_container_width=True,
+                                 key=f"gender_violin_{i}")
+
+                # ------- Pie Chart -------
+                elif chart_type == 'Pie Chart':
+                    st.markdown(
+                        "<div class='chart-title'>Gender Proportion (Pie)</div>", unsafe_allow_html=True)
+
+                    # Build the chart, or reuse the one cached for the same inputs
+                    def build_pie():
+                        # Total suicides by sex
+                        total_by_gender = result.get('total_by_gender')
+
+                        # Create a donut-style pie chart
+                        fig = px.pie(
+                            total_by_gender,
+                            values='suicides_no',
+                            names='sex',
+                            color='sex',
+                            color_discrete_map={
+                                'male': COLOR_SEQUENCE[-1],
+                                'female': COLOR_SEQUENCE[0]
+                            },
+                            hole=0.6,
+                        )
 
-                # Display the chart
-                st.plotly_chart(fig, use_container_width=True,
-                                key=f"gender_area_{i}")
+                        # Customize text and hover info
+                        fig.update_traces(
+                            textposition='inside',
+                            textinfo='label+percent',
+                            textfont=dict(size=14, color='white'),
+                            texttemplate="%{label}<br>%{percent:.2%}",
+                            hovertemplate="<b>%{label}</b><br>" +
+                            "Suicides: %{value:,.0f}<br>" +
+                            "Percentage: %{percent:.2%}<extra></extra>"
+                        )
 
-            # ------- Violin Plot -------
-            elif chart_type == 'Violin Plot':
-                st.markdown(
-                    "<div class='chart-title'>Gender Distribution (Violin)</div>", unsafe_allow_html=True)
-
-                # Initialize a new plotly figure
-                fig = go.Figure()
-
-                # Create violin plot for each gender
-                for sex in ['male', 'female']:
-                    sex_data = base_data[base_data['sex'] == sex]
-                    value_col = 'suicides_no' if data_type == "Total Numbers" else 'suicide_rate'
-
-                    # Calculate statistical measures for hover info
-                    mean_val = sex_data[value_col].mean()
-                    median_val = sex_data[value_col].median()
-
-                    # Add violin trace
-                    fig.add_trace(go.Violin(
-                        x=[sex.title()] * len(sex_data),
-                        y=sex_data[value_col],
-                        name=sex.title(),
-                        box_visible=True,
-                        meanline_visible=True,
-                        line_color=COLOR_SEQUENCE[-1] if sex == 'male' else COLOR_SEQUENCE[0],
-                        hovertemplate=(
-                            "<b>%{x}</b><br>" +
-                            ("Suicides: %{y:,.0f}<br>" if data_type == "Total Numbers"
-                                else "Rate per 100k: %{y:.2f}<br>") +
-                            f"Mean: {mean_val:,.2f}<br>" +
-                            f"Median: {median_val:,.2f}<br>" +
-                            "<extra></extra>"
+                        # Update layout
+                        fig.update_layout(
+                            height=380,
+                            margin=dict(l=0, r=0, t=20, b=0),
+                            legend=dict(
+                                orientation="h",
+                                yanchor="top",
+                                y=-0.1,
+                                xanchor="center",
+                                x=0.5
+                            ),
+                            annotations=[
+                                dict(
+                                    text=f'Total<br>{
+                                        total_by_gender["suicides_no"].sum():,.0f}',
+                                    font_size=16,
+                                    showarrow=False
+                                )
+                            ]
                         )
-                    ))
-
-                # Update layout
-                fig.update_layout(
-                    height=380,
-                    margin=dict(l=0, r=0, t=20, b=0),
-                    plot_bgcolor='white',
-                    paper_bgcolor='white',
-                    showlegend=False,
-                    xaxis_title="Gender",
-                    yaxis_title="Number of Suicides" if data_type == "Total Numbers" else "Suicide Rate per 100k"
-                )
+                        return fig
 
-                # Display the violin plot
-                st.plotly_chart(fig, use_container_width=True,
-                                key=f"gender_violin_{i}")
+                    fig = figure_cache.get_or_build(
+                        ('gender', chart_type, data_type, result.key), build_pie)
 
-            # ------- Pie Chart -------
-            elif chart_type == 'Pie Chart':
-                st.markdown(
-                    "<div class='chart-title'>Gender Proportion (Pie)</div>", unsafe_allow_html=True)
-
-                # Aggregate total suicides by sex
-                total_by_gender = base_data.groupby(
-                    'sex')['suicides_no'].sum().reset_index()
-
-                # Create a donut-style pie chart
-                fig = px.pie(
-                    total_by_gender,
-                    values='suicides_no',
-                    names='sex',
-                    color='sex',
-                    color_discrete_map={
-                        'male': COLOR_SEQUENCE[-1],
-                        'female': COLOR_SEQUENCE[0]
-                    },
-                    hole=0.6,
-                )
+                    # Display the chart
+                    plotly_chart(fig, use_container_width=True,
+                                 key=f"gender_pie_{i}")
 
-                # Customize text and hover info
-                fig.update_traces(
-                    textposition='inside',
-                    textinfo='label+percent',
-                    textfont=dict(size=14, color='white'),
-                    texttemplate="%{label}<br>%{percent:.2%}",
-                    hovertemplate="<b>%{label}</b><br>" +
-                    "Suicides: %{value:,.0f}<br>" +
-                    "Percentage: %{percent:.2%}<extra></extra>"
-                )
+    else:
+        # Display warning if no chart types are selected
+        st.warning("Please select at least one chart type.")
 
-                # Update layout
-                fig.update_layout(
-                    height=380,
-                    margin=dict(l=0, r=0, t=20, b=0),
-                    legend=dict(
-                        orientation="h",
-                        yanchor="top",
-                        y=-0.1,
-                        xanchor="center",
-                        x=0.5
-                    ),
-                    annotations=[
-                        dict(
-                            text=f'Total<br>{
-                                total_by_gender["suicides_no"].sum():,.0f}',
-                            font_size=16,
-                            showarrow=False
-                        )
-                    ]
-                )
 
-                # Display the chart
-                st.plotly_chart(fig, use_container_width=True,
-                                key=f"gender_pie_{i}")
+gender_section(result)
 
-else:
-    # Display warning if no chart types are selected
-    st.warning("Please select at least one chart type.")
 
 # ====================================================
 # Suicide Trends by Age, Country & Generation section
 # ====================================================
 
-# Set the title
-st.subheader(
-    "Suicide Trends by Age, Country & Generation (Connected Visualizations)")
-
-# Create two columns
-col1, col2 = st.columns([3, 2])
-
-
-with col1:
-    # Add a multiselect widget to allow users to choose different chart types
-    chart_types = st.multiselect(
-        "Select visualization perspectives (at least one):",
-        options=[
-            "Country Comparison (Line)",
-            "Generation Analysis (Bar)",
-            "Age Group Distribution (Area)"
-        ],
-        default=["Country Comparison (Line)"],
-        key="temporal_charts"
-    )
-
-# Define the order for age groups
-age_order = ['5-14', '15-24', '25-34', '35-54', '55-74', '75+']
-
-# Create a dictionary to map age groups to their labels
-age_labels = {
-    '5-14': '5-14 years old',
-    '15-24': '15-24 years old',
-    '25-34': '25-34 years old',
-    '35-54': '35-54 years old',
-    '55-74': '55-74 years old',
-    '75+': '75+ years old'
-}
-
-with col2:
-    # Add a radio button selector for data type
-    data_type = st.radio(
-        "Select Data Type",
-        ["Total Numbers", "Rate per 100k"],
-        horizontal=True
-    )
+# Render the Trends section
+@st.fragment
+@profiled('trends')
+def trends_section(result):
+    # Set the title
+    st.subheader(
+        "Suicide Trends by Age, Country & Generation (Connected Visualizations)")
+
+    # Create two columns
+    col1, col2 = st.columns([3, 2])
+
+
+    with col1:
+        # Add a multiselect widget to allow users to choose different chart types
+        chart_types = st.multiselect(
+            "Select visualization perspectives (at least one):",
+            options=[
+                "Country Comparison (Line)",
+                "Generation Analysis (Bar)",
+                "Age Group Distribution (Area)"
+            ],
+            default=["Country Comparison (Line)"],
+            key="temporal_charts"
+        )
 
-# If no chart is selected, show a warning
-if not chart_types:
-    st.warning("Please select at least one visualization type.")
-else:
-    # Create dynamic layout columns based on number of selected charts
-    cols = st.columns([1] * len(chart_types))
-
-    # Iterate through each selected chart type
-    for i, chart_type in enumerate(chart_types):
-        with cols[i]:
-            # ------- Country Comparison (Line) -------
-            if chart_type == "Country Comparison (Line)":
-                st.markdown(
-                    "<div class='chart-title'>Country Comparison (Line)</div>", unsafe_allow_html=True)
-
-                # Group data by year and country
-                country_data = df_filtered.groupby(['year', 'country']).agg({
-                    'suicides_no': 'sum',
-                    'population': 'sum'
-                }).reset_index()
-
-                # Calculate suicide rate or total numbers based on user selection
-                if data_type == "Rate per 100k":
-                    country_data['value'] = (
-                        country_data['suicides_no'] / country_data['population']) * 100000
-                    y_title = "Suicide Rate per 100k"
-                else:
-                    country_data['value'] = country_data['suicides_no']
-                    y_title = "Number of Suicides"
-
-                # Create line chart
-                fig = px.line(
-                    country_data,
-                    x='year',
-                    y='value',
-                    color='country',
-                    markers=True
-                )
+    # Define the order for age groups
+    age_order = AGE_ORDER
+
+    # Create a dictionary to map age groups to their labels
+    age_labels = {
+        '5-14': '5-14 years old',
+        '15-24': '15-24 years old',
+        '25-34': '25-34 years old',
+        '35-54': '35-54 years old',
+        '55-74': '55-74 years old',
+        '75+': '75+ years old'
+    }
 
-                # Create an optional checkbox to show or hide legend
-                show_legend = st.checkbox(
-                    "Show Legend", value=False, key=f"legend_{i}")
+    with col2:
+        # Add a radio button selector for data type
+        data_type = st.radio(
+            "Select Data Type",
+            ["Total Numbers", "Rate per 100k"],
+            horizontal=True
+        )
 
-                fig.update_traces(
-                    hovertemplate="<b>%{data.name}</b><br>" +
-                    "Year: %{x}<br>" +
-                    ("Suicide Rate: %{y:.2f}/100k<br>" if data_type == "Rate per 100k"
-                     else "Suicides: %{y:,}<br>") +
-                    "<extra></extra>"
-                )
+    # If no chart is selected, show a warning
+    if not chart_types:
+        st.warning("Please select at least one visualization type.")
+    else:
+        # Create dynamic layout columns based on number of selected charts
+        cols = st.columns([1] * len(chart_types))
+
+        # Iterate through each selected chart type
+        for i, chart_type in enumerate(chart_types):
+            with cols[i]:
+                # ------- Country Comparison (Line) -------
+                if chart_type == "Country Comparison (Line)":
+                    st.markdown(
+                        "<div class='chart-title'>Country Comparison (Line)</div>", unsafe_allow_html=True)
+
+                    # Create an optional checkbox to show or hide legend
+                    show_legend = st.checkbox(
+                        "Show Legend", value=False, key=f"legend_{i}")
+
+                    # Build the chart, or reuse the one cached for the same inputs
+                    def build_line():
+                        # Data grouped by year and country, with the suicide rate
+                        country_data = result.get('country_series')
+
+                        # Past LINE_WEBGL_COUNTRIES countries, draw WebGL lines
+                        # without markers, keeping only the top countries (by
+                        # the plotted measure) plus an "Other" line when
+                        # LINE_TOP_COUNTRIES is set
+                        n_countries = country_data['country'].nunique()
+                        many_countries = n_countries > LINE_WEBGL_COUNTRIES
+                        other_color = None
+                        if many_countries and 0 < LINE_TOP_COUNTRIES < n_countries:
+                            by = 'suicide_rate' if data_type == "Rate per 100k" else 'suicides_no'
+                            country_data = result.get(
+                                ('top_country_series', LINE_TOP_COUNTRIES, by),
+                                lambda: top_country_series(result, LINE_TOP_COUNTRIES, by))
+                            other_color = {'Other': '#b0b0b0'}
+
+                        # Plot the suicide rate or total numbers based on user selection,
+                        # without modifying the cached data
+                        if data_type == "Rate per 100k":
+                            country_data = country_data.assign(value=country_data['suicide_rate'])
+                            y_title = "Suicide Rate per 100k"
+                        else:
+                            country_data = country_data.assign(value=country_data['suicides_no'])
+                            y_title = "Number of Suicides"
+
+                        # Create line chart
+                        fig = px.line(
+                            country_data,
+                            x='year',
+                            y='value',
+                            color='country',
+                            markers=not many_countries,
+                            render_mode='webgl' if many_countries else 'auto',
+                            color_discrete_map=other_color
+                        )
 
-                # Update layout
-                fig.update_layout(
-                    height=380,
-                    margin=dict(t=0, b=0, l=0, r=0),
-                    xaxis_title="Year",
-                    yaxis_title=y_title,
-                    legend_title="Country",
-                    showlegend=show_legend
-                )
+                        fig.update_traces(
+                            hovertemplate="<b>%{data.name}</b><br>" +
+                            "Year: %{x}<br>" +
+                            ("Suicide Rate: %{y:.2f}/100k<br>" if data_type == "Rate per 100k"
+                             else "Suicides: %{y:,}<br>") +
+                            "<extra></extra>"
+                        )
 
-                # Display the chart
-                st.plotly_chart(fig, use_container_width=True)
+                        # Update layout
+                        fig.update_layout(
+                            height=380,
+                            margin=dict(t=0, b=0, l=0, r=0),
+                            xaxis_title="Year",
+                            yaxis_title=y_title,
+                            legend_title="Country",
+                            showlegend=show_legend
+                        )
+                        return fig
+
+                    fig = figure_cache.get_or_build(
+                        ('trends', chart_type, data_type, show_legend, result.key), build_line)
+
+                    # Display the chart
+                    plotly_chart(fig, use_container_width=True)
+
+                # ------- Generation Analysis (Bar) -------
+                elif chart_type == "Generation Analysis (Bar)":
+                    st.markdown(
+                        "<div class='chart-title'>Suicide Trends by Generation (Bar)</div>", unsafe_allow_html=True)
+
+                    # Create an optional checkbox to show or hide legend
+                    show_legend = st.checkbox(
+                        "Show Legend", value=False, key=f"legend_{i}")
+
+                    # Build the chart, or reuse the one cached for the same inputs
+                    def build_bar():
+                        # Data grouped by year and generation, with the suicide rate
+                        gen_data = result.get('generation_series')
+
+                        # Plot the suicide rate or total numbers based on user selection,
+                        # without modifying the cached data
+                        if data_type == "Rate per 100k":
+                            gen_data = gen_data.assign(value=gen_data['suicide_rate'])
+                            y_title = "Suicide Rate per 100k"
+                        else:
+                            gen_data = gen_data.assign(value=gen_data['suicides_no'])
+                            y_title = "Number of Suicides"
+
+                        # Create a bar chart
+                        fig = px.bar(
+                            gen_data,
+                            x='year',
+                            y='value',
+                            color='generation',
+                            barmode='stack',
+                            color_discrete_sequence=COLOR_SEQUENCE,
+                            category_orders={'generation': gen_order}
+                        )
 
-            # ------- Generation Analysis (Bar) -------
-            elif chart_type == "Generation Analysis (Bar)":
-                st.markdown(
-                    "<div class='chart-title'>Suicide Trends by Generation (Bar)</div>", unsafe_allow_html=True)
-
-                # Group data by year and generation
-                gen_data = df_filtered.groupby(['year', 'generation']).agg({
-                    'suicides_no': 'sum',
-                    'population': 'sum'
-                }).reset_index()
-
-                # Calculate suicide rate or total numbers based on user selection
-                if data_type == "Rate per 100k":
-                    gen_data['value'] = (
-                        gen_data['suicides_no'] / gen_data['population']) * 100000
-                    y_title = "Suicide Rate per 100k"
-                else:
-                    gen_data['value'] = gen_data['suicides_no']
-                    y_title = "Number of Suicides"
-
-                # Create a bar chart
-                fig = px.bar(
-                    gen_data,
-                    x='year',
-                    y='value',
-                    color='generation',
-                    barmode='stack',
-                    color_discrete_sequence=COLOR_SEQUENCE,
-                    category_orders={'generation': gen_order}
-                )
+                        fig.update_traces(
+                            hovertemplate="<b>%{data.name}</b><br>" +
+                            "Year: %{x}<br>" +
+                            ("Suicide Rate: %{y:.2f}/100k<br>" if data_type == "Rate per 100k"
+                             else "Suicides: %{y:,}<br>") +
+                            "<extra></extra>"
+                        )
 
-                # Create an optional checkbox to show or hide legend
-                show_legend = st.checkbox(
-                    "Show Legend", value=False, key=f"legend_{i}")
+                        # Update layout
+                        fig.update_layout(
+                            height=370,
+                            margin=dict(t=0, b=0, l=0, r=0),
+                            xaxis_title="Year",
+                            yaxis_title=y_title,
+                            legend_title="Generation",
+                            legend=dict(
+                                orientation="h",
+                                yanchor="top",
+                                y=-0.3,
+                                xanchor="center",
+                                x=0.5,
+                            ),
+                            showlegend=show_legend
+                        )
+                        return fig
+
+                    fig = figure_cache.get_or_build(
+                        ('trends', chart_type, data_type, show_legend, result.key), build_bar)
+
+                    # Display the chart
+                    plotly_chart(fig, use_container_width=True)
+
+                # ------- Age Group Distribution (Area) -------
+                elif chart_type == "Age Group Distribution (Area)":
+                    st.markdown(
+                        "<div class='chart-title'>Age Trends Over Time (Area)</div>", unsafe_allow_html=True)
+
+                    # Create an optional checkbox to show or hide legend
+                    show_legend = st.checkbox(
+                        "Show Legend", value=False, key=f"legend_{i}")
+
+                    # Build the chart, or reuse the one cached for the same inputs
+                    def build_area():
+                        # Data grouped by year and age, with the suicide rate
+                        age_time_data = result.get('age_series')
+
+                        # Plot the suicide rate or total numbers based on user selection,
+                        # without modifying the cached data
+                        if data_type == "Rate per 100k":
+                            age_time_data = age_time_data.assign(value=age_time_data['suicide_rate'])
+                            y_title = "Suicide Rate per 100k"
+                        else:
+                            age_time_data = age_time_data.assign(value=age_time_data['suicides_no'])
+                            y_title = "Number of Suicides"
+
+                        # Create area chart
+                        fig = px.area(
+                            age_time_data,
+                            x='year',
+                            y='value',
+                            color='age',
+                            category_orders={'age': age_order},
+                            color_discrete_sequence=COLOR_SEQUENCE,
+                        )
 
-                fig.update_traces(
-                    hovertemplate="<b>%{data.name}</b><br>" +
-                    "Year: %{x}<br>" +
-                    ("Suicide Rate: %{y:.2f}/100k<br>" if data_type == "Rate per 100k"
-                     else "Suicides: %{y:,}<br>") +
-                    "<extra></extra>"
-                )
+                        # Customize hover info
+                        fig.update_traces(
+                            hovertemplate="%{data.name}</br>" +
+                            ("Suicide Rate: %{y:.2f}/100k<br>" if data_type ==
+                             "Rate per 100k" else "Suicides: %{y:,}<br>") + "<extra></extra>"
+                        )
 
-                # Update layout
-                fig.update_layout(
-                    height=370,
-                    margin=dict(t=0, b=0, l=0, r=0),
-                    xaxis_title="Year",
-                    yaxis_title=y_title,
-                    legend_title="Generation",
-                    legend=dict(
-                        orientation="h",
-                        yanchor="top",
-                        y=-0.3,
-                        xanchor="center",
-                        x=0.5,
-                    ),
-                    showlegend=show_legend
-                )
+                        # Update layout
+                        fig.update_layout(
+                            height=370,
+                            margin=dict(t=0, b=0, l=0, r=0),
+                            xaxis_title="Year",
+                            yaxis_title=y_title,
+                            legend_title="Age Group",
+                            hovermode='x unified',
+                            hoverlabel=dict(bgcolor="white"),
+                            legend=dict(
+                                orientation="h",
+                                yanchor="top",
+                                y=-0.3,
+                                xanchor="center",
+                                x=0.5
+                            ),
+                            showlegend=show_legend
+                        )
+                        return fig
 
-                # Display the chart
-                st.plotly_chart(fig, use_container_width=True)
+                    fig = figure_cache.get_or_build(
+                        ('trends', chart_type, data_type, show_legend, result.key), build_area)
 
-            # ------- Age Group Distribution (Area) -------
-            elif chart_type == "Age Group Distribution (Area)":
-                st.markdown(
-                    "<div class='chart-title'>Age Trends Over Time (Area)</div>", unsafe_allow_html=True)
-
-                # Group data by year and age
-                age_time_data = df_filtered.groupby(['year', 'age']).agg({
-                    'suicides_no': 'sum',
-                    'population': 'sum'
-                }).reset_index()
-
-                # Calculate suicide rate if selected
-                if data_type == "Rate per 100k":
-                    age_time_data['value'] = (
-                        age_time_data['suicides_no'] / age_time_data['population']) * 100000
-                    y_title = "Suicide Rate per 100k"
-                else:
-                    age_time_data['value'] = age_time_data['suicides_no']
-                    y_title = "Number of Suicides"
-
-                # Create area chart
-                fig = px.area(
-                    age_time_data,
-                    x='year',
-                    y='value',
-                    color='age',
-                    category_orders={'age': age_order},
-                    color_discrete_sequence=COLOR_SEQUENCE,
-                )
+                    # Display the chart
+                    plotly_chart(fig, use_container_width=True)
 
-                # Customize hover info
-                fig.update_traces(
-                    hovertemplate="%{data.name}</br>" +
-                    ("Suicide Rate: %{y:.2f}/100k<br>" if data_type ==
-                     "Rate per 100k" else "Suicides: %{y:,}<br>") + "<extra></extra>"
-                )
 
-                # Create an optional checkbox to show or hide legend
-                show_legend = st.checkbox(
-                    "Show Legend", value=False, key=f"legend_{i}")
-
-                # Update layout
-                fig.update_layout(
-                    height=370,
-                    margin=dict(t=0, b=0, l=0, r=0),
-                    xaxis_title="Year",
-                    yaxis_title=y_title,
-                    legend_title="Age Group",
-                    hovermode='x unified',
-                    hoverlabel=dict(bgcolor="white"),
-                    legend=dict(
-                        orientation="h",
-                        yanchor="top",
-                        y=-0.3,
-                        xanchor="center",
-                        x=0.5
-                    ),
-                    showlegend=show_legend
-                )
+trends_section(result)
 
-                # Display the chart
-                st.plotly_chart(fig, use_container_width=True)
 
 # ====================
 # Economic and Demographic Factors Behind Suicide Rates section
 # ====================
 
-# Set the title
-st.subheader(
-    "Economic and Demographic Factors Behind Suicide Rates")
+# Render the Economic section
+@st.fragment
+@profiled('economic')
+def economic_section(result):
+    # Set the title
+    st.subheader(
+        "Economic and Demographic Factors Behind Suicide Rates")
+
+    # Create two columns
+    col1, col2 = st.columns([4, 5])
+
+    with col1:
+        st.markdown(
+            """
+            <div class='chart-title'>Suicide Flow by GDP Level and Age</div>
+            """,
+            unsafe_allow_html=True
+        )
 
-# Create two columns
-col1, col2 = st.columns([4, 5])
+        # Build the chart, or reuse the one cached for the same inputs
+        def build_sankey():
+            # Nodes of the diagram (GDP levels, age groups, and suicide rate
+            # levels) and its links GDP → Age and Age → Suicide Rate, as arrays
+            flows = result.get('sankey_flows')
+            gdp_levels = flows['gdp_levels']
+            age_groups = flows['age_groups']
+            suicide_levels = flows['suicide_levels']
+            all_nodes = gdp_levels + age_groups + suicide_levels
+            source, target, value = flows['source'], flows['target'], flows['value']
+
+            # Set color for nodes
+            gdp_colors = [COLOR_SEQUENCE[0]] * len(gdp_levels)
+            age_colors = [COLOR_SEQUENCE[-2]] * len(age_groups)
+            suicide_colors = [COLOR_SEQUENCE[-1]] * len(suicide_levels)
+            node_colors = gdp_colors + age_colors + suicide_colors
+
+            # Adjust link opacity based on suicide counts
+            max_value = value.max()
+            min_value = value.min()
+            opacity = 0.3 + 0.5 * ((value - min_value) / ((max_value - min_value) or 1))
+
+            # Color links by the column of their source node
+            link_rgb = np.select(
+                [source < len(gdp_levels), source < len(gdp_levels) + len(age_groups)],
+                ['rgba(255, 107, 161, ', 'rgba(111, 184, 255, '],
+                'rgba(90, 135, 231, ')
+            link_colors = np.char.add(np.char.add(link_rgb, np.char.mod('%.2f', opacity)), ')')
+
+            # Create Sankey diagram
+            fig_gdp_sankey = go.Figure(
+                data=[go.Sankey(
+                    arrangement="snap",
+                    node=dict(
+                        pad=15,
+                        thickness=20,
+                        line=dict(color="white", width=0.5),
+                        label=all_nodes,
+                        color=node_colors,
+                    ),
+                    textfont=dict(
+                        color="black",
+                        size=15,
+                    ),
+                    link=dict(
+                        source=source,
+                        target=target,
+                        value=value,
+                        color=link_colors.tolist(),
+                        hovertemplate='%{source.label} → %{target.label}<br>Suicides: %{value:,.0f}<extra></extra>')
+                )])
+
+            # Update layout
+            fig_gdp_sankey.update_layout(
+                height=550,
+                margin=dict(l=10, r=10, t=30, b=20)
+            )
+            return fig_gdp_sankey
 
-with col1:
-    st.markdown(
-        """
-        <div class='chart-title'>Suicide Flow by GDP Level and Age</div>
-        """,
-        unsafe_allow_html=True
-    )
+        fig_gdp_sankey = figure_cache.get_or_build(
+            ('economic', 'sankey', result.key), build_sankey)
 
-    # Prepare the dataset for the Sankey diagram
-    gdp_age_sankey = df_filtered.copy()
+        # Display the diagram
+        plotly_chart(fig_gdp_sankey, use_container_width=True)
 
-    # Categorize GDP per capita into 4 quartiles with labels
-    gdp_age_sankey['gdp_level'] = pd.qcut(
-        gdp_age_sankey['gdp_per_capita ($)'],
-        q=4,
-        labels=['Low GDP', 'Medium-Low GDP', 'Medium-High GDP', 'High GDP']
-    )
+    # ------- GDP per Capita vs Suicide Rate -------
+    with col2:
+        st.markdown("""
+        <div class ='chart-title'>GDP per Capita vs Suicide Rate</div>
+        """, unsafe_allow_html=True)
 
-    # Categorize suicide rates into 3 levels
-    gdp_age_sankey['suicide_level'] = pd.qcut(
-        gdp_age_sankey['suicides/100k pop'],
-        q=3,
-        labels=['Low Rate', 'Medium Rate', 'High Rate']
-    )
+        # GDP per capita, suicides, population and rate of the selected countries
+        bubble_data = result.get('bubble_data')
+
+        # Set a checkbox for displaying country names
+        show_country_names = st.checkbox('Display country name', value=True)
+
+        # Build the chart, or reuse the one cached for the same inputs
+        def build_bubble():
+            # Create a bubble scatter plot
+            fig_bubble = px.scatter(
+                bubble_data,
+                x='gdp_per_capita ($)',
+                y='suicides/100k pop',
+                size='population',
+                color='suicides/100k pop',
+                text='country' if show_country_names else None,
+                color_continuous_scale=COLOR_SEQUENCE_LIGHT_TO_DARK,
+                size_max=70,
+                # Draw many countries with WebGL rather than SVG
+                render_mode='webgl' if len(bubble_data) > BUBBLE_WEBGL_COUNTRIES else 'auto',
+            )
 
-    # Aggregate data by GDP level, age group, and suicide rate
-    flow_data = gdp_age_sankey.groupby(['gdp_level', 'age', 'suicide_level'])[
-        'suicides_no'].sum().reset_index()
-
-    # Prepare data for the two flows: GDP → Age and Age → Suicide Rate
-    gdp_age_flow = flow_data.groupby(['gdp_level', 'age'])[
-        'suicides_no'].sum().reset_index()
-    age_suicide_flow = flow_data.groupby(['age', 'suicide_level'])[
-        'suicides_no'].sum().reset_index()
-
-    # Generate unique node names and mapping IDs for Sankey diagram
-    gdp_levels = sorted(flow_data['gdp_level'].unique())
-    age_groups = [age for age in age_order if age in flow_data['age'].unique()]
-    suicide_levels = sorted(flow_data['suicide_level'].unique())
-
-    all_nodes = gdp_levels + age_groups + suicide_levels
-    node_to_id = {node: idx for idx, node in enumerate(all_nodes)}
-
-    # Initialize source, target, and value lists for Sankey links
-    source = []
-    target = []
-    value = []
-
-    # Build the flow from GDP levels to Age groups
-    for _, row in gdp_age_flow.iterrows():
-        source.append(node_to_id[row['gdp_level']])
-        target.append(node_to_id[row['age']])
-        value.append(row['suicides_no'])
-
-    # Build the flow from Age groups to Suicide Rate levels
-    for _, row in age_suicide_flow.iterrows():
-        source.append(node_to_id[row['age']])
-        target.append(node_to_id[row['suicide_level']])
-        value.append(row['suicides_no'])
-
-    # Set color for nodes
-    gdp_colors = [COLOR_SEQUENCE[0]] * len(gdp_levels)
-    age_colors = [COLOR_SEQUENCE[-2]] * len(age_groups)
-    suicide_colors = [COLOR_SEQUENCE[-1]] * len(suicide_levels)
-    node_colors = gdp_colors + age_colors + suicide_colors
-
-    # Adjust link opacity based on suicide counts
-    max_value = max(value)
-    min_value = min(value)
-
-    link_colors = []
-    for v, s in zip(value, source):
-        opacity = 0.3 + 0.5 * \
-            ((v - min_value) / (max_value - min_value))
-        if s < len(gdp_levels):
-            color = f'rgba(255, 107, 161, {opacity:.2f})'
-        elif s < len(gdp_levels) + len(age_groups):
-            color = f'rgba(111, 184, 255, {opacity:.2f})'
-        else:
-            color = f'rgba(90, 135, 231, {opacity:.2f})'
-        link_colors.append(color)
-
-    # Create Sankey diagram
-    fig_gdp_sankey = go.Figure(
-        data=[go.Sankey(
-            arrangement="snap",
-            node=dict(
-                pad=15,
-                thickness=20,
-                line=dict(color="white", width=0.5),
-                label=all_nodes,
-                color=node_colors,
-            ),
-            textfont=dict(
-                color="black",
-                size=15,
-            ),
-            link=dict(
-                source=source,
-                target=target,
-                value=value,
-                color=link_colors,
-                hovertemplate='%{source.label} → %{target.label}<br>Suicides: %{value:,.0f}<extra></extra>')
-        )])
-
-    # Update layout
-    fig_gdp_sankey.update_layout(
-        height=550,
-        margin=dict(l=10, r=10, t=30, b=20)
-    )
+            # Update layout
+            fig_bubble.update_layout(
+                height=520,
+                xaxis_title='GDP per Capita',
+                yaxis_title='Suicide Rate per 100k',
+                coloraxis_colorbar=dict(
+                    title='Suicide Rate per 100k',
+                    tickformat='.0f',
+                    orientation='h',
+                    yanchor='top',
+                    y=-0.2,
+                    x=0.5,
+                    len=0.9
+                ),
+                showlegend=False
+            )
 
-    # Display the diagram
-    st.plotly_chart(fig_gdp_sankey, use_container_width=True)
+            # Update hover template
+            fig_bubble.update_traces(
+                marker=dict(
+                    sizemode='area',
+                    opacity=0.7
+                ),
+                customdata=np.column_stack((
+                    bubble_data['country'],
+                    bubble_data['population'],
+                    bubble_data['gdp_per_capita ($)'],
+                    bubble_data['suicides/100k pop']
+                )),
+                hovertemplate=(
+                    "<b>%{customdata[0]}</b><br>" +
+                    "GDP per Capita: $%{customdata[2]:,.0f}<br>" +
+                    "Suicide Rate: %{customdata[3]:.2f}/100k<br>" +
+                    "Population: %{customdata[1]:,.0f}<extra></extra>"
+                )
+            )
 
-# ------- GDP per Capita vs Suicide Rate -------
-with col2:
-    st.markdown("""
-    <div class ='chart-title'>GDP per Capita vs Suicide Rate</div>
-    """, unsafe_allow_html=True)
 
-    # Aggregate data by country and year
-    gdp_suicide_data = df_filtered.groupby(['country', 'year']).agg({
-        'suicides_no': 'sum',
-        'gdp_per_capita ($)': 'mean',
-        'population': 'sum'
-    }).reset_index()
-
-    # Further aggregate by country
-    bubble_data = gdp_suicide_data.groupby('country').agg({
-        'gdp_per_capita ($)': 'mean',
-        'suicides_no': 'sum',
-        'population': 'sum'
-    }).reset_index()
-
-    # Calculate suicide rate per 100k / pop
-    bubble_data['suicides/100k pop'] = (
-        bubble_data['suicides_no'] / bubble_data['population']) * 100000
-
-    # Filter countries from the sidebar
-    bubble_data = bubble_data[bubble_data['country'].isin(selected_countries)]
-
-    # Set a checkbox for displaying country names
-    show_country_names = st.checkbox('Display country name', value=True)
-
-    # Create a bubble scatter plot
-    fig_bubble = px.scatter(
-        bubble_data,
-        x='gdp_per_capita ($)',
-        y='suicides/100k pop',
-        size='population',
-        color='suicides/100k pop',
-        text='country' if show_country_names else None,
-        color_continuous_scale=COLOR_SEQUENCE_LIGHT_TO_DARK,
-        size_max=70,
-    )
+            # If country names are shown, set the text position
+            if show_country_names:
+                fig_bubble.update_traces(
+                    textposition='top center'
+                )
+            return fig_bubble
 
-    # Update layout
-    fig_bubble.update_layout(
-        height=520,
-        xaxis_title='GDP per Capita',
-        yaxis_title='Suicide Rate per 100k',
-        coloraxis_colorbar=dict(
-            title='Suicide Rate per 100k',
-            tickformat='.0f',
-            orientation='h',
-            yanchor='top',
-            y=-0.2,
-            x=0.5,
-            len=0.9
-        ),
-        showlegend=False
-    )
+        fig_bubble = figure_cache.get_or_build(
+            ('economic', 'bubble', show_country_names, result.key), build_bubble)
 
-    # Update hover template
-    fig_bubble.update_traces(
-        marker=dict(
-            sizemode='area',
-            opacity=0.7
-        ),
-        customdata=np.column_stack((
-            bubble_data['country'],
-            bubble_data['population'],
-            bubble_data['gdp_per_capita ($)'],
-            bubble_data['suicides/100k pop']
-        )),
-        hovertemplate=(
-            "<b>%{customdata[0]}</b><br>" +
-            "GDP per Capita: $%{customdata[2]:,.0f}<br>" +
-            "Suicide Rate: %{customdata[3]:.2f}/100k<br>" +
-            "Population: %{customdata[1]:,.0f}<extra></extra>"
-        )
-    )
+        # Display the chart
+        plotly_chart(fig_bubble, use_container_width=True)
 
 
-    # If country names are shown, set the text position
-    if show_country_names:
-        fig_bubble.update_traces(
-            textposition='top center'
-        )
+economic_section(result)
 
-    # Display the chart
-    st.plotly_chart(fig_bubble, use_container_width=True)
 
 # ====================================
 # Country Comparison Analysis section
 # ====================================
 
-# Set the title
-st.subheader("Country Comparison Analysis (Conditional Content)")
-
-# Filter data to include only selected countries from the sidebar
-df_comparison = df_filtered[df_filtered['country'].isin(selected_countries)]
-
-# Calculate total suicides and average GDP for each country
-total_suicides = df_comparison.groupby('country').agg({
-    'suicides_no': 'sum',
-    'gdp_per_capita ($)': 'mean',
-    'gdp_for_year ($)': 'mean'
-}).reset_index()
-
-# Get the latest year for each country in the filtered dataset
-max_year_by_country = df_comparison.groupby('country')['year'].max()
-
-# Get population data for each country's latest year
-population_data = df_comparison[
-    df_comparison.apply(lambda x: x['year'] == max_year_by_country[x['country']], axis=1)
-].groupby('country')['population'].sum().reset_index()
+# Render the Country Comparison section
+@st.fragment
+@profiled('comparison')
+def comparison_section(result):
+    # Set the title
+    st.subheader("Country Comparison Analysis (Conditional Content)")
 
-# Merge suicide and population data
-country_summary = pd.merge(total_suicides, population_data, on='country', how='outer')
+    # Suicides, GDP, latest-year population and suicide rate of each selected country
+    country_summary = result.get('country_summary')
 
-# Fill any missing values with 0
-country_summary = country_summary.fillna(0)
+    # Set a selectbox for the first country
+    country1 = st.selectbox(
+        "Select the first country:",
+        options=sorted(country_summary['country'].unique()),
+        key='country1'
+    )
 
-# Calculate suicide rate per 100k population
-country_summary['suicide_rate'] = np.where(
-    country_summary['population'] > 0,
-    (country_summary['suicides_no'] / country_summary['population']) * 100000,
-    0
-)
+    # Get the selected country's summary data
+    country1_data = country_summary[country_summary['country'] == country1].iloc[0]
+
+    # Display key metrics for the first country
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("Total Population", f"{country1_data['population']:,}")
+    with col2:
+        st.metric("Suicide Rate (per 100k)",
+                  f"{country1_data['suicide_rate']:.2f}")
+
+    # Set a selectbox for the second country
+    country2 = st.selectbox(
+        "Select the second country:",
+        options=sorted(country_summary['country'].unique()),
+        key='country2'
+    )
 
-# Set a selectbox for the first country
-country1 = st.selectbox(
-    "Select the first country:",
-    options=sorted(country_summary['country'].unique()),
-    key='country1'
-)
+    # Get the selected country's summary data
+    country2_data = country_summary[country_summary['country'] == country2].iloc[0]
+
+    # Display key metrics for the second country
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("Total Population", f"{country2_data['population']:,}")
+    with col2:
+        st.metric("Suicide Rate (per 100k)",
+                  f"{country2_data['suicide_rate']:.2f}")
+
+    # Create a checkbox to display or hide detailed comparison metrics
+    show_details = st.checkbox("Show detailed comparison metrics", value=False)
+
+    if show_details:
+        # Total female and male suicides of each country, from the summary
+        female_suicides1 = country1_data['female_suicides']
+        male_suicides1 = country1_data['male_suicides']
+        female_suicides2 = country2_data['female_suicides']
+        male_suicides2 = country2_data['male_suicides']
+
+        # Calculate male-to-female suicide ratio
+        gender_ratio1 = "N/A" if female_suicides1 == 0 else f"{
+            (male_suicides1 / female_suicides1):.2f}:1"
+        gender_ratio2 = "N/A" if female_suicides2 == 0 else f"{
+            (male_suicides2 / female_suicides2):.2f}:1"
+
+        # Create a metrics dictionary for structured display
+        metrics = {
+            'Suicide Rate': [
+                f"{country1_data['suicide_rate']:.2f}/100k",
+                f"{country2_data['suicide_rate']:.2f}/100k"
+            ],
+            'Total Suicides': [
+                f"{country1_data['suicides_no']:,}",
+                f"{country2_data['suicides_no']:,}"
+            ],
+            'GDP per Capita': [
+                f"${country1_data['gdp_per_capita ($)']:,.0f}",
+                f"${country2_data['gdp_per_capita ($)']:,.0f}"
+            ],
+            'Total GDP': [
+                f"${country1_data['gdp_for_year ($)']:,.0f}",
+                f"${country2_data['gdp_for_year ($)']:,.0f}"
+            ],
+            'Male : Female': [
+                gender_ratio1,
+                gender_ratio2
+            ]
+        }
+
+        # Set the title
+        st.markdown(
+            f''' <div class="chart-title">Detailed Comparison</div>''',
+            unsafe_allow_html=True
+        )
 
-# Get the selected country's summary data
-country1_data = country_summary[country_summary['country'] == country1].iloc[0]
-
-# Display key metrics for the first country
-col1, col2 = st.columns(2)
-with col1:
-    st.metric("Total Population", f"{country1_data['population']:,}")
-with col2:
-    st.metric("Suicide Rate (per 100k)",
-              f"{country1_data['suicide_rate']:.2f}")
-
-# Set a selectbox for the second country
-country2 = st.selectbox(
-    "Select the second country:",
-    options=sorted(country_summary['country'].unique()),
-    key='country2'
-)
+        # Display the metrics
+        for metric, values in metrics.items():
+            col1, col2 = st.columns(2)
+            with col1:
+                st.markdown(
+                    f'''
+                    <div class="metric-container" style="height: 120px;">
+                        <div class="metric-title">{country1}</div>
+                        <div class="metric-value">{values[0]}</div>
+                        <div class="metric-title">{metric}</div>
+                    </div>
+                    ''',
+                    unsafe_allow_html=True
+                )
+            with col2:
+                st.markdown(
+                    f'''
+                    <div class="metric-container" style="height: 120px;">
+                        <div class="metric-title">{country2}</div>
+                        <div class="metric-value">{values[1]}</div>
+                        <div class="metric-title">{metric}</div>
+                    </div>
+                    ''',
+                    unsafe_allow_html=True
+                )
 
-# Get the selected country's summary data
-country2_data = country_summary[country_summary['country'] == country2].iloc[0]
-
-# Display key metrics for the second country
-col1, col2 = st.columns(2)
-with col1:
-    st.metric("Total Population", f"{country2_data['population']:,}")
-with col2:
-    st.metric("Suicide Rate (per 100k)",
-              f"{country2_data['suicide_rate']:.2f}")
-
-# Create a checkbox to display or hide detailed comparison metrics
-show_details = st.checkbox("Show detailed comparison metrics", value=False)
-
-if show_details:
-    # Calculate total female and male suicides for each country
-    female_suicides1 = df_filtered[
-        (df_filtered['country'] == country1) &
-        (df_filtered['sex'] == 'female')]['suicides_no'].sum()
-
-    male_suicides1 = df_filtered[
-        (df_filtered['country'] == country1) &
-        (df_filtered['sex'] == 'male')]['suicides_no'].sum()
-
-    female_suicides2 = df_filtered[
-        (df_filtered['country'] == country2) &
-        (df_filtered['sex'] == 'female')]['suicides_no'].sum()
-
-    male_suicides2 = df_filtered[
-        (df_filtered['country'] == country2) &
-        (df_filtered['sex'] == 'male')]['suicides_no'].sum()
-
-    # Calculate male-to-female suicide ratio
-    gender_ratio1 = "N/A" if female_suicides1 == 0 else f"{
-        (male_suicides1 / female_suicides1):.2f}:1"
-    gender_ratio2 = "N/A" if female_suicides2 == 0 else f"{
-        (male_suicides2 / female_suicides2):.2f}:1"
-
-    # Create a metrics dictionary for structured display
-    metrics = {
-        'Suicide Rate': [
-            f"{country1_data['suicide_rate']:.2f}/100k",
-            f"{country2_data['suicide_rate']:.2f}/100k"
-        ],
-        'Total Suicides': [
-            f"{country1_data['suicides_no']:,}",
-            f"{country2_data['suicides_no']:,}"
-        ],
-        'GDP per Capita': [
-            f"${country1_data['gdp_per_capita ($)']:,.0f}",
-            f"${country2_data['gdp_per_capita ($)']:,.0f}"
-        ],
-        'Total GDP': [
-            f"${country1_data['gdp_for_year ($)']:,.0f}",
-            f"${country2_data['gdp_for_year ($)']:,.0f}"
-        ],
-        'Male : Female': [
-            gender_ratio1,
-            gender_ratio2
-        ]
-    }
 
-    # Set the title
-    st.markdown(
-        f''' <div class="chart-title">Detailed Comparison</div>''',
-        unsafe_allow_html=True
-    )
+comparison_section(result)
 
-    # Display the metrics
-    for metric, values in metrics.items():
-        col1, col2 = st.columns(2)
-        with col1:
-            st.markdown(
-                f'''
-                <div class="metric-container" style="height: 120px;">
-                    <div class="metric-title">{country1}</div>
-                    <div class="metric-value">{values[0]}</div>
-                    <div class="metric-title">{metric}</div>
-                </div>
-                ''',
-                unsafe_allow_html=True
-            )
-        with col2:
-            st.markdown(
-                f'''
-                <div class="metric-container" style="height: 120px;">
-                    <div class="metric-title">{country2}</div>
-                    <div class="metric-value">{values[1]}</div>
-                    <div class="metric-title">{metric}</div>
-                </div>
-                ''',
-                unsafe_allow_html=True
-            )
 
 # =============================
 # Suicide Dataset View section
 # =============================
 
-# Set the title
-st.subheader("Suicide Dataset View")
-
-# Display the filtered dataset as an interactive table
-st.dataframe(
-    df_filtered,
-    column_config={
-        "suicides_no": st.column_config.NumberColumn(
-            "Suicides",
-            format="%d",
-        ),
-        "suicides/100k pop": st.column_config.NumberColumn(
-            "Suicide Rate / 100k",
-            format="%.2f",
-        ),
-        "gdp_for_year ($)": st.column_config.NumberColumn(
-            "Total GDP",
-            format="$%d",
-        ),
-        "gdp_per_capita ($)": st.column_config.NumberColumn(
-            "GDP per Capita",
-            format="$%.0f",
-        ),
-    },
-    hide_index=True,
-    use_container_width=True
-)
+# Render the Dataset View section
+@st.fragment
+@profiled('dataset')
+def dataset_section(result, data):
+    # Set the title
+    st.subheader("Suicide Dataset View")
+
+    # Pick the columns to show, the column to sort the rows by and whether to
+    # browse them page by page; only the rows and columns on screen are sent
+    # to the browser
+    all_columns = list(data.df.columns)
+    col1, col2, col3 = st.columns([5, 2, 1])
+    with col1:
+        columns = st.multiselect(
+            "Columns",
+            all_columns,
+            default=all_columns,
+            key="dataset_columns"
+        )
+    with col2:
+        sort_column = st.selectbox(
+            "Sort by",
+            [None] + all_columns,
+            format_func=lambda column: "Dataset order" if column is None else column,
+            key="dataset_sort"
+        )
+    with col3:
+        descending = st.checkbox("Descending", value=False, key="dataset_descending")
+        paged = st.toggle("Paged", value=True, key="dataset_paged")
+
+    if not columns:
+        st.info("Select at least one column to display.")
+        return
+
+    # Ids of the filtered rows in the chosen order, straight from the filter
+    # index, without building the filtered frame
+    rows = result.sorted_rows(data, sort_column, not descending, version.sort_orders)
+
+    # Keep the rows of the current page, or the first DATASET_ROW_CAP rows
+    # when the table is not paged
+    first = 0
+    if paged:
+        n_pages = max(1, -(-len(rows) // DATASET_PAGE_SIZE))
+        page = st.number_input("Page", min_value=1, max_value=n_pages, value=1, step=1)
+        first = (page - 1) * DATASET_PAGE_SIZE
+        shown = rows[first:first + DATASET_PAGE_SIZE]
+    else:
+        shown = rows[:DATASET_ROW_CAP] if DATASET_ROW_CAP else rows
+
+    # Display the selected rows and columns as an interactive table
+    page_data = take_page(data.df, shown, columns)
+    with phase('serialize'):
+        st.dataframe(
+            page_data,
+            column_config={
+                "suicides_no": st.column_config.NumberColumn(
+                    "Suicides",
+                    format="%d",
+                ),
+                "suicides/100k pop": st.column_config.NumberColumn(
+                    "Suicide Rate / 100k",
+                    format="%.2f",
+                ),
+                "gdp_for_year ($)": st.column_config.NumberColumn(
+                    "Total GDP",
+                    format="$%d",
+                ),
+                "gdp_per_capita ($)": st.column_config.NumberColumn(
+                    "GDP per Capita",
+                    format="$%.0f",
+                ),
+            },
+            hide_index=True,
+            use_container_width=True
+        )
+    add_payload(lambda: pa.Table.from_pandas(page_data, preserve_index=False).nbytes)
+
+    if len(shown):
+        st.caption(f"Rows {first + 1:,}–{first + len(shown):,} of {len(rows):,}")
+
+
+dataset_section(result, data)
+
+# Save the filter result to the disk cache once, with every aggregate this
+# run computed, rather than every time one is added
+result.save()
+st.session_state['rendered_run'] = profile_run
+
+
+# ===========================
+# Performance Panel (opt-in)
+# ===========================
+
+# Show the latest record of every section, and offer all the records of the
+# session as JSON lines. Fragment reruns are shown on the next full rerun.
+if debug_panel:
+    with st.sidebar.expander("Performance", expanded=True):
+        records = list(st.session_state.get('profile_latest', {}).values())
+        st.caption(f"Latest run of each section (run {profile_run}), times in ms")
+        st.dataframe(
+            pd.DataFrame({
+                'section': [record['section'] for record in records],
+                **{name: [record[f"{name}_ms"] for record in records]
+                   for name in PHASES + ['other', 'total']},
+                'peak MB': [(record['peak_memory_bytes'] or np.nan) / 2**20
+                            for record in records],
+                'payload KB': [record['payload_bytes'] / 2**10 for record in records],
+            }).round(1),
+            hide_index=True,
+        )
+        st.download_button(
+            "Download records (JSON lines)",
+            "".join(json.dumps(record) + "\n"
+                    for record in st.session_state.get('profile_history', [])),
+            file_name="dashboard_profile.jsonl",
+            mime="application/jsonl",
+        )
@@ -0,0 +1,167 @@
+# Ingestion pipeline of the Global Suicide Trends Dashboard
+#
+# Cleans the raw suicide CSV the way suicide_data_EDA.ipynb does (drop the
+# 'HDI for year' and 'country-year' columns, strip the column names, parse
+# the thousands separators of 'gdp_for_year ($)', drop the ' years' suffix of
+# the age groups, fix the 'Millenials' typo and drop the rows with negative
+# suicide counts or rates), and writes the cleaned CSV and the columnar
+# store directly. The raw file is streamed in chunks, so memory use stays
+# flat however large it is:
+#
+#   1. a first pass reads only the country column, to learn the categories
+#      every chunk is typed with;
+#   2. a second pass cleans each chunk with vectorized operations, casts it
+#      to the store's schema and appends it to both outputs.
+#
+# Both outputs are written next to their targets and renamed into place
+# once complete, the CSV first, so the store always matches a CSV.
+#
+#     python suicide_data_etl.py suicide_data.csv
+#     python suicide_data_etl.py raw.csv --chunk-rows 500000
+
+import argparse
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from suicide_data_store import (CATEGORY_COLUMNS, COLUMNS, CSV_PATH, PARQUET_PATH,
+                                SCHEMA_DTYPES, SCHEMA_VERSION, SCHEMA_VERSION_KEY,
+                                remove_store_parts, source_fingerprint)
+
+# Raw dataset the cleaned CSV is built from
+RAW_PATH = os.path.join(os.path.dirname(CSV_PATH), 'suicide_data.csv')
+
+# Rows parsed and cleaned at a time
+CHUNK_ROWS = 100000
+
+# Columns of the raw file the notebook drops
+DROPPED_COLUMNS = ['HDI for year', 'country-year']
+
+# Label fixes of the notebook, applied to each chunk's categories only
+AGE_SUFFIX = ' years'
+GENERATION_FIXES = {'Millenials': 'Millennials'}
+
+
+# Names of the raw columns, keyed by their stripped names
+def raw_columns(raw_path):
+    header = pd.read_csv(raw_path, nrows=0).columns
+    columns = {name.strip(): name for name in header}
+
+    missing = [col for col in COLUMNS if col not in columns]
+    if missing:
+        raise ValueError(f"Missing columns in {raw_path}: {', '.join(missing)}")
+    return columns
+
+
+# Stream the raw file in chunks of the schema columns, labels parsed as
+# categoricals and numbers as floats until the invalid rows are dropped
+def read_raw_chunks(raw_path, columns, chunk_rows=CHUNK_ROWS, usecols=COLUMNS):
+    dtypes = {columns[col]: 'category' if col in CATEGORY_COLUMNS else 'float64'
+              for col in usecols}
+    return pd.read_csv(raw_path, usecols=[columns[col] for col in usecols], dtype=dtypes,
+                       thousands=',', chunksize=chunk_rows)
+
+
+# Sorted countries of the raw file, as the store's country categories
+def raw_countries(raw_path, columns, chunk_rows=CHUNK_ROWS):
+    countries = set()
+    for chunk in read_raw_chunks(raw_path, columns, chunk_rows, usecols=['country']):
+        countries.update(chunk[columns['country']].cat.categories)
+    return sorted(countries)
+
+
+# Clean one chunk and cast it to the store's schema
+def clean_chunk(chunk, dtypes):
+    chunk.columns = chunk.columns.str.strip()
+    chunk = chunk[COLUMNS]
+
+    # Drop the suffix and fix the typo on the few labels, not on every row
+    chunk['age'] = chunk['age'].cat.rename_categories(
+        lambda age: age.replace(AGE_SUFFIX, ''))
+    chunk['generation'] = chunk['generation'].cat.rename_categories(
+        lambda generation: GENERATION_FIXES.get(generation, generation))
+
+    # Missing counts and rates fail the comparisons, and are dropped as well
+    chunk = chunk[(chunk['suicides_no'] >= 0) & (chunk['suicides/100k pop'] >= 0)]
+
+    typed = chunk.astype(dtypes)
+    for col in CATEGORY_COLUMNS:
+        # Labels outside a fixed category list silently become NaN otherwise
+        if typed[col].isna().sum() != chunk[col].isna().sum():
+            raise ValueError(f"Unexpected values in column {col!r}")
+    return typed
+
+
+# Clean the raw file into the cleaned CSV and the columnar store, one chunk
+# at a time; returns the number of rows written
+def run_etl(raw_path=RAW_PATH, csv_path=CSV_PATH, store_path=PARQUET_PATH,
+            chunk_rows=CHUNK_ROWS):
+    columns = raw_columns(raw_path)
+    dtypes = dict(SCHEMA_DTYPES)
+    dtypes['country'] = pd.CategoricalDtype(raw_countries(raw_path, columns, chunk_rows))
+
+    os.makedirs(os.path.dirname(os.path.abspath(csv_path)), exist_ok=True)
+    os.makedirs(os.path.dirname(os.path.abspath(store_path)), exist_ok=True)
+    csv_tmp = f"{csv_path}.{os.getpid()}.tmp"
+    store_tmp = f"{store_path}.{os.getpid()}.tmp"
+
+    # Both outputs start from the schema, so a file cleaning to no rows at
+    # all still gives a CSV with its header and a store with its columns
+    empty = pd.DataFrame({col: pd.Series(dtype=dtypes[col]) for col in COLUMNS})
+    schema = pa.Table.from_pandas(empty, preserve_index=False).schema
+
+    rows, writer = 0, None
+    try:
+        writer = pq.ParquetWriter(store_tmp, schema, compression='zstd')
+        with open(csv_tmp, 'w', newline='') as csv_file:
+            empty.to_csv(csv_file, index=False)
+            for chunk in read_raw_chunks(raw_path, columns, chunk_rows):
+                chunk = clean_chunk(chunk, dtypes)
+                chunk.to_csv(csv_file, header=False, index=False)
+                writer.write_table(pa.Table.from_pandas(chunk, schema=schema,
+                                                        preserve_index=False))
+                rows += len(chunk)
+
+        # Tag the store with the fingerprint of the CSV written with it; the
+        # rename below keeps the size and modification time it records
+        metadata = source_fingerprint(csv_tmp)
+        metadata[SCHEMA_VERSION_KEY] = str(SCHEMA_VERSION).encode()
+        writer.add_key_value_metadata(metadata)
+        writer.close()
+        writer = None
+
+        os.replace(csv_tmp, csv_path)
+        os.replace(store_tmp, store_path)
+        remove_store_parts(store_path)
+    finally:
+        if writer is not None:
+            writer.close()
+        for path in (csv_tmp, store_tmp):
+            if os.path.exists(path):
+                os.remove(path)
+
+    return rows
+
+
+# Run the pipeline from the command line
+def main():
+    parser = argparse.ArgumentParser(
+        description="Clean the raw suicide CSV into the cleaned CSV and the columnar store.")
+    parser.add_argument('raw', nargs='?', default=RAW_PATH,
+                        help="raw CSV to clean")
+    parser.add_argument('--csv', default=CSV_PATH,
+                        help="cleaned CSV to write")
+    parser.add_argument('--output', default=PARQUET_PATH,
+                        help="Parquet file to write")
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS,
+                        help="rows parsed and cleaned at a time")
+    args = parser.parse_args()
+
+    rows = run_etl(args.raw, args.csv, args.output, args.chunk_rows)
+    print(f"Wrote {rows:,} cleaned rows to {args.csv} and {args.output}")
+
+
+if __name__ == '__main__':
+    main()
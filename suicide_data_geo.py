@@ -0,0 +1,226 @@
+# Offline world geometry and country codes for the Global Suicide Trends
+# Dashboard map
+#
+# plotly.js draws world maps from TopoJSON files it fetches from its CDN. The
+# dashboard serves its own simplified copy from static/ instead (Streamlit's
+# static file serving is enabled in .streamlit/config.toml) and points the
+# map charts at it, so the map renders without any network access. The map
+# locates countries by ISO-3 code, resolved from their names once, when the
+# dataset is loaded, rather than by matching names on every render.
+#
+# Rebuild the geometry from a Natural Earth admin-0 countries GeoJSON:
+#
+#     python suicide_data_geo.py ne_110m_admin_0_countries.geojson
+
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+# Resolve data files next to this module, whatever the working directory is
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Country names, including common and alternative ones, with their ISO-3 codes
+COUNTRY_CODES_PATH = os.path.join(BASE_DIR, 'country_codes.csv')
+
+# Files served by the app under app/static/
+STATIC_DIR = os.path.join(BASE_DIR, 'static')
+
+# plotly.js requests <topojsonURL><scope>_<resolution>m.json, i.e.
+# world_110m.json for the default world map
+WORLD_TOPOJSON_PATH = os.path.join(STATIC_DIR, 'world_110m.json')
+
+# Plotly config of the map charts, loading the geometry from the app itself
+# (the URL is relative to the page, as Streamlit serves static/ there)
+MAP_CONFIG = {'topojsonURL': 'app/static/'}
+
+# Number of grid steps the coordinates are quantized to along each axis
+QUANTIZATION = 10000
+
+# Base layers of a plotly world map with no geometry of their own here
+EMPTY_LAYERS = ['ocean', 'lakes', 'rivers', 'subunits']
+
+
+# Map country names to ISO-3 codes
+def read_country_codes(path=COUNTRY_CODES_PATH):
+    codes = pd.read_csv(path, keep_default_na=False)
+    return dict(zip(codes['country'], codes['iso3']))
+
+
+# ISO-3 codes of the given country names; names without a code are left out,
+# so the map skips them the way it skipped unmatched names before
+def country_iso3(countries, path=COUNTRY_CODES_PATH):
+    codes = read_country_codes(path)
+    return {country: codes[country] for country in countries if country in codes}
+
+
+# ====================
+# Geometry build
+# ====================
+
+# Snap a ring to the integer grid, dropping the points that collapse onto
+# the previous one; rings left with no area are dropped
+def _quantize_ring(ring, n):
+    points = np.asarray(ring, dtype=float)[:, :2]
+    grid = np.empty((len(points), 2), dtype=np.int64)
+    grid[:, 0] = np.round((points[:, 0] + 180) / 360 * (n - 1))
+    grid[:, 1] = np.round((points[:, 1] + 90) / 180 * (n - 1))
+    grid = grid[np.r_[True, (np.diff(grid, axis=0) != 0).any(axis=1)]]
+    return grid if len(grid) >= 4 else None
+
+
+# Orient a ring the way d3, and so plotly.js, expects polygons on the
+# sphere: exterior rings clockwise and holes counterclockwise
+def _orient(ring, exterior):
+    x, y = ring[:, 0], ring[:, 1]
+    clockwise = np.sum(x[:-1] * y[1:] - x[1:] * y[:-1]) < 0
+    return ring if clockwise == exterior else ring[::-1]
+
+
+# Polygons of a GeoJSON geometry, each a list of rings
+def _polygons(geometry):
+    if geometry['type'] == 'Polygon':
+        return [geometry['coordinates']]
+    if geometry['type'] == 'MultiPolygon':
+        return geometry['coordinates']
+    return []
+
+
+# Undirected key of the segment between two grid points
+def _segment(p, q):
+    p, q = tuple(p), tuple(q)
+    return (p, q) if p <= q else (q, p)
+
+
+# Split a closed ring into runs of segments shared by the same rings, so
+# every stretch of border or coastline between two junctions is one arc
+def _split_ring(ring, owners):
+    keys = [owners[_segment(ring[i], ring[i + 1])] for i in range(len(ring) - 1)]
+    cuts = [i for i in range(len(keys)) if keys[i] != keys[i - 1]]
+    if not cuts:
+        return [(ring, keys[0])]
+
+    # Start the ring at a cut, so no run wraps around its end
+    start = cuts[0]
+    points = np.concatenate([ring[start:-1], ring[:start + 1]])
+    keys = keys[start:] + keys[:start]
+    bounds = [cut - start for cut in cuts] + [len(keys)]
+    return [(points[lo:hi + 1], keys[lo]) for lo, hi in zip(bounds[:-1], bounds[1:])]
+
+
+# Delta-encode an arc, as quantized TopoJSON stores them
+def _encode_arc(points):
+    return np.diff(points, axis=0, prepend=[[0, 0]]).tolist()
+
+
+# Build a plotly-compatible world TopoJSON from a GeoJSON of countries: a
+# 'countries' layer with ISO-3 ids, the 'land' and 'coastlines' layers
+# derived from it, and empty layers for the rest
+def build_world_topojson(geojson, n=QUANTIZATION):
+    countries = []
+    for feature in geojson['features']:
+        properties = {key.lower(): value
+                      for key, value in (feature.get('properties') or {}).items()}
+        iso3 = properties.get('iso_a3', '-99')
+        if iso3 == '-99':
+            iso3 = properties.get('adm0_a3', iso3)
+
+        polygons = []
+        for polygon in _polygons(feature['geometry']):
+            rings = [_quantize_ring(ring, n) for ring in polygon]
+            if rings[0] is not None:
+                polygons.append([_orient(ring, i == 0)
+                                 for i, ring in enumerate(rings) if ring is not None])
+        if polygons:
+            countries.append((iso3, properties.get('name', iso3), polygons))
+
+    # Rings using each segment, to find the borders rings share
+    owners = {}
+    ring_id = 0
+    for _, _, polygons in countries:
+        for polygon in polygons:
+            for ring in polygon:
+                for p, q in zip(ring[:-1], ring[1:]):
+                    owners.setdefault(_segment(p, q), set()).add(ring_id)
+                ring_id += 1
+    owners = {segment: frozenset(rings) for segment, rings in owners.items()}
+
+    # Store every stretch once: a ring walking a border its neighbour already
+    # stored references that arc reversed (~index). Stretches of a single
+    # ring are coastline.
+    arcs, arc_ids, coastlines = [], {}, []
+
+    def arc_index(points, shared):
+        key = points.tobytes()
+        if key in arc_ids:
+            return arc_ids[key]
+        reverse_key = np.ascontiguousarray(points[::-1]).tobytes()
+        if reverse_key in arc_ids:
+            return ~arc_ids[reverse_key]
+        arc_ids[key] = len(arcs)
+        arcs.append(points)
+        if not shared:
+            coastlines.append([arc_ids[key]])
+        return arc_ids[key]
+
+    geometries, land = [], []
+    for iso3, name, polygons in countries:
+        polygon_arcs = [[[arc_index(run, len(rings) > 1)
+                          for run, rings in _split_ring(ring, owners)]
+                         for ring in polygon]
+                        for polygon in polygons]
+        land.extend(polygon_arcs)
+        geometries.append({
+            'type': 'MultiPolygon',
+            'id': iso3,
+            'properties': {'name': name},
+            'arcs': polygon_arcs,
+        })
+
+    objects = {
+        'countries': {'type': 'GeometryCollection', 'geometries': geometries},
+        'land': {'type': 'GeometryCollection', 'geometries': [
+            {'type': 'MultiPolygon', 'arcs': land}]},
+        'coastlines': {'type': 'GeometryCollection', 'geometries': [
+            {'type': 'MultiLineString', 'arcs': coastlines}]},
+    }
+    for layer in EMPTY_LAYERS:
+        objects[layer] = {'type': 'GeometryCollection', 'geometries': []}
+
+    return {
+        'type': 'Topology',
+        'transform': {'scale': [360 / (n - 1), 180 / (n - 1)],
+                      'translate': [-180, -90]},
+        'objects': objects,
+        'arcs': [_encode_arc(arc) for arc in arcs],
+    }
+
+
+# Build the bundled geometry from the command line
+def main():
+    parser = argparse.ArgumentParser(
+        description="Build the dashboard's world TopoJSON from a Natural Earth "
+                    "admin-0 countries GeoJSON.")
+    parser.add_argument('geojson', help="GeoJSON of the world's countries")
+    parser.add_argument('--output', default=WORLD_TOPOJSON_PATH,
+                        help="TopoJSON file to write")
+    parser.add_argument('--quantization', type=int, default=QUANTIZATION,
+                        help="grid steps per axis the coordinates snap to")
+    args = parser.parse_args()
+
+    with open(args.geojson) as f:
+        topology = build_world_topojson(json.load(f), args.quantization)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(topology, f, separators=(',', ':'))
+
+    n_countries = len(topology['objects']['countries']['geometries'])
+    print(f"Wrote {n_countries} countries to {args.output} "
+          f"({os.path.getsize(args.output):,} bytes)")
+
+
+if __name__ == '__main__':
+    main()
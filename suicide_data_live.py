@@ -0,0 +1,223 @@
+# Live data of the Global Suicide Trends Dashboard
+#
+# The server keeps serving whatever version of the data it loaded, so a
+# refreshed cleaned_suicide_data.csv dropped onto it is picked up without a
+# restart: every rerun checks the CSV's size and modification time, which
+# costs one stat() call. When they change, a background thread loads the new
+# version (rebuilding the columnar and memory-mapped stores when its content
+# differs) and builds everything derived from it, while every session keeps
+# being served the current version. The new version is then swapped in at
+# once, with fresh caches, and the next rerun of each session gets it. A
+# change of timestamps alone, e.g. after a copy, is recognized by the
+# content hash and keeps the current version and its caches.
+#
+# The caches of every version write behind to one disk cache, under the
+# hash of the data and the version of the code and settings, so a restarted
+# server serves the filter results and figures computed before it stopped.
+# Each version's caches are warmed up with the default view and popular
+# selections: in the background once the first version is loaded, and
+# before a reloaded version is swapped in.
+#
+# Warm the caches, and so the disk cache, ahead of a deploy or restart:
+#
+#     python suicide_data_live.py
+
+import argparse
+import hashlib
+import logging
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import plotly
+
+import suicide_data_aggregates
+import suicide_data_cache
+import suicide_data_config
+import suicide_data_cube
+import suicide_data_query
+from suicide_data_aggregates import FilterCache
+from suicide_data_cache import DiskCache, FigureCache, LRUCache
+from suicide_data_config import (DISK_CACHE_DIR, DISK_CACHE_MB, FIGURE_CACHE_MB,
+                                 FILTER_CACHE_MB, QUERY_ENGINE, SORT_CACHE_MB)
+from suicide_data_geo import COUNTRY_CODES_PATH
+from suicide_data_mmap import MANIFEST_PATH, load_dataset, manifest_is_fresh, read_manifest
+from suicide_data_query import make_engine
+from suicide_data_store import (BASE_DIR, CSV_PATH, SCHEMA_VERSION, STORE_DIR,
+                                append_in_progress, file_sha256)
+from suicide_data_warmup import warm_up
+
+logger = logging.getLogger(__name__)
+
+# Directory of the disk cache, unless DISK_CACHE_DIR names another
+DISK_CACHE_PATH = DISK_CACHE_DIR or os.path.join(STORE_DIR, 'cache')
+
+# Files defining what the cached filter results and figures hold; entries
+# built by other versions of them are not read
+CACHE_CODE_FILES = [
+    suicide_data_aggregates.__file__,
+    suicide_data_cache.__file__,
+    suicide_data_cube.__file__,
+    suicide_data_query.__file__,
+    os.path.join(BASE_DIR, 'suicide_data_dashboard.py'),
+    COUNTRY_CODES_PATH,
+]
+
+
+# Size and modification time of a file, or None when it is missing
+def file_stat(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+# Manifest of a loaded Dataset: the content hash of the CSV it was loaded
+# from, its row count and the schema version, as recorded by the mapped
+# store, or worked out here when the store could not be written
+def data_manifest(data, csv_path=CSV_PATH, manifest_path=MANIFEST_PATH):
+    manifest = read_manifest(manifest_path)
+    if manifest_is_fresh(manifest, csv_path):
+        return {
+            'sha256': manifest['metadata']['source_sha256'],
+            'rows': manifest['rows'],
+            'schema_version': int(manifest['metadata']['schema_version']),
+        }
+    return {
+        'sha256': file_sha256(csv_path) if os.path.exists(csv_path) else None,
+        'rows': len(data.df),
+        'schema_version': SCHEMA_VERSION,
+    }
+
+
+# Settings that do not change the cached values: those of the caches
+# themselves, their warm-up and the instrumentation
+NAMESPACE_IGNORED_SETTINGS = ['FILTER_CACHE_MB', 'FIGURE_CACHE_MB', 'SORT_CACHE_MB',
+                              'DISK_CACHE_MB', 'DISK_CACHE_DIR', 'WARMUP_SELECTIONS',
+                              'DEBUG_PANEL', 'PROFILE_LOG', 'PROFILE_MEMORY']
+
+
+# Namespace of the disk cache entries of a version of the data: the hash of
+# the data, of the code building the cached values and of the settings and
+# library versions they depend on
+def cache_namespace(manifest):
+    digest = hashlib.sha256(manifest['sha256'].encode())
+    for path in CACHE_CODE_FILES:
+        if os.path.exists(path):
+            digest.update(file_sha256(path).encode())
+    settings = {name: value for name, value in vars(suicide_data_config).items()
+                if name.isupper() and name not in NAMESPACE_IGNORED_SETTINGS}
+    versions = [np.__version__, pd.__version__, plotly.__version__, QUERY_ENGINE]
+    digest.update(repr((sorted(settings.items()), versions)).encode())
+    return digest.hexdigest()
+
+
+# One version of the data with everything derived from it: the Dataset, its
+# query engine, and the filter results, figures and sort orders computed
+# from it, shared by all sessions and bounded by FILTER_CACHE_MB,
+# FIGURE_CACHE_MB and SORT_CACHE_MB; results and figures are also saved to
+# the disk cache when there is one (and the data has a hash)
+class DataVersion:
+    def __init__(self, data, manifest, disk_cache=None):
+        self.data = data
+        self.manifest = manifest
+        self.engine = make_engine(data)
+
+        disk, namespace = None, ''
+        if disk_cache is not None and manifest['sha256']:
+            disk, namespace = disk_cache, cache_namespace(manifest)
+        self.filter_cache = FilterCache(FILTER_CACHE_MB * 2**20, self.engine, disk, namespace)
+        self.figure_cache = FigureCache(FIGURE_CACHE_MB * 2**20, disk, namespace)
+
+        # Row orders of the dataset view, sorted once per column by whichever
+        # session asks first while the others wait for it
+        self.sort_orders = LRUCache(SORT_CACHE_MB * 2**20)
+
+
+# The current DataVersion, reloaded in the background when the CSV changes
+class LiveData:
+    def __init__(self, csv_path=CSV_PATH):
+        self.csv_path = csv_path
+        self.lock = threading.Lock()
+        self.reloading = False
+
+        # A disk cache that cannot be created leaves the caches in memory
+        self.disk_cache = None
+        if DISK_CACHE_MB > 0:
+            try:
+                self.disk_cache = DiskCache(DISK_CACHE_PATH, DISK_CACHE_MB * 2**20)
+            except OSError:
+                logger.exception("Creating the disk cache in %s failed", DISK_CACHE_PATH)
+
+        # The first version is loaded up front: there is nothing to serve yet
+        self.stat = file_stat(csv_path)
+        data = load_dataset(csv_path)
+        self.version = DataVersion(data, data_manifest(data, csv_path), self.disk_cache)
+        self.warmer = threading.Thread(target=warm_up, args=(self.version,), daemon=True)
+        self.warmer.start()
+
+    # The version to serve this rerun, starting a reload when the CSV has
+    # changed since it was last checked (and rows are not being appended to it)
+    def current(self):
+        stat = file_stat(self.csv_path)
+        with self.lock:
+            if (stat != self.stat and stat is not None and not self.reloading and
+                    not append_in_progress(self.csv_path)):
+                self.reloading = True
+                threading.Thread(target=self._reload, daemon=True).start()
+        return self.version
+
+    # Load the CSV until it stays unchanged while it is read (a file being
+    # copied in is read again once complete), then warm up the caches of its
+    # version and swap it in
+    def _reload(self):
+        try:
+            while True:
+                stat = file_stat(self.csv_path)
+                data = load_dataset(self.csv_path)
+                manifest = data_manifest(data, self.csv_path)
+                if file_stat(self.csv_path) == stat:
+                    break
+
+            # Same content under new timestamps: keep the version and caches
+            if manifest['sha256'] != self.version.manifest['sha256']:
+                version = DataVersion(data, manifest, self.disk_cache)
+                warm_up(version)
+                self.version = version
+                logger.info("Loaded %s rows of data version %s",
+                            manifest['rows'], manifest['sha256'][:12])
+            self.stat = stat
+        except Exception:
+            # Keep serving the current version; the next change retries
+            logger.exception("Reloading %s failed", self.csv_path)
+            self.stat = file_stat(self.csv_path)
+        finally:
+            with self.lock:
+                self.reloading = False
+
+
+# Load the data and warm its caches from the command line, saving them to
+# the disk cache the server reads at start
+def main():
+    parser = argparse.ArgumentParser(
+        description="Warm the dashboard's caches and save them to the disk cache.")
+    parser.add_argument('--csv', default=CSV_PATH,
+                        help="cleaned CSV the dataset comes from")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    live = LiveData(args.csv)
+    live.warmer.join()
+    if live.disk_cache is None:
+        print("The disk cache is disabled; nothing was saved")
+        return
+    live.disk_cache.flush()
+    cache_stats = live.disk_cache.stats()
+    print(f"Disk cache: {cache_stats['entries']} entries, "
+          f"{cache_stats['bytes'] / 2**20:.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
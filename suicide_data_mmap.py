@@ -0,0 +1,317 @@
+# Memory-mapped dataset store for the Global Suicide Trends Dashboard
+#
+# The build step saves the loaded Dataset (the cleaned rows, the cube and
+# every index built from them) as one .npy file per array, plus a JSON
+# manifest describing how the arrays fit back together. Server processes map
+# those files read-only instead of parsing and aggregating the data each on
+# their own: the OS page cache holds one physical copy shared by every
+# worker, and a new worker serves as soon as the files are mapped.
+#
+# The manifest records the fingerprint of the CSV the store was built from
+# and of the code that defines its layout; a stale store is rebuilt by the
+# first worker that finds it so.
+#
+# A build made after appending rows (see suicide_data_append.py) reuses the
+# files of the build it replaces: an array equal to one of that build's, or
+# extending it with new values, is a copy of its file with the new values
+# appended. The earlier build's files are never changed, so workers still
+# reading it see it whole.
+#
+# Build (or refresh) the store from the command line:
+#
+#     python suicide_data_mmap.py
+#     python suicide_data_mmap.py --force
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+import suicide_data_cube
+from suicide_data_cube import Dataset, FilterIndex, YearPrefixIndex
+from suicide_data_geo import COUNTRY_CODES_PATH
+from suicide_data_store import (CSV_PATH, PARQUET_PATH, SCHEMA_VERSION, SCHEMA_VERSION_KEY,
+                                STORE_DIR, file_sha256, matches_source, read_dataset,
+                                source_fingerprint)
+
+# Manifest of the current build; its arrays live in a directory next to it
+MANIFEST_PATH = os.path.join(STORE_DIR, 'mapped.json')
+
+# Prefix of the directories holding the arrays of each build
+ARRAYS_PREFIX = 'mapped-'
+
+# Objects the store rebuilds from their saved attributes
+CLASSES = {cls.__name__: cls for cls in (Dataset, YearPrefixIndex, FilterIndex)}
+
+# Readers and writers of the .npy header versions whose arrays can be
+# extended
+NPY_HEADERS = {
+    (1, 0): (np.lib.format.read_array_header_1_0, np.lib.format.write_array_header_1_0),
+    (2, 0): (np.lib.format.read_array_header_2_0, np.lib.format.write_array_header_2_0),
+}
+
+# Files defining what a Dataset holds and how it is saved; a store built by
+# other versions of them is rebuilt
+LAYOUT_FILES = [suicide_data_cube.__file__, COUNTRY_CODES_PATH, __file__]
+
+
+# Fingerprint of the code and data files defining the saved layout
+def layout_version():
+    digest = hashlib.sha256()
+    for path in LAYOUT_FILES:
+        digest.update(file_sha256(path).encode())
+    return digest.hexdigest()
+
+
+# Save a 1-D array that equals or extends the one saved in `old_path` by an
+# earlier build, as a copy of that file with the new values appended and the
+# length in its header rewritten (numpy pads the header to leave room for
+# it). Returns False, having written nothing, when the array must be saved
+# anew.
+def _extend_array(array, path, old_path):
+    if array.ndim != 1 or array.dtype.hasobject:
+        return False
+    old = np.load(old_path, mmap_mode='r')
+    n_old = len(old)
+    if (old.dtype != array.dtype or old.ndim != 1 or len(array) < n_old or
+            not np.array_equal(old, array[:n_old], equal_nan=array.dtype.kind in 'fc')):
+        return False
+
+    with open(old_path, 'rb') as f:
+        version = np.lib.format.read_magic(f)
+        if version not in NPY_HEADERS:
+            return False
+        read_header, write_header = NPY_HEADERS[version]
+        read_header(f)
+        header_size = f.tell()
+    header = io.BytesIO()
+    write_header(header, {'descr': np.lib.format.dtype_to_descr(array.dtype),
+                          'fortran_order': False, 'shape': (len(array),)})
+    if header.tell() != header_size:
+        return False
+
+    # The copy is not published before the manifest is, so it can be
+    # changed in place
+    shutil.copyfile(old_path, path)
+    with open(path, 'r+b') as f:
+        f.seek(0, os.SEEK_END)
+        f.write(np.ascontiguousarray(array[n_old:]).tobytes())
+        f.seek(0)
+        f.write(header.getvalue())
+    return True
+
+
+# Describe a value for the manifest, saving its arrays into `directory`.
+# `saved` maps the id of each array already saved to its file (and keeps the
+# array alive, so the id is not reused), so shared arrays are saved once.
+# `previous` describes the same value in an earlier build, whose arrays are
+# in `previous_dir`, for arrays extending that build's to be copied from them.
+def _save(value, directory, saved, previous=None, previous_dir=None):
+    previous = previous or {}
+    if isinstance(value, np.ndarray):
+        if id(value) not in saved:
+            name = f"{len(saved)}.npy"
+            path = os.path.join(directory, name)
+            old = previous.get('array')
+            if old is None or not _extend_array(value, path, os.path.join(previous_dir, old)):
+                np.save(path, value)
+            saved[id(value)] = (name, value)
+        return {'array': saved[id(value)][0]}
+
+    if isinstance(value, pd.DataFrame):
+        old_columns = {col['name']: col for col in previous.get('frame', [])}
+        columns = []
+        for name in value.columns:
+            col, old = value[name], old_columns.get(name, {})
+            if col.dtype.name == 'category':
+                columns.append({
+                    'name': name,
+                    'codes': _save(col.cat.codes.to_numpy(), directory, saved,
+                                   old.get('codes'), previous_dir),
+                    'categories': col.cat.categories.tolist(),
+                    'ordered': bool(col.cat.ordered),
+                })
+            else:
+                columns.append({'name': name,
+                                'values': _save(col.to_numpy(), directory, saved,
+                                                old.get('values'), previous_dir)})
+        return {'frame': columns}
+
+    if isinstance(value, dict):
+        # Keys are compared as saved, e.g. tuples as lists
+        old_items = {json.dumps(key): item for key, item in previous.get('dict', [])}
+        return {'dict': [[key, _save(item, directory, saved, old_items.get(json.dumps(key)),
+                                     previous_dir)]
+                         for key, item in value.items()]}
+
+    if type(value).__name__ in CLASSES:
+        old_attributes = {}
+        if previous.get('object') == type(value).__name__:
+            old_attributes = previous['attributes']
+        return {'object': type(value).__name__,
+                'attributes': {name: _save(attribute, directory, saved,
+                                           old_attributes.get(name), previous_dir)
+                               for name, attribute in vars(value).items()}}
+
+    return {'value': value}
+
+
+# Rebuild a value from its description, mapping its arrays read-only
+def _load(description, directory, mapped):
+    if 'array' in description:
+        name = description['array']
+        if name not in mapped:
+            mapped[name] = np.load(os.path.join(directory, name), mmap_mode='r')
+        return mapped[name]
+
+    if 'frame' in description:
+        columns = {}
+        for col in description['frame']:
+            if 'codes' in col:
+                dtype = pd.CategoricalDtype(col['categories'], ordered=col['ordered'])
+                columns[col['name']] = pd.Categorical.from_codes(
+                    _load(col['codes'], directory, mapped), dtype=dtype)
+            else:
+                columns[col['name']] = _load(col['values'], directory, mapped)
+        return pd.DataFrame(columns, copy=False)
+
+    if 'dict' in description:
+        return {key: _load(item, directory, mapped) for key, item in description['dict']}
+
+    if 'object' in description:
+        value = object.__new__(CLASSES[description['object']])
+        value.__dict__.update({
+            name: _load(attribute, directory, mapped)
+            for name, attribute in description['attributes'].items()})
+        return value
+
+    value = description['value']
+    return tuple(value) if isinstance(value, list) else value
+
+
+# Time (ns) a build was started at, from the name of its arrays directory;
+# that of a directory not named by write_mapped_store counts as the latest
+def _build_start(name):
+    try:
+        return int(name.rsplit('-', 1)[1])
+    except (IndexError, ValueError):
+        return float('inf')
+
+
+# Save a Dataset as a new build and make it the current one, tagged with
+# `fingerprint` (by default that of the CSV). Arrays equal to or extending
+# those of `previous`, the manifest of the build it replaces, are copied
+# from its files rather than serialized again.
+def write_mapped_store(data, csv_path=CSV_PATH, manifest_path=MANIFEST_PATH,
+                       fingerprint=None, previous=None):
+    store_dir = os.path.dirname(manifest_path)
+    started = time.time_ns()
+    arrays_dir = f"{ARRAYS_PREFIX}{os.getpid()}-{started}"
+    os.makedirs(os.path.join(store_dir, arrays_dir))
+
+    previous_dir, previous_dataset = None, None
+    if previous is not None:
+        previous_dir = os.path.join(store_dir, previous['arrays'])
+        previous_dataset = previous['dataset']
+
+    metadata = dict(fingerprint or source_fingerprint(csv_path))
+    metadata[SCHEMA_VERSION_KEY] = str(SCHEMA_VERSION).encode()
+    manifest = {
+        'arrays': arrays_dir,
+        'metadata': {key.decode(): value.decode() for key, value in metadata.items()},
+        'layout_version': layout_version(),
+        'rows': len(data.df),
+        'dataset': _save(data, os.path.join(store_dir, arrays_dir), {},
+                         previous_dataset, previous_dir),
+    }
+
+    # Switch readers to the new build at once by renaming its manifest,
+    # encoded in one go (json.dump writes it in many small pieces)
+    tmp_path = f"{manifest_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(json.dumps(manifest))
+    os.replace(tmp_path, manifest_path)
+
+    # Remove the arrays of builds started before this one; workers still
+    # mapping them keep their pages until they unmap them. Builds started
+    # since may still be being written by other workers and are left alone.
+    for name in os.listdir(store_dir):
+        if name.startswith(ARRAYS_PREFIX) and _build_start(name) < started:
+            shutil.rmtree(os.path.join(store_dir, name), ignore_errors=True)
+
+
+# Read the manifest of the current build, or None when there is none
+def read_manifest(manifest_path=MANIFEST_PATH):
+    try:
+        with open(manifest_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+# Check whether a manifest describes a build of the current CSV and code
+def manifest_is_fresh(manifest, csv_path=CSV_PATH):
+    if manifest is None or manifest.get('layout_version') != layout_version():
+        return False
+    metadata = {key.encode(): value.encode()
+                for key, value in manifest['metadata'].items()}
+    return matches_source(metadata, csv_path)
+
+
+# Map the Dataset of a build
+def read_mapped_store(manifest, manifest_path=MANIFEST_PATH):
+    arrays_dir = os.path.join(os.path.dirname(manifest_path), manifest['arrays'])
+    return _load(manifest['dataset'], arrays_dir, {})
+
+
+# Load the Dataset, mapping the current build when it is fresh. Otherwise
+# build it from the columnar store at `store_path` (or the CSV), save it for
+# the other workers and map it as well, so this worker shares their pages too.
+def load_dataset(csv_path=CSV_PATH, manifest_path=MANIFEST_PATH, store_path=PARQUET_PATH):
+    manifest = read_manifest(manifest_path)
+    if manifest_is_fresh(manifest, csv_path):
+        try:
+            return read_mapped_store(manifest, manifest_path)
+        except (OSError, ValueError):
+            # Replaced by a newer build while mapping it; build it here
+            pass
+
+    data = Dataset(read_dataset(csv_path=csv_path, store_path=store_path))
+    try:
+        write_mapped_store(data, csv_path, manifest_path)
+        return read_mapped_store(read_manifest(manifest_path), manifest_path)
+    except OSError:
+        # A read-only deployment can still serve the Dataset built here
+        return data
+
+
+# Build the store from the command line
+def main():
+    parser = argparse.ArgumentParser(
+        description="Save the dashboard's Dataset as memory-mapped arrays.")
+    parser.add_argument('--csv', default=CSV_PATH,
+                        help="cleaned CSV the dataset comes from")
+    parser.add_argument('--manifest', default=MANIFEST_PATH,
+                        help="manifest of the mapped store to write")
+    parser.add_argument('--force', action='store_true',
+                        help="rebuild even if the store is up to date")
+    args = parser.parse_args()
+
+    if not args.force and manifest_is_fresh(read_manifest(args.manifest), args.csv):
+        print(f"{args.manifest} is up to date")
+        return
+
+    data = Dataset(read_dataset(csv_path=args.csv))
+    write_mapped_store(data, args.csv, args.manifest)
+    print(f"Mapped {len(data.df):,} rows and {len(data.cube):,} cube cells "
+          f"under {os.path.dirname(os.path.abspath(args.manifest))}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+# Per-section instrumentation of the Global Suicide Trends Dashboard
+#
+# Every run of a section (within a whole-script rerun, or a fragment rerun
+# of that section alone) can be recorded: its wall time, split between
+# filtering, aggregation, figure construction and chart serialization, the
+# peak memory allocated while it ran and the size of the payloads it sent
+# to the browser. Recording is opt-in; sections not recorded pay one
+# thread-local lookup per timed phase.
+#
+# Phases are timed exclusively: an aggregate computed while a figure is
+# built counts as aggregation, not as figure construction, and the time
+# left over (widgets, markdown) is reported as 'other'. Peak memory comes
+# from tracemalloc, which runs while any section recording memory does and
+# slows every allocation down meanwhile (times recorded with it are inflated
+# accordingly); it covers the whole process, so sessions running at the same
+# time inflate each other's peaks.
+
+import contextlib
+import json
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from suicide_data_config import PROFILE_MEMORY
+
+# Phases timed within a section, in the order they usually happen
+PHASES = ['filter', 'aggregate', 'figure', 'serialize']
+
+# Records each session keeps for the debug panel to download
+SESSION_HISTORY = 1000
+
+# The section being recorded by this thread, i.e. this session's script run
+_local = threading.local()
+
+# Sections recording memory now, and whether they started tracemalloc (and
+# stop it once the last of them ends)
+_tracing_lock = threading.Lock()
+_tracing = {'sections': 0, 'started': False}
+
+
+# Time a phase of the running section, when it is recorded
+@contextlib.contextmanager
+def phase(name):
+    record = getattr(_local, 'record', None)
+    if record is None:
+        yield
+        return
+
+    # Phases started within this one are taken out of its time
+    _local.stack.append(0.0)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        nested = _local.stack.pop()
+        record[f"{name}_ms"] += 1000 * (elapsed - nested)
+        if _local.stack:
+            _local.stack[-1] += elapsed
+
+
+# Count a payload sent by the running section, when it is recorded. Its
+# size is measured by `measure()`, whose time is left out of the section's.
+def add_payload(measure):
+    record = getattr(_local, 'record', None)
+    if record is None:
+        return
+    start = time.perf_counter()
+    record['payload_bytes'] += int(measure())
+    _local.excluded += time.perf_counter() - start
+
+
+# Trace memory allocations for one more section recording memory
+def _start_tracing():
+    with _tracing_lock:
+        if _tracing['sections'] == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracing['started'] = True
+        _tracing['sections'] += 1
+
+
+# Stop tracing allocations once no section records memory, unless tracing
+# was started by something else
+def _stop_tracing():
+    with _tracing_lock:
+        _tracing['sections'] -= 1
+        if _tracing['sections'] == 0 and _tracing['started']:
+            tracemalloc.stop()
+            _tracing['started'] = False
+
+
+# Record a section while it runs, passing its record to `sink` once it
+# ends; nothing is recorded when `sink` is None. Its peak memory is None
+# unless `memory` is set.
+@contextlib.contextmanager
+def record_section(name, sink, memory=PROFILE_MEMORY):
+    if sink is None:
+        yield
+        return
+
+    if memory:
+        _start_tracing()
+        tracemalloc.reset_peak()
+        base_memory = tracemalloc.get_traced_memory()[0]
+
+    record = {'section': name,
+              'started': datetime.now(timezone.utc).isoformat(timespec='milliseconds')}
+    record.update({f"{phase_name}_ms": 0.0 for phase_name in PHASES})
+    record['payload_bytes'] = 0
+    _local.record, _local.stack, _local.excluded = record, [], 0.0
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        total_ms = 1000 * (time.perf_counter() - start - _local.excluded)
+        _local.record = None
+        record['total_ms'] = total_ms
+        record['other_ms'] = total_ms - sum(record[f"{phase_name}_ms"] for phase_name in PHASES)
+        record['peak_memory_bytes'] = None
+        if memory:
+            record['peak_memory_bytes'] = max(0, tracemalloc.get_traced_memory()[1] - base_memory)
+            _stop_tracing()
+        for key, value in record.items():
+            if key.endswith('_ms'):
+                record[key] = round(value, 3)
+        sink(record)
+
+
+# Append-only JSON lines file of section records, shared by every session
+class ProfileLog:
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def write(self, record):
+        line = json.dumps(record) + '\n'
+        with self.lock:
+            with open(self.path, 'a') as f:
+                f.write(line)
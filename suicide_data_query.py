@@ -0,0 +1,305 @@
+# Query engines of the Global Suicide Trends Dashboard
+#
+# A query engine answers the sidebar filters and the rollups the section
+# aggregates are built from: the matching cube cells and source row ids, the
+# totals of each index cell over a range of years, and the cells rolled up
+# to a few keys. The pandas engine, the default, answers them from the
+# in-memory Dataset and its indexes. The DuckDB engine pushes them down as
+# SQL to an embedded DuckDB database over a Parquet or DuckDB file of the
+# cleaned rows. The Polars engine plans them all as LazyFrames over the
+# cube and collects them together, filtering once and running the rollups
+# in parallel. Every engine returns frames shaped, ordered and typed like
+# the pandas ones, so every section works the same on any of them.
+# QUERY_ENGINE picks the engine.
+
+import numpy as np
+
+try:
+    import polars as pl
+except ImportError:
+    # Optional dependency, only needed by the Polars engine
+    pl = None
+
+from suicide_data_config import DUCKDB_SOURCE, QUERY_ENGINE
+from suicide_data_cube import CELL_KEYS, CUBE_KEYS, CUBE_MEASURES, MEASURE_COLUMNS, PREFIX_MEASURES, rollup
+from suicide_data_store import PARQUET_PATH, read_dataset, store_files, store_is_fresh
+
+# Table of the cleaned rows in a DuckDB database file
+DUCKDB_TABLE = 'suicide_data'
+
+
+# Answers queries from the in-memory Dataset
+class PandasEngine:
+    def __init__(self, data):
+        self.data = data
+
+    # Cube cells matching the sidebar filters
+    def filter_cells(self, selection):
+        return self.data.filter_cells(*selection)
+
+    # Sorted ids of the source rows matching the sidebar filters
+    def filter_rows(self, selection):
+        return self.data.row_index.rows(*selection)
+
+    # Totals of each index cell matching the filters other than the years,
+    # over each (first, last) year period, read from the running totals
+    def totals(self, selection, periods):
+        _, sex, age, generation, countries = selection
+        mask = self.data.year_index.cell_mask(sex, age, generation, countries)
+        return [self.data.year_index.totals(mask, lo, hi) for lo, hi in periods]
+
+    # Everything a filter result starts from: its cells, row ids, totals over
+    # the periods and the given rollups, as (keys, source) pairs, computed up
+    # front. This engine rolls up on demand instead, so none are.
+    def filter(self, selection, periods, rollups):
+        return (self.filter_cells(selection), self.filter_rows(selection),
+                self.totals(selection, periods), {})
+
+    # A frame of a filter result ('cells' or the year-range totals,
+    # 'range_data') rolled up to the given keys
+    def rollup(self, result, keys, source='cells'):
+        return rollup(getattr(result, source), list(keys))
+
+
+# Quote an SQL identifier or string literal
+def _identifier(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _literal(value):
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+# Answers queries with SQL run by an embedded DuckDB database. The cleaned
+# rows are read from a Parquet store (with the parts appended to it) or from
+# the suicide_data table of a DuckDB file, which must hold the rows the
+# Dataset was loaded from in the same order, since the dataset view reads
+# rows by id from the Dataset.
+class DuckDBEngine:
+    def __init__(self, data, path=PARQUET_PATH):
+        # Optional dependency, only needed when this engine is selected
+        import duckdb
+
+        self.connection = duckdb.connect()
+        self.countries = frozenset(data.df['country'].cat.categories)
+
+        # Categorical dtypes of the label columns, the same as the Dataset's
+        self.label_dtypes = {col: data.df[col].dtype for col in CELL_KEYS}
+
+        # Measures are summed as 64-bit integers or doubles; DuckDB would
+        # widen integer sums to 128 bits
+        self.sum_types = {name: 'DOUBLE' if data.cube[name].dtype.kind == 'f' else 'BIGINT'
+                          for name in MEASURE_COLUMNS}
+
+        if path.endswith('.duckdb'):
+            self.connection.execute(f"ATTACH {_literal(path)} AS source (READ_ONLY)")
+            source, position = f"source.{DUCKDB_TABLE}", 'rowid'
+        else:
+            # A store rows were appended to is read part by part, in order
+            parts = [f"SELECT {i} AS store_part, * FROM "
+                     f"read_parquet({_literal(part)}, file_row_number = true)"
+                     for i, part in enumerate(store_files(path))]
+            source = f"({' UNION ALL '.join(parts)})"
+            position = 'store_part, file_row_number'
+
+        # Label columns become enums of the Dataset's categories, so results
+        # sort in the same order and come back as categoricals
+        columns = {'year': 'year'}
+        for col in CELL_KEYS:
+            categories = ', '.join(_literal(value) for value in data.df[col].cat.categories)
+            self.connection.execute(f"CREATE TYPE {col}_label AS ENUM ({categories})")
+            columns[col] = f"CAST({_identifier(col)} AS {col}_label) AS {_identifier(col)}"
+        keys = ', '.join(columns[col] for col in CUBE_KEYS)
+
+        # Rows with a usable population and suicide count, as the Dataset
+        # keeps them, numbered in file order like the Dataset's rows
+        self.connection.execute(f"""
+            CREATE VIEW usable_rows AS
+            SELECT row_number() OVER (ORDER BY {position}) - 1 AS row_id, *
+            FROM {source}
+            WHERE population IS NOT NULL AND suicides_no IS NOT NULL AND population > 0
+        """)
+
+        # Keys of every row, to answer the filters of the dataset view
+        self.connection.execute(f"""
+            CREATE TABLE suicide_rows AS
+            SELECT row_id, {keys} FROM usable_rows ORDER BY row_id
+        """)
+
+        # The cube, aggregated once like the Dataset's
+        sums = [f"CAST(sum({_identifier(column)}) AS {self.sum_types[name]}) AS {_identifier(name)}"
+                for name, column in CUBE_MEASURES.items()]
+        self.connection.execute(f"""
+            CREATE TABLE cube AS
+            SELECT {keys}, {', '.join(sums)}, count(*) AS "rows"
+            FROM usable_rows GROUP BY ALL ORDER BY ALL
+        """)
+
+    # Run a query on a cursor of its own, so sessions can query concurrently,
+    # and fetch its result with `fetch`
+    def _query(self, sql, params, fetch):
+        cursor = self.connection.cursor()
+        try:
+            return fetch(cursor.execute(sql, params))
+        finally:
+            cursor.close()
+
+    # Run a query returning a frame, with the label columns typed like the
+    # Dataset's
+    def _frame(self, sql, params):
+        frame = self._query(sql, params, lambda cursor: cursor.df())
+        return frame.astype({col: dtype for col, dtype in self.label_dtypes.items()
+                             if col in frame.columns})
+
+    # WHERE clause and parameters of the sidebar filters, optionally over
+    # other years than the selected ones
+    def _where(self, selection, years=None):
+        year_range, sex, age, generation, countries = selection
+        lo, hi = years or year_range
+        clauses, params = ["year BETWEEN ? AND ?"], [int(lo), int(hi)]
+
+        # A selection of every country leaves the column unfiltered
+        if not self.countries <= set(countries):
+            clauses.append("list_contains(CAST(? AS country_label[]), country)")
+            params.append([country for country in countries if country in self.countries])
+
+        # 'All' leaves the corresponding column unfiltered
+        for col, value in (('sex', sex), ('age', age), ('generation', generation)):
+            if value != 'All':
+                clauses.append(f"{col} = ?")
+                params.append(value)
+
+        return ' AND '.join(clauses), params
+
+    # Sums of the given measures, as SQL select items
+    def _sums(self, measures):
+        return ', '.join(f"CAST(sum({_identifier(name)}) AS {self.sum_types[name]}) "
+                         f"AS {_identifier(name)}" for name in measures)
+
+    def filter_cells(self, selection):
+        where, params = self._where(selection)
+        keys = ', '.join(map(_identifier, CUBE_KEYS))
+        return self._frame(f"SELECT * FROM cube WHERE {where} ORDER BY {keys}", params)
+
+    def filter_rows(self, selection):
+        where, params = self._where(selection)
+        ids = self._query(f"SELECT row_id FROM suicide_rows WHERE {where} ORDER BY row_id",
+                          params, lambda cursor: cursor.fetchnumpy()['row_id'])
+        return np.asarray(ids, dtype=np.intp)
+
+    def totals(self, selection, periods):
+        keys = ', '.join(map(_identifier, CELL_KEYS))
+        frames = []
+        for period in periods:
+            where, params = self._where(selection, period)
+            frames.append(self._frame(f"""
+                SELECT {keys}, {self._sums(PREFIX_MEASURES)} FROM cube WHERE {where}
+                GROUP BY ALL HAVING sum("rows") > 0 ORDER BY {keys}
+            """, params))
+        return frames
+
+    def filter(self, selection, periods, rollups):
+        return (self.filter_cells(selection), self.filter_rows(selection),
+                self.totals(selection, periods), {})
+
+    # The year-range totals hold the cells of the year range summed over the
+    # years, so both sources roll up from the same cells; only the measures
+    # they carry differ
+    def rollup(self, result, keys, source='cells'):
+        keys = ', '.join(map(_identifier, [keys] if isinstance(keys, str) else keys))
+        measures = MEASURE_COLUMNS if source == 'cells' else PREFIX_MEASURES
+        where, params = self._where(result.selection)
+        return self._frame(f"""
+            SELECT {keys}, {self._sums(measures)} FROM cube WHERE {where}
+            GROUP BY {keys} ORDER BY {keys}
+        """, params)
+
+
+# Answers queries with Polars LazyFrames over a copy of the Dataset's cube
+# and row keys. A filter result is planned as a whole (its cells, row ids,
+# totals and every rollup the sections use) and collected at once, so the
+# shared filter runs once and the independent group-bys run in parallel.
+class PolarsEngine:
+    def __init__(self, data):
+        if pl is None:
+            raise ImportError("The polars query engine needs the polars package")
+
+        self.countries = frozenset(data.df['country'].cat.categories)
+        self.label_dtypes = {col: data.df[col].dtype for col in CELL_KEYS}
+
+        # Label columns become enums of the Dataset's categories, so results
+        # sort in the same order; integer measures are summed as 64-bit
+        labels = [pl.col(col).cast(pl.Enum(list(data.df[col].cat.categories)))
+                  for col in CELL_KEYS]
+        wide = [pl.col(name).cast(pl.Int64) for name in MEASURE_COLUMNS
+                if data.cube[name].dtype.kind in 'iu']
+        self.cube = pl.from_pandas(data.cube).with_columns(labels + wide)
+        self.rows = pl.from_pandas(data.df[CUBE_KEYS]).with_columns(labels).with_row_index('row_id')
+
+    # Filter expression of the sidebar filters, optionally over other years
+    # than the selected ones
+    def _predicate(self, selection, years=None):
+        year_range, sex, age, generation, countries = selection
+        lo, hi = years or year_range
+        predicate = pl.col('year').is_between(int(lo), int(hi))
+
+        # A selection of every country leaves the column unfiltered
+        if not self.countries <= set(countries):
+            predicate &= pl.col('country').is_in(
+                [country for country in countries if country in self.countries])
+
+        # 'All' leaves the corresponding column unfiltered
+        for col, value in (('sex', sex), ('age', age), ('generation', generation)):
+            if value != 'All':
+                predicate &= pl.col(col) == value
+        return predicate
+
+    # Plan of a rollup of cells to the given keys, in the order of the keys
+    def _rollup_plan(self, cells, keys, source='cells'):
+        keys = [keys] if isinstance(keys, str) else list(keys)
+        measures = MEASURE_COLUMNS if source == 'cells' else PREFIX_MEASURES
+        return cells.group_by(keys).agg(pl.col(measures).sum()).sort(keys)
+
+    # A collected frame as pandas, with the label columns typed like the
+    # Dataset's
+    def _pandas(self, frame):
+        frame = frame.to_pandas()
+        return frame.astype({col: dtype for col, dtype in self.label_dtypes.items()
+                             if col in frame.columns})
+
+    def filter(self, selection, periods, rollups):
+        cells = self.cube.lazy().filter(self._predicate(selection))
+        plans = [cells, self.rows.lazy().filter(self._predicate(selection)).select('row_id')]
+        for period in periods:
+            period_cells = self.cube.lazy().filter(self._predicate(selection, period))
+            plans.append(self._rollup_plan(period_cells, CELL_KEYS, 'range_data').filter(
+                pl.col('rows') > 0))
+        plans += [self._rollup_plan(cells, keys, source) for keys, source in rollups]
+
+        # Collecting the plans together runs their common filters once
+        frames = pl.collect_all(plans)
+        totals = [self._pandas(frame) for frame in frames[2:2 + len(periods)]]
+        return (self._pandas(frames[0]), frames[1]['row_id'].to_numpy().astype(np.intp),
+                totals, dict(zip(rollups, map(self._pandas, frames[2 + len(periods):]))))
+
+    def rollup(self, result, keys, source='cells'):
+        cells = self.cube.lazy().filter(self._predicate(result.selection))
+        return self._pandas(self._rollup_plan(cells, keys, source).collect())
+
+
+# Create the engine picked by QUERY_ENGINE for a loaded Dataset
+def make_engine(data, name=QUERY_ENGINE):
+    if name == 'pandas':
+        return PandasEngine(data)
+
+    if name == 'duckdb':
+        # Without a source of its own, the engine queries the columnar store,
+        # rebuilt first when it is stale
+        if not DUCKDB_SOURCE and not store_is_fresh():
+            read_dataset()
+        return DuckDBEngine(data, DUCKDB_SOURCE or PARQUET_PATH)
+
+    if name == 'polars':
+        return PolarsEngine(data)
+
+    raise ValueError(f"Unknown query engine {name!r}; expected 'pandas', 'duckdb' or 'polars'")
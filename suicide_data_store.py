@@ -0,0 +1,341 @@
+# Columnar data store for the Global Suicide Trends Dashboard
+#
+# The cleaned CSV is converted once into a Parquet file with a fixed schema,
+# so the dashboard does not pay for the text parse and dtype inference on
+# every cold start. The CSV stays the source of truth: the store records the
+# size, modification time and content hash of the CSV it was built from, and
+# readers fall back to the CSV whenever the store is missing or stale.
+#
+# Rows appended to the CSV (see suicide_data_append.py) are added to the
+# store as a new part file, listed in the store's metadata, and to the
+# fingerprint as the hash of the appended bytes, so neither the history nor
+# its hash is read again.
+#
+# Build (or refresh) the store from the command line:
+#
+#     python suicide_data_store.py
+#     python suicide_data_store.py --force
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Resolve data files next to this module, whatever the working directory is
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Cleaned dataset, produced from the raw suicide_data.csv by suicide_data_etl.py
+CSV_PATH = os.path.join(BASE_DIR, 'cleaned_suicide_data.csv')
+
+# Directory holding the built binary artifacts
+STORE_DIR = os.path.join(BASE_DIR, 'data_store')
+
+# Columnar copy of the cleaned dataset
+PARQUET_PATH = os.path.join(STORE_DIR, 'suicide_data.parquet')
+
+# Age groups and generations in their natural order
+AGE_ORDER = ['5-14', '15-24', '25-34', '35-54', '55-74', '75+']
+GEN_ORDER = ['G.I. Generation', 'Silent', 'Boomers',
+             'Generation X', 'Millennials', 'Generation Z']
+SEX_ORDER = ['female', 'male']
+
+# Typed schema applied at load time: categoricals for the label columns and
+# the smallest numeric types that hold the data without loss. The rate and
+# total GDP columns stay float64, since narrower floats would change the
+# values shown in the charts.
+SCHEMA_DTYPES = {
+    'country': 'category',
+    'year': 'int16',
+    'sex': pd.CategoricalDtype(SEX_ORDER),
+    'age': pd.CategoricalDtype(AGE_ORDER, ordered=True),
+    'suicides_no': 'int32',
+    'population': 'int32',
+    'suicides/100k pop': 'float64',
+    'gdp_for_year ($)': 'float64',
+    'gdp_per_capita ($)': 'int32',
+    'generation': pd.CategoricalDtype(GEN_ORDER, ordered=True),
+}
+
+# Column order of the dataset
+COLUMNS = list(SCHEMA_DTYPES)
+
+# Label columns, parsed straight into categoricals
+CATEGORY_COLUMNS = ['country', 'sex', 'age', 'generation']
+
+# Bump whenever SCHEMA_DTYPES changes, so stores built earlier are rebuilt
+SCHEMA_VERSION = 2
+
+# Metadata keys stored in the Parquet footer to detect a stale store
+SOURCE_SIZE_KEY = b'source_size'
+SOURCE_MTIME_KEY = b'source_mtime_ns'
+SOURCE_HASH_KEY = b'source_sha256'
+SCHEMA_VERSION_KEY = b'schema_version'
+
+# Hash of each segment of a CSV rows were appended to, as a JSON list of
+# [end offset, sha256] pairs; the source hash is then the hash of the list
+SOURCE_SEGMENTS_KEY = b'source_segments'
+
+# File names of the parts of the store written before its last one, which
+# is the store file itself, as a JSON list in row order
+STORE_PARTS_KEY = b'store_parts'
+
+# Suffix of the file marking a CSV rows are being appended to, which holds
+# its size before the append
+APPEND_MARKER_SUFFIX = '.appending'
+
+
+# Compute the SHA-256 of a file without reading it into memory at once
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# Compute the SHA-256 of the bytes of a file from `start` up to `stop`
+def range_sha256(path, start, stop, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = stop - start
+        while remaining > 0:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            digest.update(chunk)
+            remaining -= len(chunk)
+    return digest.hexdigest()
+
+
+# Describe the source file so the store can later be checked against it
+def source_fingerprint(path):
+    stat = os.stat(path)
+    return {
+        SOURCE_SIZE_KEY: str(stat.st_size).encode(),
+        SOURCE_MTIME_KEY: str(stat.st_mtime_ns).encode(),
+        SOURCE_HASH_KEY: file_sha256(path).encode(),
+    }
+
+
+# Fingerprint of a source file grown by appending to it, from `metadata`,
+# its fingerprint when it was `start` bytes long: only the appended bytes
+# are hashed, as a new segment after the ones already described
+def appended_fingerprint(metadata, path, start):
+    segments = json.loads(metadata.get(SOURCE_SEGMENTS_KEY, b'[]'))
+    if not segments:
+        segments = [[start, metadata[SOURCE_HASH_KEY].decode()]]
+    stat = os.stat(path)
+    segments.append([stat.st_size, range_sha256(path, start, stat.st_size)])
+    encoded = json.dumps(segments).encode()
+    return {
+        SOURCE_SIZE_KEY: str(stat.st_size).encode(),
+        SOURCE_MTIME_KEY: str(stat.st_mtime_ns).encode(),
+        SOURCE_HASH_KEY: hashlib.sha256(encoded).hexdigest().encode(),
+        SOURCE_SEGMENTS_KEY: encoded,
+    }
+
+
+# Check whether rows are being appended to a CSV, or were by an append that
+# did not finish
+def append_in_progress(csv_path=CSV_PATH):
+    return os.path.exists(f"{csv_path}{APPEND_MARKER_SUFFIX}")
+
+
+# Cast a freshly parsed DataFrame to the typed schema
+def apply_schema(df):
+    for col in df.columns:
+        dtype = SCHEMA_DTYPES[col]
+
+        # Countries are not known ahead of time; keep their categories sorted.
+        # A categorical parsed in chunks may list them in another order, which
+        # astype keeps, as unordered dtypes compare equal in any order.
+        if col == 'country':
+            dtype = pd.CategoricalDtype(sorted(df[col].dropna().unique()))
+            if isinstance(df[col].dtype, pd.CategoricalDtype):
+                df[col] = df[col].cat.set_categories(dtype.categories)
+                continue
+
+        had_missing = df[col].isna().any()
+        df[col] = df[col].astype(dtype)
+
+        # Labels outside a fixed category list silently become NaN otherwise
+        if not had_missing and df[col].isna().any():
+            raise ValueError(f"Unexpected values in column {col!r}")
+
+    return df
+
+
+# Parse the cleaned CSV with the fixed schema
+def read_csv(csv_path=CSV_PATH, columns=None):
+    dtypes = {col: 'category' if col in CATEGORY_COLUMNS else SCHEMA_DTYPES[col]
+              for col in COLUMNS}
+    df = pd.read_csv(csv_path, usecols=columns, dtype=dtypes)
+    return apply_schema(df[columns or COLUMNS])
+
+
+# Write a DataFrame as a Parquet file tagged with `fingerprint`, next to
+# the target and renamed, so readers never see a partial file
+def _write_tagged(df, fingerprint, path):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata.update(fingerprint)
+    metadata[SCHEMA_VERSION_KEY] = str(SCHEMA_VERSION).encode()
+    table = table.replace_schema_metadata(metadata)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    pq.write_table(table, tmp_path, compression='zstd')
+    os.replace(tmp_path, path)
+
+
+# Write a DataFrame to the store, tagging it with the fingerprint of its source
+def write_store(df, csv_path=CSV_PATH, store_path=PARQUET_PATH):
+    _write_tagged(df, source_fingerprint(csv_path), store_path)
+    remove_store_parts(store_path)
+
+
+# Add rows to the store as a new part, tagging the store with `fingerprint`,
+# the fingerprint of the source holding them. The rows already stored are
+# not rewritten: the store file is linked under the name of a part and the
+# new rows take its place, listing every part before them.
+def append_store(df, fingerprint, store_path=PARQUET_PATH):
+    parts = [os.path.basename(path) for path in store_files(store_path)[:-1]]
+    part = f"{os.path.basename(store_path)}.part-{len(parts)}"
+    part_path = os.path.join(os.path.dirname(store_path), part)
+    if os.path.exists(part_path):
+        os.remove(part_path)
+    try:
+        os.link(store_path, part_path)
+    except OSError:
+        # A file system without hard links gets a copy
+        shutil.copyfile(store_path, part_path)
+
+    fingerprint = dict(fingerprint)
+    fingerprint[STORE_PARTS_KEY] = json.dumps(parts + [part]).encode()
+    _write_tagged(df, fingerprint, store_path)
+
+
+# Remove the parts left by appends to an earlier version of the store
+def remove_store_parts(store_path=PARQUET_PATH):
+    directory = os.path.dirname(store_path) or '.'
+    prefix = f"{os.path.basename(store_path)}.part-"
+    for name in os.listdir(directory):
+        if name.startswith(prefix):
+            os.remove(os.path.join(directory, name))
+
+
+# The key-value metadata of the store, which also holds the keys added
+# after the schema was written (as the streaming pipeline does)
+def store_metadata(store_path=PARQUET_PATH):
+    return pq.read_metadata(store_path).metadata or {}
+
+
+# Files of the store in row order: the parts listed in the store file's
+# metadata, then the store file itself
+def store_files(store_path=PARQUET_PATH):
+    parts = json.loads(store_metadata(store_path).get(STORE_PARTS_KEY, b'[]'))
+    directory = os.path.dirname(store_path)
+    return [os.path.join(directory, part) for part in parts] + [store_path]
+
+
+# Read the rows of the store, from every part of it
+def read_store(store_path=PARQUET_PATH, columns=None):
+    frames = [pd.read_parquet(path, columns=columns) for path in store_files(store_path)]
+
+    # Each part, and each row group of a part, has the countries of its own
+    # rows, which are read back in the order they first appear; the store
+    # lists all of them, sorted, as read_csv does
+    if 'country' in frames[0]:
+        categories = sorted(set().union(*(frame['country'].cat.categories
+                                          for frame in frames)))
+        for frame in frames:
+            if list(frame['country'].cat.categories) != categories:
+                frame['country'] = frame['country'].cat.set_categories(categories)
+    return frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+
+
+# Check the metadata recorded with a built artifact against the current CSV
+def matches_source(metadata, csv_path=CSV_PATH):
+    # An artifact written with an older schema is never reused
+    if (SOURCE_HASH_KEY not in metadata or
+            metadata.get(SCHEMA_VERSION_KEY) != str(SCHEMA_VERSION).encode()):
+        return False
+
+    # Without the CSV there is nothing newer to compare against
+    if not os.path.exists(csv_path):
+        return True
+
+    # Cheap check first: unchanged size and modification time
+    stat = os.stat(csv_path)
+    if (metadata.get(SOURCE_SIZE_KEY) == str(stat.st_size).encode() and
+            metadata.get(SOURCE_MTIME_KEY) == str(stat.st_mtime_ns).encode()):
+        return True
+
+    # Timestamps change on checkout and copies, so compare the content
+    # itself, segment by segment when rows were appended to it
+    segments = json.loads(metadata.get(SOURCE_SEGMENTS_KEY, b'[]'))
+    if segments:
+        if stat.st_size != segments[-1][0]:
+            return False
+        starts = [0] + [stop for stop, _ in segments[:-1]]
+        return all(range_sha256(csv_path, start, stop) == digest
+                   for start, (stop, digest) in zip(starts, segments))
+    return metadata[SOURCE_HASH_KEY] == file_sha256(csv_path).encode()
+
+
+# Check whether the store was built from the current version of the CSV
+def store_is_fresh(csv_path=CSV_PATH, store_path=PARQUET_PATH):
+    if not os.path.exists(store_path):
+        return False
+    return matches_source(store_metadata(store_path), csv_path)
+
+
+# Load the dataset, reading only the requested columns when given
+def read_dataset(columns=None, csv_path=CSV_PATH, store_path=PARQUET_PATH):
+    if store_is_fresh(csv_path, store_path):
+        try:
+            return read_store(store_path, columns)
+        except OSError:
+            # A part removed by a rebuild running at the same time
+            pass
+
+    # Fall back to the CSV and refresh the store for the next cold start
+    df = read_csv(csv_path)
+    try:
+        write_store(df, csv_path, store_path)
+    except OSError:
+        # A read-only deployment can still serve straight from the CSV
+        pass
+
+    return df[columns] if columns else df
+
+
+# Build the store from the command line
+def main():
+    parser = argparse.ArgumentParser(
+        description="Convert the cleaned suicide CSV into the columnar store.")
+    parser.add_argument('--csv', default=CSV_PATH,
+                        help="cleaned CSV to convert")
+    parser.add_argument('--output', default=PARQUET_PATH,
+                        help="Parquet file to write")
+    parser.add_argument('--force', action='store_true',
+                        help="rebuild even if the store is up to date")
+    args = parser.parse_args()
+
+    if not args.force and store_is_fresh(args.csv, args.output):
+        print(f"{args.output} is up to date")
+        return
+
+    df = read_csv(args.csv)
+    write_store(df, args.csv, args.output)
+    print(f"Wrote {len(df):,} rows to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
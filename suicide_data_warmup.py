@@ -0,0 +1,67 @@
+# Cache warm-up of the Global Suicide Trends Dashboard
+#
+# Most visitors land on the default view (the whole year range, every sex,
+# age group and generation, and the default countries), and many move on to
+# a few popular selections. When a version of the data is loaded, their
+# filter results and every section aggregate are computed in the background
+# (or read back from the disk cache), so the first page load finds them in
+# the filter cache. A session asking for a selection being warmed waits for
+# it instead of computing it again. The figures built from them are read
+# back from the disk cache when an earlier run drew them.
+
+import logging
+import time
+
+from suicide_data_aggregates import AGGREGATES, FilterResult, filter_key
+from suicide_data_config import WARMUP_SELECTIONS
+
+logger = logging.getLogger(__name__)
+
+# Countries selected in the default view
+DEFAULT_COUNTRIES = ['South Africa', 'Ireland', 'Greece', 'Norway', 'Brazil', 'Nicaragua',
+                     'Austria', 'Uruguay', 'Australia', 'United States', 'Ukraine',
+                     'Republic of Korea', 'Russian Federation']
+
+
+# Sidebar selection described by a WARMUP_SELECTIONS entry, built the way the
+# sidebar builds it; an empty entry describes the default view
+def warmup_selection(data, spec):
+    df = data.df
+    years = spec.get('years', (df['year'].min(), df['year'].max()))
+    all_countries = sorted(df['country'].unique())
+
+    countries = spec.get('countries', 'default')
+    if countries == 'all':
+        countries = all_countries
+    elif countries == 'default':
+        countries = DEFAULT_COUNTRIES
+    countries = [country for country in countries if country in all_countries]
+
+    return ((int(years[0]), int(years[1])), spec.get('sex', 'All'), spec.get('age', 'All'),
+            spec.get('generation', 'All'), countries)
+
+
+# Compute the filter result and every aggregate of the default view and of
+# each selection in `specs`, into the caches of a DataVersion
+def warm_up(version, specs=WARMUP_SELECTIONS):
+    for spec in [{}] + list(specs):
+        start = time.perf_counter()
+        try:
+            selection = warmup_selection(version.data, spec)
+            key = filter_key(*selection)
+            result = version.filter_cache.get_or_compute(
+                key, lambda: FilterResult(version.data, selection, version.filter_cache,
+                                          key, version.engine))
+            for name in AGGREGATES:
+                result.get(name)
+            result.save()
+        except Exception:
+            # A selection that cannot be warmed is computed when asked for
+            logger.exception("Warming up the selection %r failed", spec)
+            continue
+        if key not in version.filter_cache:
+            logger.warning("The selection %r is larger than the filter cache and was not "
+                           "kept; raise FILTER_CACHE_MB to warm it up", spec)
+            continue
+        logger.info("Warmed up the selection %r in %.0f ms",
+                    spec, 1000 * (time.perf_counter() - start))
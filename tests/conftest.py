@@ -0,0 +1,34 @@
+# Shared fixtures of the dashboard tests
+#
+# The tests are run from the repository root:
+#
+#     python -m pytest tests
+
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+# Make the dashboard modules importable whatever the working directory is
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from suicide_data_store import apply_schema
+
+
+# Build cleaned rows with the store's schema from (country, year, suicides,
+# population) tuples, all for the same sex, age group and generation
+@pytest.fixture
+def make_rows():
+    def make(rows, sex='male', age='35-54', generation='Boomers'):
+        df = pd.DataFrame(rows, columns=['country', 'year', 'suicides_no', 'population'])
+        df['sex'], df['age'], df['generation'] = sex, age, generation
+        df['suicides/100k pop'] = df['suicides_no'] / df['population'] * 100000
+        df['gdp_for_year ($)'] = 1e9
+        df['gdp_per_capita ($)'] = 1000
+        return apply_schema(df[['country', 'year', 'sex', 'age', 'suicides_no', 'population',
+                                'suicides/100k pop', 'gdp_for_year ($)',
+                                'gdp_per_capita ($)', 'generation']])
+    return make
@@ -0,0 +1,53 @@
+import pickle
+
+from suicide_data_aggregates import FilterCache, FilterResult, filter_key
+from suicide_data_cache import DiskCache, sizeof
+from suicide_data_cube import Dataset
+from suicide_data_query import PandasEngine
+
+
+# A filter result of three countries, cached in memory and on disk
+def cached_result(make_rows, tmp_path):
+    data = Dataset(make_rows([(country, year, 10, 1000)
+                              for country in ('Aland', 'Bland', 'Cland')
+                              for year in (1990, 1991)]))
+    engine = PandasEngine(data)
+    disk = DiskCache(str(tmp_path), 2**30)
+    cache = FilterCache(2**30, engine, disk)
+    selection = ((1990, 1991), 'All', 'All', 'All', ['Aland', 'Bland'])
+    key = filter_key(*selection)
+    result = cache.get_or_compute(key, lambda: FilterResult(data, selection, cache, key, engine))
+    return result, cache, disk, key
+
+
+# An aggregate grows the cache's count of the result by its own size, and
+# leaves the disk cache alone until the result is saved
+def test_aggregates_resize_and_save_once(make_rows, tmp_path):
+    result, cache, disk, key = cached_result(make_rows, tmp_path)
+    before = cache.nbytes
+    writes = []
+    disk.put = lambda name, dump: writes.append(dump)
+
+    value = result.get('total', lambda: 42)
+    assert result.get('total', lambda: 0) == 42
+    assert cache.nbytes == before + sizeof('total') + sizeof(value)
+    assert writes == []
+
+    result.save()
+    result.save()
+    assert len(writes) == 1
+    assert pickle.loads(writes[0]()).aggregates == {'total': 42}
+
+
+# A result saved to disk is read back with its aggregates by a new cache
+def test_saved_result_reads_back(make_rows, tmp_path):
+    result, cache, disk, key = cached_result(make_rows, tmp_path)
+    result.get('total', lambda: 42)
+    result.save()
+    disk.flush()
+
+    restarted = FilterCache(2**30, cache.engine, DiskCache(str(tmp_path), 2**30))
+    loaded = restarted.get(key)
+    assert loaded.get('total', lambda: 0) == 42
+    assert loaded.cache is restarted
+    assert not loaded.unsaved
@@ -0,0 +1,81 @@
+import os
+
+import pandas as pd
+import pytest
+
+import suicide_data_append
+from suicide_data_append import append_delta, dataset_differences
+from suicide_data_cube import Dataset
+from suicide_data_mmap import load_dataset, manifest_is_fresh, read_manifest
+from suicide_data_store import (APPEND_MARKER_SUFFIX, read_csv, read_dataset, store_files,
+                                store_is_fresh, write_store)
+
+
+# A cleaned CSV with both stores built, and paths of the CSV, the columnar
+# store and the mapped store's manifest
+@pytest.fixture
+def history(make_rows, tmp_path):
+    csv_path = str(tmp_path / 'data.csv')
+    store_path = str(tmp_path / 'store' / 'data.parquet')
+    manifest_path = str(tmp_path / 'store' / 'mapped.json')
+    make_rows([(country, year, 10, 1000) for country in ('Bland', 'Dland')
+               for year in (1990, 1991)]).to_csv(csv_path, index=False)
+    write_store(read_csv(csv_path), csv_path, store_path)
+    load_dataset(csv_path, manifest_path, store_path)
+    return csv_path, store_path, manifest_path
+
+
+# Write a delta file of new rows
+def write_delta(make_rows, tmp_path, name, rows):
+    path = str(tmp_path / name)
+    make_rows(rows).to_csv(path, index=False)
+    return path
+
+
+# Appended rows, with a new country, give the Dataset and stores a rebuild
+# from the grown CSV would, without rewriting the stored history
+def test_append_matches_rebuild(make_rows, tmp_path, history):
+    csv_path, store_path, manifest_path = history
+    stored = os.stat(store_path).st_ino
+
+    for name, rows in [('first.csv', [('Bland', 1992, 5, 1000), ('Cland', 1990, 1, 500)]),
+                       ('second.csv', [('Aland', 1992, 2, 800), ('Dland', 1992, 3, 900)])]:
+        updated, appended = append_delta(write_delta(make_rows, tmp_path, name, rows),
+                                         csv_path, store_path, manifest_path)
+        assert appended == 2
+
+    rebuilt = Dataset(read_csv(csv_path))
+    assert dataset_differences(updated, rebuilt) == []
+    assert dataset_differences(load_dataset(csv_path, manifest_path, store_path), rebuilt) == []
+
+    assert store_is_fresh(csv_path, store_path)
+    assert manifest_is_fresh(read_manifest(manifest_path), csv_path)
+    assert len(store_files(store_path)) == 3
+    assert os.stat(store_files(store_path)[0]).st_ino == stored
+    pd.testing.assert_frame_equal(read_dataset(csv_path=csv_path, store_path=store_path),
+                                  read_csv(csv_path))
+
+    # The appended segments are checked by content when the timestamps change
+    os.utime(csv_path, ns=(1, 1))
+    assert store_is_fresh(csv_path, store_path)
+
+
+# An append failing after the CSV grew cuts it back, leaving the mapped store
+# it started from in use
+def test_failed_append_is_undone(make_rows, tmp_path, history, monkeypatch):
+    csv_path, store_path, manifest_path = history
+    with open(csv_path, 'rb') as f:
+        before = f.read()
+
+    def fail(*args, **kwargs):
+        raise OSError("disk full")
+    monkeypatch.setattr(suicide_data_append, 'write_mapped_store', fail)
+
+    delta_path = write_delta(make_rows, tmp_path, 'delta.csv', [('Bland', 1992, 5, 1000)])
+    with pytest.raises(OSError):
+        append_delta(delta_path, csv_path, store_path, manifest_path)
+
+    with open(csv_path, 'rb') as f:
+        assert f.read() == before
+    assert not os.path.exists(csv_path + APPEND_MARKER_SUFFIX)
+    assert manifest_is_fresh(read_manifest(manifest_path), csv_path)
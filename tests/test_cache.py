@@ -0,0 +1,41 @@
+from suicide_data_cache import DiskCache
+
+
+# Values read back as written, also by a cache opened later on the same
+# directory
+def test_disk_cache_round_trip(tmp_path):
+    cache = DiskCache(str(tmp_path), 2**20)
+    assert cache.get('a') is None
+    cache.put('a', lambda: b'first')
+    cache.put('a', lambda: b'second')
+    cache.put('b', lambda: b'other')
+    cache.flush()
+    assert cache.get('a') == b'second'
+
+    reopened = DiskCache(str(tmp_path), 2**20)
+    assert reopened.get('a') == b'second'
+    assert reopened.get('b') == b'other'
+    assert reopened.stats()['bytes'] == len(b'second') + len(b'other')
+
+
+# Going over budget evicts the least recently used entries, and a value
+# larger than the whole budget is not stored
+def test_disk_cache_evicts_the_least_recently_used(tmp_path):
+    cache = DiskCache(str(tmp_path), 100)
+    for name in ('a', 'b'):
+        cache.put(name, lambda: bytes(40))
+        cache.flush()
+    assert cache.get('a') is not None
+    cache.put('c', lambda: bytes(40))
+    cache.flush()
+
+    assert cache.get('b') is None
+    assert cache.get('a') is not None
+    assert cache.get('c') is not None
+    stats = cache.stats()
+    assert (stats['entries'], stats['bytes'], stats['evictions']) == (2, 80, 1)
+
+    cache.put('d', lambda: bytes(101))
+    cache.flush()
+    assert cache.get('d') is None
+    assert cache.stats()['entries'] == 2
@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+
+from suicide_data_cache import LRUCache
+from suicide_data_cube import Dataset, FilterIndex
+
+# A population close to the int32 limit, whose total over a few years is not
+BIG_POPULATION = 2_000_000_000
+
+
+# Running totals above 2**31 stay exact rather than wrapping around
+def test_year_totals_do_not_overflow(make_rows):
+    data = Dataset(make_rows([('Bigland', year, 2_000_000_000, BIG_POPULATION)
+                              for year in range(1990, 1994)]))
+
+    index = data.year_index
+    assert index.prefix['population'].dtype == np.int64
+    assert index.prefix['suicides_no'].dtype == np.int64
+
+    mask = index.cell_mask('All', 'All', 'All', ['Bigland'])
+    totals = index.totals(mask, 1990, 1993)
+    assert totals['population'].tolist() == [4 * BIG_POPULATION]
+    assert totals['suicides_no'].tolist() == [4 * 2_000_000_000]
+
+
+# Appended years add onto the running totals without overflowing either
+def test_appended_year_totals_do_not_overflow(make_rows):
+    data = Dataset(make_rows([('Bigland', 1990, 10, BIG_POPULATION),
+                              ('Bigland', 1991, 10, BIG_POPULATION)]))
+    data = data.appended(make_rows([('Bigland', 1992, 10, BIG_POPULATION),
+                                    ('Smallland', 1992, 1, 1000)]))
+
+    index = data.year_index
+    mask = index.cell_mask('All', 'All', 'All', ['Bigland'])
+    assert index.totals(mask, 1990, 1992)['population'].tolist() == [3 * BIG_POPULATION]
+    assert index.prefix['population'].dtype == np.int64
+
+
+# Sorting leaves the shared index as built; a cache of orders passed in is
+# filled instead, and gives the same rows
+def test_sort_rows_keeps_the_index_unchanged(make_rows):
+    data = Dataset(make_rows([('Bigland', 1990, 30, 1000), ('Smallland', 1991, 10, 1000),
+                              ('Midland', 1992, 20, 1000)]))
+    index = data.row_index
+    attributes = set(vars(index))
+    rows = np.array([0, 2])
+
+    plain = index.sort_rows(data.df, rows, 'suicides_no')
+    orders = LRUCache(2**20)
+    cached = index.sort_rows(data.df, rows, 'suicides_no', orders=orders)
+
+    assert set(vars(index)) == attributes
+    assert 'suicides_no' in orders
+    assert plain.tolist() == cached.tolist() == [2, 0]
+
+
+# The posting-list filter selects the rows a mask over the frame does
+def test_filter_index_rows_match_a_mask(make_rows):
+    rows = [(country, year, 10, 1000) for country in ('Aland', 'Bland', 'Cland')
+            for year in (1990, 1991, 1992)]
+    df = pd.concat([make_rows(rows), make_rows(rows, sex='female'),
+                    make_rows(rows, age='15-24', generation='Millennials')], ignore_index=True)
+    index = FilterIndex(df)
+
+    for year_range, sex, age, generation, countries in [
+            ((1990, 1992), 'All', 'All', 'All', ['Aland', 'Bland', 'Cland']),
+            ((1991, 1992), 'female', 'All', 'All', ['Aland', 'Cland']),
+            ((1990, 1991), 'All', '15-24', 'Millennials', ['Bland']),
+            ((1990, 1990), 'male', '35-54', 'Boomers', ['Cland', 'Nowhere']),
+            ((1990, 1992), 'female', '15-24', 'All', ['Aland', 'Bland', 'Cland']),
+            ((1990, 1992), 'All', 'All', 'All', [])]:
+        mask = df['year'].between(*year_range) & df['country'].isin(countries)
+        for col, value in [('sex', sex), ('age', age), ('generation', generation)]:
+            if value != 'All':
+                mask &= df[col] == value
+        assert index.rows(year_range, sex, age, generation, countries).tolist() == \
+            np.flatnonzero(mask.to_numpy()).tolist()
@@ -0,0 +1,59 @@
+import os
+
+import pandas as pd
+
+from suicide_data_etl import run_etl
+from suicide_data_store import COLUMNS, read_csv, store_is_fresh
+
+RAW_HEADER = ("country,year,sex,age,suicides_no,population,suicides/100k pop,country-year,"
+              "HDI for year, gdp_for_year ($) ,gdp_per_capita ($),generation\n")
+
+
+# Run the pipeline on a raw file with the given data lines
+def clean(tmp_path, lines):
+    raw_path = tmp_path / 'raw.csv'
+    raw_path.write_text(RAW_HEADER + ''.join(lines))
+    csv_path, store_path = tmp_path / 'cleaned.csv', tmp_path / 'store.parquet'
+    rows = run_etl(str(raw_path), str(csv_path), str(store_path), chunk_rows=1)
+    return rows, str(csv_path), str(store_path)
+
+
+# A raw file whose rows are all dropped still gives both outputs, empty,
+# and leaves no temporary file behind
+def test_rows_all_dropped(tmp_path):
+    rows, csv_path, store_path = clean(tmp_path, [
+        'Albania,1987,male,15-24 years,-1,312900,6.71,Albania1987,,"2,156,624,900",796,'
+        'Generation X\n',
+        'Albania,1988,male,15-24 years,3,312900,-1,Albania1988,,"2,126,000,000",769,'
+        'Generation X\n',
+    ])
+
+    assert rows == 0
+    assert open(csv_path).read() == ','.join(COLUMNS) + '\n'
+    assert list(pd.read_parquet(store_path).columns) == COLUMNS
+    assert len(pd.read_parquet(store_path)) == 0
+    assert store_is_fresh(csv_path, store_path)
+    assert sorted(os.listdir(tmp_path)) == ['cleaned.csv', 'raw.csv', 'store.parquet']
+
+
+# A raw file with a header only cleans to empty outputs too
+def test_header_only(tmp_path):
+    rows, csv_path, store_path = clean(tmp_path, [])
+
+    assert rows == 0
+    assert len(read_csv(csv_path)) == 0
+    assert len(pd.read_parquet(store_path)) == 0
+
+
+# Chunks cleaning to no rows write no header of their own
+def test_dropped_chunk_before_rows(tmp_path):
+    rows, csv_path, store_path = clean(tmp_path, [
+        'Albania,1987,male,15-24 years,-1,312900,6.71,Albania1987,,"2,156,624,900",796,'
+        'Generation X\n',
+        'Albania,1987,male,35-54 years,16,308000,5.19,Albania1987,,"2,156,624,900",796,'
+        'Silent\n',
+    ])
+
+    assert rows == 1
+    assert read_csv(csv_path)['age'].tolist() == ['35-54']
+    pd.testing.assert_frame_equal(pd.read_parquet(store_path), read_csv(csv_path))
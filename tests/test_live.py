@@ -0,0 +1,40 @@
+import os
+
+import pytest
+
+import suicide_data_live
+from suicide_data_cube import Dataset
+from suicide_data_live import LiveData
+from suicide_data_store import read_csv
+
+
+# Live data over a CSV of a few rows, loaded without the mapped store, the
+# disk cache or warming up
+@pytest.fixture
+def live(make_rows, tmp_path, monkeypatch):
+    monkeypatch.setattr(suicide_data_live, 'DISK_CACHE_MB', 0)
+    monkeypatch.setattr(suicide_data_live, 'load_dataset', lambda path: Dataset(read_csv(path)))
+    monkeypatch.setattr(suicide_data_live, 'warm_up', lambda version: None)
+    csv_path = str(tmp_path / 'data.csv')
+    make_rows([('Bland', 1990, 10, 1000)]).to_csv(csv_path, index=False)
+    return LiveData(csv_path)
+
+
+# A CSV written again with the same content keeps the version and its caches
+def test_reload_of_the_same_content_keeps_the_version(live):
+    version = live.version
+    os.utime(live.csv_path, ns=(1, 1))
+    live._reload()
+    assert live.version is version
+    assert live.stat == suicide_data_live.file_stat(live.csv_path)
+    assert not live.reloading
+
+
+# A CSV with other content is swapped in as a new version
+def test_reload_of_new_content_swaps_the_version(live, make_rows):
+    version = live.version
+    make_rows([('Bland', 1990, 10, 1000), ('Bland', 1991, 12, 1000)]).to_csv(
+        live.csv_path, index=False)
+    live._reload()
+    assert live.version is not version
+    assert live.version.manifest['rows'] == 2
@@ -0,0 +1,43 @@
+import os
+
+from suicide_data_append import dataset_differences
+from suicide_data_cube import Dataset
+from suicide_data_mmap import (ARRAYS_PREFIX, load_dataset, manifest_is_fresh, read_manifest,
+                               write_mapped_store)
+from suicide_data_store import read_csv
+
+
+# A build of a CSV that changed since is rebuilt from it, removing the
+# earlier build's arrays
+def test_stale_store_is_rebuilt(make_rows, tmp_path):
+    csv_path = str(tmp_path / 'data.csv')
+    manifest_path = str(tmp_path / 'store' / 'mapped.json')
+    store_path = str(tmp_path / 'store' / 'data.parquet')
+    make_rows([('Bland', 1990, 10, 1000)]).to_csv(csv_path, index=False)
+    load_dataset(csv_path, manifest_path, store_path)
+    stale = read_manifest(manifest_path)
+
+    make_rows([('Bland', 1990, 10, 1000), ('Dland', 1991, 5, 500)]).to_csv(csv_path, index=False)
+    assert not manifest_is_fresh(stale, csv_path)
+    data = load_dataset(csv_path, manifest_path, store_path)
+
+    assert dataset_differences(data, Dataset(read_csv(csv_path))) == []
+    manifest = read_manifest(manifest_path)
+    assert manifest_is_fresh(manifest, csv_path)
+    assert not os.path.exists(tmp_path / 'store' / stale['arrays'])
+
+
+# Builds started after the one being published, which other workers may
+# still be writing, are not removed with the earlier ones
+def test_later_builds_are_kept(make_rows, tmp_path):
+    csv_path = str(tmp_path / 'data.csv')
+    manifest_path = str(tmp_path / 'store' / 'mapped.json')
+    make_rows([('Bland', 1990, 10, 1000)]).to_csv(csv_path, index=False)
+    earlier = tmp_path / 'store' / f"{ARRAYS_PREFIX}1-1"
+    later = tmp_path / 'store' / f"{ARRAYS_PREFIX}1-{2**62}"
+    earlier.mkdir(parents=True)
+    later.mkdir()
+
+    write_mapped_store(Dataset(read_csv(csv_path)), csv_path, manifest_path)
+    assert not earlier.exists()
+    assert later.exists()
@@ -0,0 +1,25 @@
+import tracemalloc
+
+from suicide_data_profile import record_section
+
+
+# Memory is traced while a section records it, and no longer once none does
+def test_memory_tracing_stops_with_the_last_section():
+    records = []
+    with record_section('outer', records.append, memory=True):
+        with record_section('inner', records.append, memory=True):
+            blocks = [bytes(2**20) for _ in range(4)]
+        assert tracemalloc.is_tracing()
+        del blocks
+    assert not tracemalloc.is_tracing()
+
+    assert [record['section'] for record in records] == ['inner', 'outer']
+    assert records[0]['peak_memory_bytes'] >= 4 * 2**20
+
+
+# Sections not recording memory leave it untraced
+def test_sections_without_memory_do_not_trace():
+    records = []
+    with record_section('plain', records.append):
+        assert not tracemalloc.is_tracing()
+    assert records[0]['peak_memory_bytes'] is None
@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from suicide_data_aggregates import AGGREGATES, FilterResult
+from suicide_data_cube import Dataset
+from suicide_data_query import DuckDBEngine, PolarsEngine
+from suicide_data_store import read_csv, write_store
+
+# Selections of every kind of filter, including an unknown country and no
+# matching rows
+SELECTIONS = [
+    ((1990, 1992), 'All', 'All', 'All', ['Aland', 'Bland', 'Cland']),
+    ((1991, 1992), 'female', 'All', 'All', ['Aland', 'Cland']),
+    ((1990, 1991), 'All', '15-24', 'Millennials', ['Bland', 'Nowhere']),
+    ((1992, 1992), 'male', '35-54', 'Boomers', ['Cland']),
+    ((1990, 1992), 'female', '15-24', 'All', ['Aland']),
+    ((1990, 1992), 'All', 'All', 'All', []),
+]
+
+
+# A Dataset of a few countries and groups, and the columnar store of its
+# rows
+@pytest.fixture
+def data(make_rows, tmp_path):
+    rows = [(country, year, 10 + year % 7 + len(country), 1000 * len(country) + year)
+            for country in ('Aland', 'Bland', 'Cland') for year in (1990, 1991, 1992)]
+    df = pd.concat([make_rows(rows), make_rows(rows, sex='female'),
+                    make_rows(rows, age='15-24', generation='Millennials')], ignore_index=True)
+    csv_path = str(tmp_path / 'data.csv')
+    df.to_csv(csv_path, index=False)
+    store_path = str(tmp_path / 'data.parquet')
+    write_store(read_csv(csv_path), csv_path, store_path)
+    return Dataset(read_csv(csv_path)), store_path
+
+
+# Check that two results, or parts of them, are the same up to rounding
+def assert_same(expected, actual):
+    if isinstance(expected, pd.DataFrame):
+        pd.testing.assert_frame_equal(expected.reset_index(drop=True),
+                                      actual.reset_index(drop=True),
+                                      check_dtype=False, check_exact=False, rtol=1e-9)
+    elif isinstance(expected, pd.Series):
+        pd.testing.assert_series_equal(expected.reset_index(drop=True),
+                                       actual.reset_index(drop=True),
+                                       check_dtype=False, check_exact=False, rtol=1e-9)
+    elif isinstance(expected, dict):
+        assert expected.keys() == actual.keys()
+        for key in expected:
+            assert_same(expected[key], actual[key])
+    elif isinstance(expected, (list, tuple)):
+        assert len(expected) == len(actual)
+        for expected_item, actual_item in zip(expected, actual):
+            assert_same(expected_item, actual_item)
+    elif isinstance(expected, (float, np.floating, np.ndarray)):
+        np.testing.assert_allclose(expected, actual, rtol=1e-9)
+    else:
+        assert expected == actual
+
+
+# Check that an engine gives the pandas engine's filter results and aggregates
+def assert_same_as_pandas(data, engine):
+    for selection in SELECTIONS:
+        expected = FilterResult(data, selection)
+        actual = FilterResult(data, selection, engine=engine)
+        assert actual.row_ids.tolist() == expected.row_ids.tolist()
+        for name in ('cells', 'range_data', 'start_data', 'end_data'):
+            assert_same(getattr(expected, name), getattr(actual, name))
+        if not expected.empty:
+            for name in AGGREGATES:
+                assert_same(expected.get(name), actual.get(name))
+
+
+# The DuckDB engine answers from the columnar store as pandas does from the
+# Dataset
+def test_duckdb_engine_matches_pandas(data):
+    pytest.importorskip('duckdb')
+    dataset, store_path = data
+    assert_same_as_pandas(dataset, DuckDBEngine(dataset, store_path))
+
+
+# The Polars engine answers from the cube as pandas does
+def test_polars_engine_matches_pandas(data):
+    pytest.importorskip('polars')
+    dataset, _ = data
+    assert_same_as_pandas(dataset, PolarsEngine(dataset))